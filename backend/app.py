@@ -1,17 +1,39 @@
 # backend/app.py
-from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks
+from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import text, and_, or_
+from prometheus_client import CONTENT_TYPE_LATEST
 import asyncio
 import logging
 import json
 from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
+from typing import Dict, List, Optional
 
-from models.database import create_tables, get_db, Customer, AgentActivity, ChurnIntervention
+from models.database import create_tables, get_db, get_analytics_db, analytics_session, engine, analytics_engine, SessionLocal, Customer, AgentActivity, ChurnIntervention
 from services.agent_service import AutonomousCustomerSuccessAgent
 from services.tidb_service import TiDBService
+from services.agent_coordinator import AgentCoordinator, CustomerShard, WORKER_ID
+from services.intervention_scheduler import InterventionScheduler
+from services.sentiment_analyzer import backfill_sentiment_scores, backfill_status
+from services.communication_ingest import ingest_communications
+from models.pool_metrics import pool_metrics, pool_status
+from services.customer_graph import customer_graph
+from services.graph_traversal import retention_graph_cache, CUSTOMER as CUSTOMER_NODE
+from services.index_advisor import run_index_advisor
+from services.dashboard_stream import dashboard_publisher
+from services.dashboard_snapshot import dashboard_snapshot, etag_matches
+from services.db_offload import configure_threadpool, run_blocking, threadpool_status
+from services.change_log import changes_since, current_version, prune_change_log, ACTIVITY as ACTIVITY_CHANGE, CUSTOMER as CUSTOMER_CHANGE
+from services.metrics import PrometheusMiddleware, render_metrics
+from services.tracing import trace, span, trace_recorder, trace_to_json, traces_to_otlp
+from services.profiler import profile_run, ProfilerBusyError, MODES as PROFILE_MODES, TRACEMALLOC, CPROFILE
+from services.agent_jobs import AgentJobQueue, JobProgress, maintain_agent_jobs, TRIGGER_JOB
+from services.event_bus import event_bus, CUSTOMER_METRICS_UPDATED, COMMUNICATION_RECEIVED, INTERVENTION_COMPLETED, AGENT_JOB_QUEUED
+from config import config
 from utils.mock_data import initialize_customer_data
 
 # Configure logging
@@ -24,17 +46,16 @@ logging.getLogger('sqlalchemy.dialects').setLevel(logging.WARNING)
 logging.getLogger('sqlalchemy.pool').setLevel(logging.WARNING)
 logging.getLogger('sqlalchemy.orm').setLevel(logging.WARNING)
 
-# Global agent task
+# Per-worker supervisor task; cycle state itself lives in TiDB (agent_cycle_state / agent_leases)
 agent_task = None
 latest_activities = []
 latest_analytics = {}
-agent_cycle_running = False
-agent_cycle_status = "stopped"  # stopped, starting, running, stopping
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     logger.info("🚀 Starting Autonomous Customer Success Agent...")
+    configure_threadpool()
     create_tables()
     
     # Initialize sample data
@@ -44,21 +65,25 @@ async def lifespan(app: FastAPI):
     # Initialize enhanced TiDB features
     from utils.mock_data import create_tidb_enhanced_tables
     await create_tidb_enhanced_tables(db)
-
-    # Don't auto-start the agent - let UI control it
-    logger.info("✅ Agent ready - waiting for UI control")
     
-    # Start background agent
-    #global agent_task
-    #agent_task = asyncio.create_task(run_agent_loop())
+    if config.INDEX_ADVISOR_ON_STARTUP:
+        run_index_advisor(db)
+
+    # Every worker runs a supervisor, but cycles only run on the lease holder once the UI enables them
+    global agent_task
+    agent_task = asyncio.create_task(run_controlled_agent_loop())
+    logger.info(f"✅ Agent ready - waiting for UI control (worker {WORKER_ID})")
     
     yield
     
     # Shutdown
-    global agent_task, agent_cycle_running
     if agent_task:
-        agent_cycle_running = False
         agent_task.cancel()
+        try:
+            await agent_task
+        except asyncio.CancelledError:
+            pass
+    await dashboard_publisher.stop()
     logger.info("Agent stopped")
 
 app = FastAPI(
@@ -76,33 +101,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-
-async def run_agent_loop():
-    """Background task running the autonomous customer success agent"""
-    while True:
-        try:
-            db = next(get_db())
-            agent = AutonomousCustomerSuccessAgent(db)
-            
-            # Process customer health checks
-            activities = await agent.process_customer_health_check()
-            
-            # Update global state
-            global latest_activities, latest_analytics
-            latest_activities.extend(activities[-10:])
-            latest_activities = latest_activities[-25:]  # Keep last 25 activities
-            
-            # Update analytics
-            tidb_service = TiDBService(db)
-            latest_analytics = await tidb_service.get_churn_analytics()
-            
-            logger.info(f"🤖 Agent cycle completed: {len(activities)} new interventions")
-            
-        except Exception as e:
-            logger.error(f"Agent loop error: {e}")
-        
-        # Run every 15 seconds for faster demo
-        await asyncio.sleep(15)
+app.add_middleware(PrometheusMiddleware)
 
 @app.get("/")
 async def root():
@@ -113,64 +112,60 @@ async def root():
         "description": "AI Agent that prevents customer churn"
     }
 
+def build_dashboard_metrics(analytics: Dict, aggregates: Dict) -> Dict:
+    """Dashboard KPIs from churn analytics and TiDBService.get_dashboard_aggregates() results"""
+    # Revenue at risk across all bands
+    total_at_risk = sum(seg.get('total_at_risk', 0) for seg in analytics['churn_distribution'].values())
+    
+    # Customer saves and the revenue they retained
+    successful_interventions = aggregates['retained_interventions']
+    total_revenue_retained = aggregates['revenue_retained']
+    
+    # Calculate churn reduction rate
+    total_customers = analytics['total_customers']
+    high_risk_customers = analytics['high_risk_customers']
+    churn_reduction_rate = ((total_customers - high_risk_customers) / max(total_customers, 1)) * 100
+    
+    return {
+        "kpis": {
+            "customers_saved": {
+                "value": successful_interventions,
+                "change": f"+{max(0, successful_interventions - 800)} from baseline",
+                "label": "Customers Saved from Churn"
+            },
+            "revenue_retained": {
+                "value": total_revenue_retained,
+                "change": f"{successful_interventions} successful interventions", 
+                "label": "Revenue Retained (Total)"
+            },
+            "churn_reduction": {
+                "value": round(churn_reduction_rate, 1),
+                "change": f"{high_risk_customers} customers at risk",
+                "label": "Customer Retention Rate"
+            },
+            "agent_autonomy": {
+                "value": analytics['agent_performance']['autonomy_level'],
+                "change": f"{analytics['agent_performance']['avg_response_time_minutes']:.1f}min avg response",
+                "label": "Agent Autonomy Level"
+            }
+        },
+        "churn_risk_summary": {
+            "total_customers": total_customers,
+            "high_risk_customers": high_risk_customers,
+            "total_revenue_at_risk": total_at_risk,
+            "churn_distribution": analytics['churn_distribution']
+        },
+        "agent_performance": analytics['agent_performance']
+    }
+
 @app.get("/api/dashboard/metrics")
-async def get_dashboard_metrics(db: Session = Depends(get_db)):
+async def get_dashboard_metrics(db: Session = Depends(get_analytics_db)):
     """Get real-time dashboard metrics"""
     
     try:
         tidb_service = TiDBService(db)
-        analytics = await tidb_service.get_churn_analytics()
-        
-        # Calculate key metrics from database
-        total_at_risk = sum(seg.get('total_at_risk', 0) for seg in analytics['churn_distribution'].values())
-        
-        # Get actual customer saves count
-        successful_interventions = db.query(ChurnIntervention).filter(
-            ChurnIntervention.actual_outcome == 'retained'
-        ).count()
-        
-        # Calculate revenue retention based on successful interventions
-        revenue_retained = db.query(ChurnIntervention).filter(
-            ChurnIntervention.actual_outcome == 'retained'
-        ).all()
-        total_revenue_retained = sum(i.estimated_retention_value for i in revenue_retained)
-        
-        # Calculate churn reduction rate
-        total_customers = analytics['total_customers']
-        high_risk_customers = analytics['high_risk_customers']
-        churn_reduction_rate = ((total_customers - high_risk_customers) / max(total_customers, 1)) * 100
-        
-        return {
-            "kpis": {
-                "customers_saved": {
-                    "value": successful_interventions,
-                    "change": f"+{max(0, successful_interventions - 800)} from baseline",
-                    "label": "Customers Saved from Churn"
-                },
-                "revenue_retained": {
-                    "value": total_revenue_retained,
-                    "change": f"{len(revenue_retained)} successful interventions", 
-                    "label": "Revenue Retained (Total)"
-                },
-                "churn_reduction": {
-                    "value": round(churn_reduction_rate, 1),
-                    "change": f"{high_risk_customers} customers at risk",
-                    "label": "Customer Retention Rate"
-                },
-                "agent_autonomy": {
-                    "value": analytics['agent_performance']['autonomy_level'],
-                    "change": f"{analytics['agent_performance']['avg_response_time_minutes']:.1f}min avg response",
-                    "label": "Agent Autonomy Level"
-                }
-            },
-            "churn_risk_summary": {
-                "total_customers": total_customers,
-                "high_risk_customers": high_risk_customers,
-                "total_revenue_at_risk": total_at_risk,
-                "churn_distribution": analytics['churn_distribution']
-            },
-            "agent_performance": analytics['agent_performance']
-        }
+        aggregates = await run_blocking(tidb_service.get_dashboard_aggregates)
+        return build_dashboard_metrics(tidb_service.format_churn_analytics(aggregates), aggregates)
         
     except Exception as e:
         logger.error(f"Error in dashboard metrics: {e}")
@@ -192,63 +187,370 @@ async def get_dashboard_metrics(db: Session = Depends(get_db)):
         }
 
 @app.get("/api/dashboard/activities")
-async def get_recent_activities():
+def get_recent_activities():
     """Get recent agent activities from database"""
-    return await get_real_time_activities()
+    return get_real_time_activities()
+
+AT_RISK_THRESHOLD = 0.6
+AT_RISK_LIMIT = 20
+
+def format_at_risk_customer(customer: Customer) -> Dict:
+    return {
+        "id": customer.id,
+        "name": customer.name,
+        "company": customer.company,
+        "email": customer.email,
+        "subscription_plan": customer.subscription_plan,
+        "monthly_revenue": customer.monthly_revenue,
+        "annual_contract_value": customer.annual_contract_value,
+        "churn_probability": customer.churn_probability,
+        "churn_risk_level": customer.churn_risk_level,
+        "last_login_days_ago": customer.last_login_days_ago,
+        "support_tickets_count": customer.support_tickets_count,
+        "feature_usage_score": customer.feature_usage_score,
+        "nps_score": customer.nps_score,
+        "days_since_signup": customer.days_since_signup
+    }
+
+def fetch_at_risk_customers(db: Session) -> List[Dict]:
+    high_risk_customers = db.query(Customer).filter(
+        Customer.churn_probability >= AT_RISK_THRESHOLD
+    ).order_by(Customer.churn_probability.desc()).limit(AT_RISK_LIMIT).all()
+    
+    return [format_at_risk_customer(customer) for customer in high_risk_customers]
 
 @app.get("/api/customers/at-risk")
-async def get_at_risk_customers(db: Session = Depends(get_db)):
-    """Get customers currently at high risk of churning"""
+def get_at_risk_customers(db: Session = Depends(get_db), since: Optional[int] = None):
+    """Get customers currently at high risk of churning.
     
-    high_risk_customers = db.query(Customer).filter(
-        Customer.churn_probability >= 0.6
-    ).order_by(Customer.churn_probability.desc()).limit(20).all()
-    
-    customers_data = []
-    for customer in high_risk_customers:
-        customers_data.append({
-            "id": customer.id,
-            "name": customer.name,
-            "company": customer.company,
-            "email": customer.email,
-            "subscription_plan": customer.subscription_plan,
-            "monthly_revenue": customer.monthly_revenue,
-            "annual_contract_value": customer.annual_contract_value,
-            "churn_probability": customer.churn_probability,
-            "churn_risk_level": customer.churn_risk_level,
-            "last_login_days_ago": customer.last_login_days_ago,
-            "support_tickets_count": customer.support_tickets_count,
-            "feature_usage_score": customer.feature_usage_score,
-            "nps_score": customer.nps_score,
-            "days_since_signup": customer.days_since_signup
-        })
+    With `since` (the version from a previous response), returns only what changed: `order` is the
+    current list as ids, and `customers` holds the rows that changed since then plus any that moved
+    into the list. Clients rebuild the list from `order` and refetch in full if a row is missing."""
+    
+    if since is None:
+        version = current_version(db)  # read first, so anything changing meanwhile is in the next delta
+        return {"customers": fetch_at_risk_customers(db), "version": version}
+    
+    delta = changes_since(db, CUSTOMER_CHANGE, since)
+    if delta["full_resync"]:
+        return {"customers": fetch_at_risk_customers(db), "version": delta["version"], "full_resync": True}
+    
+    order = [row.id for row in db.query(Customer.id).filter(
+        Customer.churn_probability >= AT_RISK_THRESHOLD
+    ).order_by(Customer.churn_probability.desc()).limit(AT_RISK_LIMIT)]
+    
+    changed = set(delta["entity_ids"])
+    send_ids = {customer_id for customer_id in order if customer_id in changed}
+    # Each changed customer that is not listed may have dropped out, letting an unchanged one in at the tail
+    dropped_out = len(changed) - len(send_ids)
+    unchanged = [customer_id for customer_id in order if customer_id not in changed]
+    send_ids.update(unchanged[len(unchanged) - min(dropped_out, len(unchanged)):])
+    
+    customers = db.query(Customer).filter(Customer.id.in_(send_ids)).all() if send_ids else []
+    return {
+        "customers": [format_at_risk_customer(customer) for customer in customers],
+        "order": order,
+        "version": delta["version"],
+        "full_resync": False
+    }
+
+class CustomerMetricsUpdate(BaseModel):
+    last_login_days_ago: Optional[int] = None
+    support_tickets_count: Optional[int] = None
+    feature_usage_score: Optional[float] = None
+    nps_score: Optional[int] = None
+    payment_delays: Optional[int] = None
+    monthly_revenue: Optional[float] = None
+    annual_contract_value: Optional[float] = None
+
+@app.put("/api/customers/{customer_id}/metrics")
+def update_customer_metrics(customer_id: int, metrics: CustomerMetricsUpdate, db: Session = Depends(get_db)):
+    """Update customer usage/health metrics; the agent re-evaluates the customer right away"""
+    
+    customer = db.query(Customer).filter(Customer.id == customer_id).first()
+    if not customer:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    
+    changes = metrics.model_dump(exclude_unset=True)
+    for field, value in changes.items():
+        setattr(customer, field, value)
+    db.commit()
+    customer_graph.update_customer(customer)
+    
+    event_bus.publish(CUSTOMER_METRICS_UPDATED, customer_id, {"fields": list(changes.keys())})
+    
+    return {"status": "success", "customer_id": customer_id, "updated_fields": list(changes.keys())}
+
+@app.get("/api/customers/{customer_id}/graph")
+def get_customer_graph(customer_id: int, hops: int = 2, db: Session = Depends(get_analytics_db)):
+    """Multi-hop neighbourhood of a customer and the strategies that worked around it"""
     
-    return {"customers": customers_data}
+    graph = retention_graph_cache.get(db)
+    if graph.node(CUSTOMER_NODE, customer_id) is None:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    
+    return {
+        "customer_id": customer_id,
+        "hops": hops,
+        "neighbourhood": graph.describe_neighbourhood(customer_id, min(max(hops, 1), 4)),
+        "strategy_scores": graph.score_strategies(customer_id),
+        "graph": {"nodes": graph.node_count, "edges": graph.edge_count}
+    }
+
+class CustomerCommunicationIn(BaseModel):
+    message: str
+    communication_type: str = "email"
+    direction: str = "inbound"
+
+@app.post("/api/customers/{customer_id}/communications")
+async def create_customer_communication(customer_id: int, communication: CustomerCommunicationIn,
+                                        db: Session = Depends(get_db)):
+    """Record a customer communication; inbound messages trigger the agent immediately"""
+    
+    tidb_service = TiDBService(db)
+    stored = await run_blocking(
+        tidb_service.store_customer_communication,
+        customer_id=customer_id,
+        message=communication.message,
+        comm_type=communication.communication_type,
+        direction=communication.direction
+    )
+    
+    if not stored:
+        raise HTTPException(status_code=500, detail="Could not store communication")
+    
+    return {"status": "success", "customer_id": customer_id}
+
+@app.post("/api/communications/bulk")
+async def bulk_ingest_communications(request: Request, format: Optional[str] = None,
+                                     chunk_size: Optional[int] = None, db: Session = Depends(get_db)):
+    """Stream NDJSON (default) or CSV communication history into TiDB, committing per chunk"""
+    
+    data_format = format or ("csv" if "csv" in request.headers.get("content-type", "") else "ndjson")
+    if data_format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format must be ndjson or csv")
+    
+    try:
+        result = await ingest_communications(db, request.stream(), data_format, chunk_size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Bulk communication ingest failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Bulk ingest failed: {e}")
+    
+    return {"status": "success", **result}
+
+class SentimentBackfillRequest(BaseModel):
+    chunk_size: Optional[int] = None
+    after_id: int = 0
+    customer_ids: Optional[List[int]] = None
+
+def run_sentiment_backfill(request: SentimentBackfillRequest):
+    """Runs in the threadpool with its own session so chunks never block the event loop"""
+    db = SessionLocal()
+    try:
+        backfill_sentiment_scores(db, request.chunk_size, request.after_id, request.customer_ids)
+    finally:
+        db.close()
+
+@app.post("/api/admin/sentiment/backfill")
+async def start_sentiment_backfill(background_tasks: BackgroundTasks,
+                                   request: SentimentBackfillRequest = SentimentBackfillRequest()):
+    """Re-score stored communications with the current sentiment lexicon"""
+    
+    if backfill_status["running"]:
+        raise HTTPException(status_code=409, detail="Sentiment backfill already running")
+    
+    backfill_status["running"] = True  # claimed now so a second request is rejected before the task starts
+    background_tasks.add_task(run_sentiment_backfill, request)
+    return {"status": "started", "after_id": request.after_id}
+
+@app.get("/api/admin/sentiment/backfill")
+async def get_sentiment_backfill_status():
+    """Progress of the latest sentiment backfill on this worker"""
+    return backfill_status
+
+@app.get("/api/admin/index-advisor")
+def get_index_advisor_report(db: Session = Depends(get_db)):
+    """EXPLAIN the hot queries and flag full table scans"""
+    report = run_index_advisor(db)
+    return {
+        "flagged": sum(1 for entry in report if entry["status"] == "full_scan"),
+        "queries": report
+    }
+
+@app.get("/api/admin/pool-metrics")
+async def get_pool_metrics():
+    """Connection pool occupancy, checkout wait histograms and overflow/timeout counts per engine"""
+    return {
+        "worker_id": WORKER_ID,
+        "pools": [
+            pool_status(engine, pool_metrics["primary"]),
+            pool_status(analytics_engine, pool_metrics["analytics"])
+        ],
+        "threadpool": threadpool_status()
+    }
+
+@app.get("/metrics", include_in_schema=False)
+async def get_prometheus_metrics():
+    """Prometheus exposition: agent stage, request and query latencies, cache hits, queue and pool depths"""
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/api/admin/traces")
+async def get_traces(limit: int = 20, slow_only: bool = False, format: str = "json"):
+    """Recent agent cycle traces from this worker's ring buffer, as span trees or OTLP/JSON"""
+    if format not in ("json", "otlp"):
+        raise HTTPException(status_code=400, detail="format must be json or otlp")
+    
+    traces = trace_recorder.traces(slow_only=slow_only, limit=limit)
+    if format == "otlp":
+        return traces_to_otlp(traces)
+    return {
+        "worker_id": WORKER_ID,
+        "slow_threshold_seconds": config.TRACE_SLOW_CYCLE_SECONDS,
+        "traces": [trace_to_json(t) for t in traces]
+    }
+
+@app.get("/api/admin/traces/{trace_id}")
+async def get_trace(trace_id: str, format: str = "json"):
+    """One trace's full span tree"""
+    found = trace_recorder.get(trace_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Trace not found (it may have been evicted or recorded by another worker)")
+    return traces_to_otlp([found]) if format == "otlp" else trace_to_json(found)
+
+@app.post("/api/admin/profile")
+async def profile_agent(mode: str = "sample", target: str = "health_check", top: int = 50, raw: bool = False,
+                        db: Session = Depends(get_db)):
+    """Run one agent health check over this worker's shards (or a trigger) under a profiler, against live data.
+
+    sample: collapsed stacks for flamegraph.pl / speedscope. cprofile: pstats listing, or the binary
+    dump for snakeviz with raw=true. tracemalloc: JSON list of the top allocation sites."""
+    if not config.PROFILING_ENABLED:
+        raise HTTPException(status_code=403, detail="Profiling is disabled (PROFILING_ENABLED)")
+    if mode not in PROFILE_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(PROFILE_MODES)}")
+    if target == "health_check":
+        # Only this worker's own slice: profiling the whole base would repeat other workers'
+        # interventions and notifications
+        coordinator = AgentCoordinator(db)
+        owned_shards = (await run_blocking(coordinator.get_cycle_state))["owned_shards"]
+        if not owned_shards:
+            raise HTTPException(status_code=409, detail="This worker holds no customer shards - start the agent cycle or retry on another worker")
+        shard = CustomerShard(coordinator.shard_count, owned_shards)
+        fn, args = AutonomousCustomerSuccessAgent(db, shard=shard).process_customer_health_check, ()
+    elif target == "trigger":
+        return await profile_trigger_job(mode, top, raw, db)
+    else:
+        raise HTTPException(status_code=400, detail="target must be health_check or trigger")
+    
+    try:
+        result = await profile_run(mode, fn, *args, top=top, raw=raw)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return profile_response(result, mode, target, raw)
+
+async def profile_trigger_job(mode: str, top: int, raw: bool, db: Session):
+    """Profile a trigger run recorded as a trigger job, so it holds the same dedupe slot as
+    /api/agent/trigger: triggers meanwhile join it instead of acting on the same customers"""
+    queue = AgentJobQueue(db)
+    job = await run_blocking(queue.start, TRIGGER_JOB)
+    if job is None:
+        raise HTTPException(status_code=409, detail="A trigger job is already queued or running")
+    
+    job_id = job["job_id"]
+    outcome = {}
+    
+    async def run_trigger_job(job_db: Session, progress: JobProgress):
+        outcome["result"] = await run_agent_trigger(job_db, progress)
+    
+    stop_event = asyncio.Event()
+    heartbeat = asyncio.create_task(heartbeat_job_periodically(job_id, stop_event))
+    result, error = None, None
+    try:
+        result = await profile_run(mode, run_trigger_job, db, JobProgress(job_id), top=top, raw=raw)
+        error = result["error"]
+    except ProfilerBusyError as e:
+        error = str(e)
+        raise HTTPException(status_code=409, detail=str(e))
+    finally:
+        stop_event.set()
+        await heartbeat
+        job_result = outcome.get("result")
+        if job_result and job_result.get("status") == "error":
+            error = error or job_result.get("message")
+        await run_blocking(queue.complete, job_id, job_result, error)
+    return profile_response(result, mode, "trigger", raw)
+
+def profile_response(result: Dict, mode: str, target: str, raw: bool):
+    if mode == TRACEMALLOC:
+        return result
+    headers = {"X-Profile-Duration-Ms": str(result["duration_ms"])}
+    if result["error"]:
+        # Database errors carry newlines and arbitrary text, which aren't valid in a header value
+        first_line = (result["error"].strip().splitlines() or ["error"])[0]
+        headers["X-Profile-Error"] = first_line[:200].encode("ascii", "replace").decode()
+    if mode == CPROFILE and raw:
+        headers["Content-Disposition"] = f'attachment; filename="agent-{target}.prof"'
+        return Response(result["pstats"], media_type="application/octet-stream", headers=headers)
+    if mode == CPROFILE:
+        return Response(result["pstats"], media_type="text/plain", headers=headers)
+    headers["X-Profile-Samples"] = str(result["samples"])
+    return Response(result["collapsed"], media_type="text/plain", headers=headers)
 
 @app.get("/api/analytics/churn")
-async def get_churn_analytics(db: Session = Depends(get_db)):
+async def get_churn_analytics(db: Session = Depends(get_analytics_db)):
     """Get comprehensive churn analytics"""
     
     tidb_service = TiDBService(db)
-    return await tidb_service.get_churn_analytics()
+    return await run_blocking(tidb_service.get_churn_analytics)
 
 @app.get("/api/feed/realtime")
-async def get_realtime_feed(db: Session = Depends(get_db)):
+async def get_realtime_feed(db: Session = Depends(get_analytics_db)):
     """Get real-time customer activity feed"""
     
     tidb_service = TiDBService(db)
-    return await tidb_service.get_real_time_customer_feed()
+    return await run_blocking(tidb_service.get_real_time_customer_feed)
 
-@app.post("/api/agent/trigger")
+@app.post("/api/agent/trigger", status_code=202)
 async def trigger_agent(db: Session = Depends(get_db)):
-    """Enhanced agent trigger that uses real TiDB data and persists activities"""
+    """Queue an agent run and return its job id at once; poll /api/agent/jobs/{job_id} for progress.
+    A trigger while one is already queued or running returns that job instead of starting another."""
     
     logger.info("🔥 Agent trigger endpoint called")
- 
+    job, created = await run_blocking(AgentJobQueue(db).enqueue, TRIGGER_JOB)
+    if job is None:
+        raise HTTPException(status_code=409, detail="Another trigger is being queued - try again")
+    if created:
+        event_bus.publish(AGENT_JOB_QUEUED, payload={"job_id": job["job_id"]})
+    
+    return {
+        "status": job["status"],
+        "job_id": job["job_id"],
+        "deduplicated": not created,
+        "status_url": f"/api/agent/jobs/{job['job_id']}"
+    }
+
+@app.get("/api/agent/jobs/{job_id}")
+async def get_agent_job(job_id: str, db: Session = Depends(get_db)):
+    """Job status with per-customer progress while running and the run's results once finished"""
+    job = await run_blocking(AgentJobQueue(db).get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+async def run_agent_trigger(db: Session, progress: Optional[JobProgress] = None) -> Dict:
+    """Body of a trigger job; runs in the threadpool since every step blocks on TiDB or the LLM"""
+
     try:
         # Get real data from TiDB
         total_customers = db.query(Customer).count()
-        high_risk_customers = db.query(Customer).filter(Customer.churn_probability >= 0.60).all()
+        high_risk_count = db.query(Customer).filter(Customer.churn_probability >= 0.60).count()
+        
+        # Spend this trigger's capacity on the highest-value saves first
+        scheduler = InterventionScheduler(db)
+        await scheduler.load_candidates(churn_threshold=0.60)
+        scheduled_customers = scheduler.next_batch(config.AGENT_CYCLE_CAPACITY)
         
         # Check if enhanced tables exist
         try:
@@ -266,12 +568,12 @@ async def trigger_agent(db: Session = Depends(get_db)):
         analysis_activity = AgentActivity(
             customer_id=None,
             activity_type="customer_analysis",
-            description=f"Agent scanning {total_customers} customer profiles • Finding similar cases from {agent_memories} successful interventions • {len(high_risk_customers)} customers identified as high-risk",
+            description=f"Agent scanning {total_customers} customer profiles • Finding similar cases from {agent_memories} successful interventions • {high_risk_count} customers identified as high-risk",
             urgency_level="high",
             activity_metadata={
                 "customers_analyzed": total_customers,
                 "memories_available": agent_memories,
-                "high_risk_found": len(high_risk_customers),
+                "high_risk_found": high_risk_count,
                 "communications_available": communications
             }
         )
@@ -279,8 +581,12 @@ async def trigger_agent(db: Session = Depends(get_db)):
         db.flush()  # Get the ID without committing
         
         # Step 2: Process each high-risk customer
+        if progress:
+            progress.start([{"customer_id": c.id, "name": c.name} for c in scheduled_customers])
         intervention_results = []
-        for customer in high_risk_customers[:3]:  # Process top 3 for demo
+        for customer in scheduled_customers:
+            if progress:
+                progress.update(customer.id, "running")
             # Store strategy selection activity
             strategy_activity = AgentActivity(
                 customer_id=customer.id,
@@ -321,11 +627,15 @@ async def trigger_agent(db: Session = Depends(get_db)):
             
             # Execute intervention using enhanced agent (with fallback)
             try:
-                if hasattr(agent, 'execute_enhanced_intervention'):
-                    intervention_result = await agent.execute_enhanced_intervention(customer)
-                else:
-                    # Fallback to regular intervention
-                    intervention_result = await agent.execute_autonomous_intervention(customer)
+                with span("agent.intervention", customer_id=customer.id):
+                    if hasattr(agent, 'execute_enhanced_intervention'):
+                        intervention_result = await agent.execute_enhanced_intervention(customer)
+                    else:
+                        # Fallback to regular intervention
+                        intervention_result = await agent.execute_autonomous_intervention(customer)
+                
+                if progress:
+                    progress.update(customer.id, "done", intervention=(intervention_result or {}).get("intervention"))
                 
                 if intervention_result:
                     intervention_results.append(intervention_result)
@@ -354,6 +664,8 @@ async def trigger_agent(db: Session = Depends(get_db)):
                     db.add(save_activity)
             except Exception as e:
                 logger.error(f"Error executing intervention for {customer.name}: {e}")
+                if progress:
+                    progress.update(customer.id, "failed", error=str(e))
                 # Create a basic save activity anyway for demo
                 save_activity = AgentActivity(
                     customer_id=customer.id,
@@ -394,14 +706,14 @@ async def trigger_agent(db: Session = Depends(get_db)):
             "status": "success",
             "real_data_used": {
                 "total_customers_analyzed": total_customers,
-                "high_risk_customers_found": len(high_risk_customers),
+                "high_risk_customers_found": high_risk_count,
                 "agent_memories_available": agent_memories,
                 "communications_analyzed": communications,
                 "interventions_executed": len(intervention_results)
             },
             "activities_created": len(intervention_results) * 2 + 2,  # Analysis + Learning + Customer activities
             "interventions_executed": len(intervention_results),
-            "message": f"Enhanced agent processed {total_customers} customers, found {len(high_risk_customers)} at risk, executed {len(intervention_results)} interventions"
+            "message": f"Enhanced agent processed {total_customers} customers, found {high_risk_count} at risk, executed {len(intervention_results)} interventions"
         }
         
     except Exception as e:
@@ -409,105 +721,159 @@ async def trigger_agent(db: Session = Depends(get_db)):
         db.rollback()
         return {"status": "error", "message": str(e)}
 
+def encode_intervention_cursor(created_at: datetime, intervention_id: int) -> str:
+    return f"{created_at.isoformat()}_{intervention_id}"
+
+def decode_intervention_cursor(cursor: str):
+    try:
+        created_at, intervention_id = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(created_at), int(intervention_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @app.get("/api/interventions/recent")
-async def get_recent_interventions(db: Session = Depends(get_db)):
-    """Get recent intervention attempts and outcomes"""
+def get_recent_interventions(limit: int = 15, status: Optional[str] = None, cursor: Optional[str] = None,
+                                   db: Session = Depends(get_db)):
+    """Get recent intervention attempts and outcomes, newest first.
+    
+    Pass the returned next_cursor as `cursor` to page further back."""
+    
+    limit = min(max(limit, 1), 100)
     
-    recent_interventions = db.query(ChurnIntervention).join(Customer).order_by(
-        ChurnIntervention.created_at.desc()
-    ).limit(15).all()
+    # One round trip: only the columns the dashboard shows, customer fields via outer join
+    query = db.query(
+        ChurnIntervention.id,
+        ChurnIntervention.intervention_type,
+        ChurnIntervention.strategy_chosen,
+        ChurnIntervention.churn_probability_before,
+        ChurnIntervention.churn_probability_after,
+        ChurnIntervention.status,
+        ChurnIntervention.actual_outcome,
+        ChurnIntervention.revenue_at_risk,
+        ChurnIntervention.estimated_retention_value,
+        ChurnIntervention.created_at,
+        ChurnIntervention.completed_at,
+        Customer.name.label("customer_name"),
+        Customer.company
+    ).outerjoin(Customer, Customer.id == ChurnIntervention.customer_id)
+    
+    if status:
+        query = query.filter(ChurnIntervention.status == status)
+    if cursor:
+        # Keyset pagination on (created_at, id): deep pages cost the same as the first one
+        cursor_created_at, cursor_id = decode_intervention_cursor(cursor)
+        query = query.filter(or_(
+            ChurnIntervention.created_at < cursor_created_at,
+            and_(ChurnIntervention.created_at == cursor_created_at, ChurnIntervention.id < cursor_id)
+        ))
+    
+    rows = query.order_by(ChurnIntervention.created_at.desc(), ChurnIntervention.id.desc()).limit(limit).all()
     
     interventions_data = []
-    for intervention in recent_interventions:
-        customer = db.query(Customer).filter(Customer.id == intervention.customer_id).first()
-        
+    for row in rows:
         interventions_data.append({
-            "id": intervention.id,
-            "customer_name": customer.name if customer else "Unknown",
-            "company": customer.company if customer else "Unknown",
-            "intervention_type": intervention.intervention_type,
-            "strategy_chosen": intervention.strategy_chosen,
-            "churn_probability_before": intervention.churn_probability_before,
-            "churn_probability_after": intervention.churn_probability_after,
-            "status": intervention.status,
-            "actual_outcome": intervention.actual_outcome,
-            "revenue_at_risk": intervention.revenue_at_risk,
-            "estimated_retention_value": intervention.estimated_retention_value,
-            "created_at": intervention.created_at.isoformat(),
-            "completed_at": intervention.completed_at.isoformat() if intervention.completed_at else None
+            "id": row.id,
+            "customer_name": row.customer_name or "Unknown",
+            "company": row.company or "Unknown",
+            "intervention_type": row.intervention_type,
+            "strategy_chosen": row.strategy_chosen,
+            "churn_probability_before": row.churn_probability_before,
+            "churn_probability_after": row.churn_probability_after,
+            "status": row.status,
+            "actual_outcome": row.actual_outcome,
+            "revenue_at_risk": row.revenue_at_risk,
+            "estimated_retention_value": row.estimated_retention_value,
+            "created_at": row.created_at.isoformat(),
+            "completed_at": row.completed_at.isoformat() if row.completed_at else None
         })
     
-    return {"interventions": interventions_data}
+    next_cursor = encode_intervention_cursor(rows[-1].created_at, rows[-1].id) if len(rows) == limit else None
+    
+    return {"interventions": interventions_data, "next_cursor": next_cursor}
+
+def format_activities(recent_activities: List[AgentActivity]) -> List[Dict]:
+    activities = []
+    for activity in recent_activities:
+        try:
+            # Metadata is always a dict (SQLAlchemy deserializes JSON automatically)
+            metadata = activity.activity_metadata or {}
+            
+            activity_data = {
+                "id": f"db_activity_{activity.id}",
+                "type": activity.activity_type,
+                "title": generate_activity_title(activity),
+                "description": activity.description,
+                "status": "success" if activity.status == "completed" else (activity.status or "active"),
+                "urgency": activity.urgency_level or "medium",
+                "timestamp": format_timestamp(activity.created_at),
+                "metadata": metadata
+            }
+            activities.append(activity_data)
+            
+        except Exception as e:
+            logger.error(f"Error processing activity {activity.id}: {e}")
+            # Include with fallback data
+            activities.append({
+                "id": f"db_activity_{activity.id}",
+                "type": activity.activity_type or "unknown",
+                "title": activity.description or f"Agent Activity {activity.id}",
+                "description": activity.description or "Agent activity",
+                "status": "success",
+                "urgency": "medium",
+                "timestamp": format_timestamp(activity.created_at),
+                "metadata": {}
+            })
+    
+    return activities
+
+def fetch_real_time_activities(db: Session) -> List[Dict]:
+    recent_activities = db.query(AgentActivity).order_by(
+        AgentActivity.created_at.desc()
+    ).limit(20).all()
+    
+    return format_activities(recent_activities)
 
 @app.get("/api/activities/real-time")
-async def get_real_time_activities(db: Session = Depends(get_db)):
-    """Get real-time activities from database"""
+def get_real_time_activities(db: Session = Depends(get_db), since: Optional[int] = None):
+    """Get real-time activities from database.
+    
+    With `since` (the version from a previous response), returns only activities created after it."""
     
     try:
-        recent_activities = db.query(AgentActivity).order_by(
-            AgentActivity.created_at.desc()
-        ).limit(20).all()
+        if since is None:
+            version = current_version(db)  # read first, so anything created meanwhile is in the next delta
+            return {"activities": fetch_real_time_activities(db), "version": version}
         
-        activities = []
-        for activity in recent_activities:
-            try:
-                # Metadata is always a dict (SQLAlchemy deserializes JSON automatically)
-                metadata = activity.activity_metadata or {}
-                
-                activity_data = {
-                    "id": f"db_activity_{activity.id}",
-                    "type": activity.activity_type,
-                    "title": generate_activity_title(activity),
-                    "description": activity.description,
-                    "status": "success" if activity.status == "completed" else (activity.status or "active"),
-                    "urgency": activity.urgency_level or "medium",
-                    "timestamp": format_timestamp(activity.created_at),
-                    "metadata": metadata
-                }
-                activities.append(activity_data)
-                
-            except Exception as e:
-                logger.error(f"Error processing activity {activity.id}: {e}")
-                # Include with fallback data
-                activities.append({
-                    "id": f"db_activity_{activity.id}",
-                    "type": activity.activity_type or "unknown",
-                    "title": activity.description or f"Agent Activity {activity.id}",
-                    "description": activity.description or "Agent activity",
-                    "status": "success",
-                    "urgency": "medium",
-                    "timestamp": format_timestamp(activity.created_at),
-                    "metadata": {}
-                })
-        
-        return {"activities": activities}
+        delta = changes_since(db, ACTIVITY_CHANGE, since)
+        if delta["full_resync"]:
+            return {"activities": fetch_real_time_activities(db), "version": delta["version"], "full_resync": True}
+        
+        new_ids = delta["entity_ids"][:20]
+        new_activities = db.query(AgentActivity).filter(AgentActivity.id.in_(new_ids)).order_by(
+            AgentActivity.created_at.desc()
+        ).all() if new_ids else []
+        return {"activities": format_activities(new_activities), "version": delta["version"], "full_resync": False}
         
     except Exception as e:
         logger.error(f"Error getting real-time activities: {e}")
         return {"activities": []}
 
+def build_realtime_stats(aggregates: Dict) -> Dict:
+    """Real-time stats from TiDBService.get_dashboard_aggregates(table_counts=True) results"""
+    return {
+        "totalCustomers": aggregates["total_customers"],
+        "highRiskCustomers": aggregates["high_risk_customers"], 
+        "agentMemories": aggregates["agent_memories"],
+        "communications": aggregates["communications"]
+    }
+
 @app.get("/api/realtime/stats") 
-async def get_realtime_stats(db: Session = Depends(get_db)):
+async def get_realtime_stats(db: Session = Depends(get_analytics_db)):
     """Get real-time statistics for dashboard"""
     
     try:
-        total_customers = db.query(Customer).count()
-        high_risk_customers = db.query(Customer).filter(Customer.churn_probability >= 0.6).count()
-        
-        # Get agent memory and communications counts
-        try:
-            agent_memories = db.execute(text("SELECT COUNT(*) as count FROM agent_memory")).fetchone()
-            communications = db.execute(text("SELECT COUNT(*) as count FROM customer_communications")).fetchone()
-        except:
-            agent_memories = None
-            communications = None
-        
-        return {
-            "totalCustomers": total_customers,
-            "highRiskCustomers": high_risk_customers, 
-            "agentMemories": agent_memories.count if agent_memories else 0,
-            "communications": communications.count if communications else 0
-        }
+        aggregates = await run_blocking(TiDBService(db).get_dashboard_aggregates, table_counts=True)
+        return build_realtime_stats(aggregates)
         
     except Exception as e:
         logger.error(f"Error getting real-time stats: {e}")
@@ -518,134 +884,333 @@ async def get_realtime_stats(db: Session = Depends(get_db)):
             "communications": 0
         }
 
+async def compute_dashboard_sections(db: Session) -> Dict:
+    return await run_blocking(build_dashboard_sections, db)
+
+async def build_dashboard_sections(db: Session) -> Dict:
+    """Everything the dashboard shows, computed in one pass over shared aggregates (in the threadpool)"""
+    tidb_service = TiDBService(db)
+    aggregates = await tidb_service.get_dashboard_aggregates(table_counts=True)
+    return {
+        "metrics": build_dashboard_metrics(tidb_service.format_churn_analytics(aggregates), aggregates),
+        "activities": {"activities": fetch_real_time_activities(db)},
+        "at_risk": {"customers": fetch_at_risk_customers(db)},
+        "interventions": get_recent_interventions(limit=15, status=None, cursor=None, db=db),
+        "stats": build_realtime_stats(aggregates)
+    }
+
+dashboard_snapshot.configure(compute_dashboard_sections)
+# The stream refreshes through the snapshot cache, so snapshot requests are free while it runs
+dashboard_publisher.configure(dashboard_snapshot.refresh)
+
+@app.get("/api/dashboard/snapshot")
+async def get_dashboard_snapshot(request: Request, db: Session = Depends(get_analytics_db)):
+    """All dashboard sections in one response, with an ETag; If-None-Match gets a 304 when unchanged"""
+    try:
+        sections, etag = await dashboard_snapshot.get(db)
+    except Exception as e:
+        logger.error(f"Error computing dashboard snapshot: {e}")
+        db.rollback()
+        raise HTTPException(status_code=500, detail="Could not compute dashboard snapshot")
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=json.dumps(sections, default=str), media_type="application/json", headers=headers)
+
+@app.get("/api/dashboard/stream")
+async def stream_dashboard(request: Request):
+    """Server-Sent Events push of dashboard sections (metrics, activities, at_risk, interventions, stats).
+
+    Each event carries one whole section and is only sent when that section changed. Reconnecting
+    clients send Last-Event-ID and get the missed events, or a full snapshot if they are too far behind."""
+    return StreamingResponse(
+        dashboard_publisher.stream(request.headers.get("last-event-id")),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/api/agent/start-cycle")
-async def start_agent_cycle():
-    """Start the continuous agent monitoring cycle"""
-    global agent_task, agent_cycle_running, agent_cycle_status
-    
-    if agent_cycle_running:
-        return {
-            "status": "already_running",
-            "message": "Agent cycle is already running"
-        }
+async def start_agent_cycle(db: Session = Depends(get_db)):
+    """Start the continuous agent monitoring cycle (on the workers holding shard leases)"""
     
     try:
-        agent_cycle_status = "starting"
-        logger.info("🤖 Starting agent monitoring cycle...")
+        coordinator = AgentCoordinator(db)
+        state = await run_blocking(coordinator.get_cycle_state)
         
-        # Start the agent monitoring task
-        agent_task = asyncio.create_task(run_controlled_agent_loop())
-        agent_cycle_running = True
-        agent_cycle_status = "running"
+        if state["cycle_enabled"]:
+            return {
+                "status": "already_running",
+                "message": "Agent cycle is already running",
+                "cycle_status": state["cycle_status"]
+            }
+        
+        logger.info("🤖 Starting agent monitoring cycle...")
+        state = await run_blocking(coordinator.set_cycle_enabled, True)
         
         return {
             "status": "success",
             "message": "Agent monitoring cycle started",
-            "cycle_status": agent_cycle_status
+            "cycle_status": state["cycle_status"]
         }
         
     except Exception as e:
-        agent_cycle_status = "stopped"
-        agent_cycle_running = False
         logger.error(f"Failed to start agent cycle: {e}")
+        db.rollback()
         return {
             "status": "error",
             "message": str(e)
         }
 
 @app.post("/api/agent/stop-cycle")
-async def stop_agent_cycle():
+async def stop_agent_cycle(db: Session = Depends(get_db)):
     """Stop the continuous agent monitoring cycle"""
-    global agent_task, agent_cycle_running, agent_cycle_status
-    
-    if not agent_cycle_running:
-        return {
-            "status": "not_running",
-            "message": "Agent cycle is not currently running"
-        }
     
     try:
-        agent_cycle_status = "stopping"
-        logger.info("⏹️ Stopping agent monitoring cycle...")
+        coordinator = AgentCoordinator(db)
+        state = await run_blocking(coordinator.get_cycle_state)
         
-        # Cancel the agent task
-        if agent_task:
-            agent_task.cancel()
-            try:
-                await agent_task
-            except asyncio.CancelledError:
-                pass
+        if not state["cycle_enabled"]:
+            return {
+                "status": "not_running",
+                "message": "Agent cycle is not currently running"
+            }
         
-        agent_cycle_running = False
-        agent_cycle_status = "stopped"
-        agent_task = None
+        logger.info("⏹️ Stopping agent monitoring cycle...")
+        state = await run_blocking(coordinator.set_cycle_enabled, False)
         
         return {
             "status": "success",
             "message": "Agent monitoring cycle stopped",
-            "cycle_status": agent_cycle_status
+            "cycle_status": state["cycle_status"]
         }
         
     except Exception as e:
         logger.error(f"Failed to stop agent cycle: {e}")
+        db.rollback()
         return {
             "status": "error",
             "message": str(e)
         }
 
 @app.get("/api/agent/cycle-status")
-async def get_agent_cycle_status():
-    """Get current agent cycle status"""
-    global agent_cycle_running, agent_cycle_status
+async def get_agent_cycle_status(db: Session = Depends(get_db)):
+    """Get current agent cycle status - identical from every worker"""
     
-    return {
-        "status": "success",
-        "cycle_running": agent_cycle_running,
-        "cycle_status": agent_cycle_status,
-        "uptime_seconds": 0 if not agent_cycle_running else 300  # Mock uptime
-    }
+    try:
+        state = await run_blocking(AgentCoordinator(db).get_cycle_state)
+        return {"status": "success", **state}
+        
+    except Exception as e:
+        logger.error(f"Error getting agent cycle status: {e}")
+        return {
+            "status": "error",
+            "cycle_running": False,
+            "cycle_status": "unknown",
+            "uptime_seconds": 0,
+            "message": str(e)
+        }
+
+async def renew_shards_periodically(shard: CustomerShard, stop_event: asyncio.Event):
+    """Keep the shard leases alive while a (possibly long) sweep is running"""
+    while not stop_event.is_set():
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=config.AGENT_LEASE_TTL / 3)
+        except asyncio.TimeoutError:
+            db = next(get_db())
+            try:
+                if not await run_blocking(AgentCoordinator(db).renew_shards, shard):
+                    logger.warning(f"⚠️ Lost a lease for {shard} during cycle - another worker will take over")
+            finally:
+                db.close()
+
+async def heartbeat_job_periodically(job_id: str, stop_event: asyncio.Event):
+    """Keep a running job from being failed as stale while a slow step (e.g. an LLM call) runs"""
+    while not stop_event.is_set():
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=config.AGENT_JOB_HEARTBEAT_SECONDS)
+        except asyncio.TimeoutError:
+            db = next(get_db())
+            try:
+                await run_blocking(AgentJobQueue(db).heartbeat, job_id)
+            finally:
+                db.close()
+
+# Background job types and the functions that run them: fn(db, progress) -> result dict
+JOB_RUNNERS = {TRIGGER_JOB: run_agent_trigger}
+
+async def run_queued_jobs():
+    """Run background jobs queued through the API (by any worker) until none are left.
+    Runs as its own task beside the supervisor loop, so a long trigger never holds up
+    lease renewal, customer events or sweeps."""
+    db = next(get_db())
+    try:
+        await _run_queued_jobs(db)
+    except Exception as e:
+        logger.error(f"Agent job runner error: {e}")
+    finally:
+        db.close()
+
+async def _run_queued_jobs(db: Session):
+    queue = AgentJobQueue(db)
+    while True:
+        job = await run_blocking(queue.claim_next)
+        if job is None:
+            return
+        
+        job_id = job["job_id"]
+        logger.info(f"🧾 Running agent job {job_id} ({job['job_type']}) on worker {WORKER_ID}")
+        stop_event = asyncio.Event()
+        heartbeat = asyncio.create_task(heartbeat_job_periodically(job_id, stop_event))
+        result, error = None, None
+        
+        try:
+            with trace(f"agent.{job['job_type']}", worker_id=WORKER_ID, job_id=job_id):
+                result = await run_blocking(JOB_RUNNERS[job["job_type"]], db, JobProgress(job_id))
+            if result.get("status") == "error":
+                error = result.get("message")
+        except Exception as e:
+            logger.error(f"Agent job {job_id} failed: {e}")
+            db.rollback()
+            error = str(e)
+        finally:
+            stop_event.set()
+            await heartbeat
+        
+        await run_blocking(queue.complete, job_id, result, error)
+
+async def process_shard(db: Session, shard: CustomerShard, events: Optional[List[Dict]]):
+    """Agent work for one shard: (new activities, refreshed analytics or None). Runs in the threadpool."""
+    agent = AutonomousCustomerSuccessAgent(db, shard=shard)
+    
+    if events is None:
+        # Reconciliation sweep over the whole slice
+        with trace("agent.sweep", worker_id=WORKER_ID, shard=str(shard)):
+            activities = await agent.process_customer_health_check()
+            with analytics_session() as analytics_db:
+                return activities, await TiDBService(analytics_db).get_churn_analytics()
+    
+    intervene_ids = [e["customer_id"] for e in events if e["type"] != INTERVENTION_COMPLETED]
+    rescore_ids = [e["customer_id"] for e in events if e["type"] == INTERVENTION_COMPLETED]
+    with trace("agent.events", worker_id=WORKER_ID, shard=str(shard), events=len(events)):
+        return await agent.process_customer_events(intervene_ids, rescore_ids), None
+
+async def run_agent_work_for_shard(db: Session, coordinator: AgentCoordinator, shard: CustomerShard,
+                                   events: Optional[List[Dict]] = None):
+    """Run a full health check sweep, or just react to a batch of events, over this worker's shards"""
+    global latest_activities, latest_analytics
+    
+    is_sweep = events is None
+    if is_sweep:
+        await run_blocking(coordinator.record_cycle_started)
+    
+    # The work runs in the threadpool, so lease renewal keeps running on the event loop meanwhile
+    stop_event = asyncio.Event()
+    heartbeat = asyncio.create_task(renew_shards_periodically(shard, stop_event))
+    error = None
+    activities = []
+    
+    try:
+        activities, analytics = await run_blocking(process_shard, db, shard, events)
+        
+        # Update worker-local state
+        if activities:
+            latest_activities.extend(activities[-5:])  # Add latest 5
+            latest_activities = latest_activities[-25:]  # Keep last 25
+            
+            logger.info(f"🤖 Agent {'sweep' if is_sweep else 'event batch'} ({shard}): {len(activities)} new interventions")
+        
+        if analytics is not None:
+            latest_analytics = analytics
+        
+    except Exception as e:
+        logger.error(f"Error in controlled agent loop: {e}")
+        db.rollback()
+        error = str(e)
+    finally:
+        stop_event.set()
+        await heartbeat
+    
+    if is_sweep:
+        await run_blocking(coordinator.record_cycle_completed, len(activities), error)
 
 async def run_controlled_agent_loop():
-    """Controlled agent loop that can be started/stopped from UI"""
-    global agent_cycle_running, latest_activities, latest_analytics
+    """Per-worker supervisor: reacts to agent events for the customer shards this worker holds,
+    with a slow periodic sweep as reconciliation"""
+    
+    logger.info(f"🤖 Agent supervisor started on worker {WORKER_ID}")
     
-    logger.info("🤖 Controlled agent monitoring loop started")
+    loop = asyncio.get_running_loop()
+    events_queue = event_bus.subscribe([CUSTOMER_METRICS_UPDATED, COMMUNICATION_RECEIVED, INTERVENTION_COMPLETED, AGENT_JOB_QUEUED])
+    shard = None
+    shard_claimed_at = 0.0
+    last_sweep_at = None
+    pending_events = []
+    jobs_task = None
     
     try:
-        while agent_cycle_running:
+        while True:
+            # Triggered runs don't depend on the cycle being enabled or on holding a shard
+            if jobs_task is None or jobs_task.done():
+                jobs_task = asyncio.create_task(run_queued_jobs())
+            
+            db = next(get_db())
+            
             try:
-                db = next(get_db())
-                agent = AutonomousCustomerSuccessAgent(db)
+                await run_blocking(prune_change_log, db)
+                await run_blocking(maintain_agent_jobs, db)
+                customer_events = [e for e in pending_events if e["type"] != AGENT_JOB_QUEUED]
                 
-                # Process customer health checks (limited for performance)
-                activities = await agent.process_customer_health_check()
+                coordinator = AgentCoordinator(db)
+                state = await run_blocking(coordinator.get_cycle_state)
                 
-                # Update global state
-                if activities:
-                    latest_activities.extend(activities[-5:])  # Add latest 5
-                    latest_activities = latest_activities[-25:]  # Keep last 25
-                    
-                    logger.info(f"🤖 Agent cycle: {len(activities)} new interventions")
+                if not state["cycle_enabled"]:
+                    # UI stopped the cycle - hand our shards back
+                    if state["owned_shards"]:
+                        await run_blocking(coordinator.release_all)
+                        logger.info("🏁 Agent monitoring cycle stopped on this worker")
+                    shard = None
+                    last_sweep_at = None
                 
-                # Update analytics
-                tidb_service = TiDBService(db)
-                latest_analytics = await tidb_service.get_churn_analytics()
+                else:
+                    # Renew/rebalance leases well before they expire
+                    if shard is None or loop.time() - shard_claimed_at >= config.AGENT_LEASE_TTL / 3:
+                        shard = await run_blocking(coordinator.claim_shards)
+                        shard_claimed_at = loop.time()
+                    
+                    if shard and (last_sweep_at is None or loop.time() - last_sweep_at >= config.AGENT_RECONCILE_INTERVAL):
+                        await run_agent_work_for_shard(db, coordinator, shard)
+                        last_sweep_at = loop.time()
+                    elif shard and customer_events:
+                        await run_agent_work_for_shard(db, coordinator, shard, events=customer_events)
                 
             except Exception as e:
-                logger.error(f"Error in controlled agent loop: {e}")
+                logger.error(f"Agent supervisor error: {e}")
+                db.rollback()
+            finally:
+                db.close()
             
-            # Wait 20 seconds before next cycle (faster than background loop)
-            await asyncio.sleep(20)
+            # Sleep until the next event batch, lease renewal or reconciliation sweep - whichever comes first
+            if shard:
+                timeout = config.AGENT_LEASE_TTL / 3
+                if last_sweep_at is not None:
+                    timeout = min(timeout, max(last_sweep_at + config.AGENT_RECONCILE_INTERVAL - loop.time(), 0))
+            else:
+                timeout = config.AGENT_STANDBY_POLL_INTERVAL
+            pending_events = await event_bus.collect_batch(events_queue, timeout)
             
     except asyncio.CancelledError:
-        logger.info("🛑 Controlled agent loop cancelled")
+        logger.info("🛑 Agent supervisor cancelled")
+        if jobs_task is not None:
+            jobs_task.cancel()
+        db = next(get_db())
+        try:
+            await run_blocking(AgentCoordinator(db).release_all)
+        finally:
+            db.close()
         raise
-    except Exception as e:
-        logger.error(f"Controlled agent loop error: {e}")
     finally:
-        agent_cycle_running = False
-        agent_cycle_status = "stopped"
-        logger.info("🏁 Controlled agent monitoring loop stopped")
+        event_bus.unsubscribe(events_queue)
 
 @app.post("/api/agent/reset-demo")
 async def reset_demo(db: Session = Depends(get_db)):
@@ -657,9 +1222,10 @@ async def reset_demo(db: Session = Depends(get_db)):
         logger.info("🔄 Starting complete demo reset...")
         
         # Execute complete data reset
-        result = await full_demo_reset(db)
+        result = await run_blocking(full_demo_reset, db)
         
         if result["status"] == "success":
+            dashboard_snapshot.invalidate()
             logger.info(f"✅ Demo reset complete: {result['customers_loaded']} customers, {result['patterns_loaded']} patterns, {result['memories_loaded']} memories, {result['communications_loaded']} communications")
             
             return {
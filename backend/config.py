@@ -21,6 +21,95 @@ class Config:
     CHURN_THRESHOLD = 0.75  # 75% churn probability triggers intervention
     HIGH_VALUE_THRESHOLD = 10000  # $10K+ annual value = high value customer
     INTERVENTION_TIMEOUT = 300  # 5 minutes to attempt intervention
+    AGENT_CYCLE_CAPACITY = int(os.getenv("AGENT_CYCLE_CAPACITY", 3))  # interventions per cycle, highest expected loss first
+    AGENT_SCHEDULER_LOOKAHEAD = 10  # candidates fetched per unit of capacity
+    LEARNING_BATCH_SIZE = 500  # intervention outcomes applied to retention patterns per transaction
+    PATTERN_DECAY = 0.95  # per-outcome decay of retention pattern success rates
+    PATTERN_PRIOR_WEIGHT = 2.0  # pseudo-attempts at a pattern's existing success_rate when counting starts
+    
+    # Communication search: "auto" uses the TiDB FULLTEXT index when present, "memory" forces the BM25 index
+    COMMUNICATION_SEARCH_BACKEND = os.getenv("COMMUNICATION_SEARCH_BACKEND", "auto")
+    COMMUNICATION_INDEX_MAX_CUSTOMERS = 5000  # customers whose posting lists stay in memory
+    COMMUNICATION_INDEX_REFRESH_SECONDS = float(os.getenv("COMMUNICATION_INDEX_REFRESH_SECONDS", 30))  # catch-up on other workers' writes, per customer
+    SENTIMENT_BACKFILL_CHUNK_SIZE = int(os.getenv("SENTIMENT_BACKFILL_CHUNK_SIZE", 2000))  # rows re-scored per commit
+    BULK_INGEST_CHUNK_SIZE = int(os.getenv("BULK_INGEST_CHUNK_SIZE", 1000))  # communications inserted per commit
+    BULK_INGEST_MAX_LINE_BYTES = int(os.getenv("BULK_INGEST_MAX_LINE_BYTES", 1024 * 1024))  # longer lines are rejected
+    
+    # Customer relationship graph (services/customer_graph.py)
+    CUSTOMER_GRAPH_SYNC_SECONDS = 5  # catch-up on changed customers/outcomes at most this often
+    CUSTOMER_GRAPH_REBUILD_SECONDS = 3600  # full rebuild drops deleted rows
+    CUSTOMER_GRAPH_NEIGHBOUR_LIMIT = 10
+    
+    # Multi-hop retention graph traversal (services/graph_traversal.py)
+    GRAPH_MAX_CUSTOMER_DEGREE = 20  # nearest same-company / similar-profile neighbours linked per customer
+    GRAPH_PPR_ALPHA = 0.15  # teleport probability back to the seed customer
+    GRAPH_PPR_EPSILON = 1e-4  # push threshold per unit of out-weight
+    GRAPH_PPR_SCORE_BUDGET = 0.9  # stop once this share of the probability mass is settled
+    GRAPH_PPR_MAX_PUSHES = 20000
+    GRAPH_MAX_VISITED_NODES = 10000  # k-hop BFS cut-off
+    GRAPH_MIN_REBUILD_SECONDS = 30
+    GRAPH_MAX_AGE_SECONDS = 300
+    
+    # EXPLAIN-based check of hot queries (services/index_advisor.py)
+    INDEX_ADVISOR_ON_STARTUP = os.getenv("INDEX_ADVISOR_ON_STARTUP", "true").lower() == "true"
+    INDEX_ADVISOR_MIN_ROWS = 1000  # full scans of smaller tables are not flagged
+    
+    # Connection pools (models/database.py); the agent's transactional work uses the primary pool
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+    DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))  # seconds a checkout waits before failing
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 300))  # below TiDB Serverless's idle connection cut-off
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    
+    # Read-only analytical queries (dashboard aggregates, analytics, graph builds) use a separate engine:
+    # a replica endpoint if ANALYTICS_DATABASE_URL is set, otherwise the primary with its own pool
+    ANALYTICS_DATABASE_URL = os.getenv("ANALYTICS_DATABASE_URL")
+    ANALYTICS_READ_ENGINES = os.getenv("ANALYTICS_READ_ENGINES", "tiflash,tikv")  # tidb_isolation_read_engines
+    ANALYTICS_TIFLASH_REPLICAS = int(os.getenv("ANALYTICS_TIFLASH_REPLICAS", 0))  # set on startup when > 0
+    ANALYTICS_POOL_SIZE = int(os.getenv("ANALYTICS_POOL_SIZE", 5))
+    ANALYTICS_MAX_OVERFLOW = int(os.getenv("ANALYTICS_MAX_OVERFLOW", 5))
+    
+    # Blocking SQLAlchemy work runs in a threadpool sized to the connection pool (services/db_offload.py)
+    DB_THREADPOOL_SIZE = int(os.getenv("DB_THREADPOOL_SIZE", 40))  # pool_size + max_overflow of both pools
+    
+    # Dashboard push stream (services/dashboard_stream.py)
+    DASHBOARD_STREAM_INTERVAL = float(os.getenv("DASHBOARD_STREAM_INTERVAL", 5))  # max seconds between refreshes while subscribed
+    DASHBOARD_STREAM_KEEPALIVE = 15  # seconds of silence before a keepalive comment
+    DASHBOARD_STREAM_HISTORY = 500  # events kept for Last-Event-ID resume
+    DASHBOARD_STREAM_QUEUE_SIZE = 100  # per-subscriber backlog before it is coalesced into a resync
+    DASHBOARD_CHANGE_LOG_SETTLE_SECONDS = 5  # changes younger than this are re-sent on the next delta
+    DASHBOARD_CHANGE_LOG_RETENTION_HOURS = 24  # clients further behind get a full resync
+    DASHBOARD_CHANGE_LOG_PRUNE_INTERVAL = 600
+    DASHBOARD_SNAPSHOT_MAX_AGE = float(os.getenv("DASHBOARD_SNAPSHOT_MAX_AGE", 2))  # seconds a snapshot is served from cache
+    
+    # Agent cycle tracing (services/tracing.py)
+    TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", 200))  # recent traces kept in memory
+    TRACE_SLOW_BUFFER_SIZE = 50  # slow traces kept separately so fast cycles can't evict them
+    TRACE_SLOW_CYCLE_SECONDS = float(os.getenv("TRACE_SLOW_CYCLE_SECONDS", 20))  # traces at least this long are logged in full
+    TRACE_MAX_SPANS = 5000  # per trace; further spans are counted but not kept
+    
+    # On-demand profiling of an agent run (services/profiler.py, /api/admin/profile)
+    PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"  # runs real agent work; enable per deployment
+    PROFILE_SAMPLE_INTERVAL_MS = 5  # stack sampling period
+    PROFILE_TRACEMALLOC_FRAMES = 1  # frames kept per allocation; sites are grouped by line
+    
+    # Multi-worker coordination
+    AGENT_LEASE_TTL = int(os.getenv("AGENT_LEASE_TTL", 60))  # seconds a lease stays valid without renewal
+    AGENT_STANDBY_POLL_INTERVAL = int(os.getenv("AGENT_STANDBY_POLL_INTERVAL", 5))  # seconds between lease attempts
+    AGENT_SHARD_COUNT = int(os.getenv("AGENT_SHARD_COUNT", 1))  # customers partitioned by customer_id % shards
+    
+    # Event-driven triggering
+    AGENT_RECONCILE_INTERVAL = int(os.getenv("AGENT_RECONCILE_INTERVAL", 300))  # seconds between full sweeps
+    AGENT_EVENT_DEBOUNCE_MS = 50  # quiet period that closes an event batch
+    AGENT_EVENT_MAX_DELAY_MS = 500  # upper bound on how long a batch can keep growing
+    AGENT_EVENT_MAX_BATCH = 500
+    AGENT_EVENT_QUEUE_SIZE = 10000
+    
+    # Background jobs behind /api/agent/trigger (services/agent_jobs.py)
+    AGENT_JOB_STALE_SECONDS = int(os.getenv("AGENT_JOB_STALE_SECONDS", 300))  # running job without a heartbeat is failed
+    AGENT_JOB_HEARTBEAT_SECONDS = 20
+    AGENT_JOB_RETENTION_HOURS = 72  # finished jobs kept for status polling
+    AGENT_JOB_MAINTENANCE_INTERVAL = 60  # how often each worker fails stale jobs and prunes old ones
     
     @property
     def DATABASE_URL(self):
@@ -1,14 +1,67 @@
 # backend/models/database.py
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text, JSON, Boolean
+from contextlib import contextmanager
+from datetime import datetime
+from sqlalchemy import create_engine, event, bindparam, Column, Integer, String, Float, DateTime, Text, JSON, Boolean, Index, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.sql import func
+from models.pool_metrics import InstrumentedQueuePool, instrument_engine
 from config import config
+import logging
+
+logger = logging.getLogger(__name__)
 
 Base = declarative_base()
-engine = create_engine(config.DATABASE_URL, echo=False, pool_size=10, max_overflow=20)
+
+def _pool_options(pool_size: int, max_overflow: int) -> dict:
+    # Pre-ping and recycle so connections dropped by TiDB Serverless while idle are replaced, not handed out
+    return {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_pre_ping": config.DB_POOL_PRE_PING
+    }
+
+engine = create_engine(config.DATABASE_URL, echo=False, **_pool_options(config.DB_POOL_SIZE, config.DB_MAX_OVERFLOW))
+instrument_engine(engine, "primary")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Tables analytical queries read; given TiFlash replicas when ANALYTICS_TIFLASH_REPLICAS > 0
+ANALYTICS_TABLES = ["customers", "churn_interventions", "agent_activities", "retention_patterns"]
+TIDB_READ_ENGINES = {"tiflash", "tikv", "tidb"}
+
+def _create_analytics_engine():
+    """Engine for read-only analytical work, so heavy aggregations don't compete with the agent's
+    writes for pooled connections, and on TiDB are served from TiFlash's column store"""
+    analytics = create_engine(
+        config.ANALYTICS_DATABASE_URL or config.DATABASE_URL, echo=False,
+        **_pool_options(config.ANALYTICS_POOL_SIZE, config.ANALYTICS_MAX_OVERFLOW)
+    )
+    read_engines = ",".join(
+        name for name in (part.strip().lower() for part in config.ANALYTICS_READ_ENGINES.split(","))
+        if name in TIDB_READ_ENGINES
+    )
+
+    if analytics.dialect.name == "mysql" and read_engines:
+        @event.listens_for(analytics, "connect")
+        def set_read_engines(dbapi_connection, connection_record):
+            # With tikv listed as well, the optimizer still uses the row store where TiFlash has no replica
+            cursor = dbapi_connection.cursor()
+            try:
+                cursor.execute(f"SET SESSION tidb_isolation_read_engines = '{read_engines}'")
+            except Exception as e:
+                logger.warning(f"Analytics connection is not TiDB, read engine routing disabled: {e}")
+            finally:
+                cursor.close()
+
+    return analytics
+
+analytics_engine = _create_analytics_engine()
+instrument_engine(analytics_engine, "analytics")
+AnalyticsSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=analytics_engine)
+
 class Customer(Base):
     __tablename__ = "customers"
     
@@ -43,6 +96,13 @@ class Customer(Base):
     
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        Index("ix_customers_churn_probability", "churn_probability"),  # at-risk lists and scheduler
+        Index("ix_customers_company", "company"),  # same-company relationships
+        Index("ix_customers_plan_acv", "subscription_plan", "annual_contract_value"),  # similar profiles
+        Index("ix_customers_updated_at", "updated_at"),  # customer graph catch-up
+    )
 
 class ChurnIntervention(Base):
     __tablename__ = "churn_interventions"
@@ -68,9 +128,18 @@ class ChurnIntervention(Base):
     revenue_at_risk = Column(Float, nullable=False)
     estimated_retention_value = Column(Float, nullable=False)
     actual_outcome = Column(String(50))  # retained, churned, pending
+    patterns_learned_at = Column(DateTime)  # set once the outcome has been applied to retention patterns
     
     created_at = Column(DateTime, server_default=func.now())
     completed_at = Column(DateTime)
+    
+    __table_args__ = (
+        # Active-intervention anti-join in detect_churn_risks
+        Index("ix_churn_interventions_customer_status_created", "customer_id", "status", "created_at"),
+        Index("ix_churn_interventions_status_completed", "status", "completed_at"),  # follow-ups
+        Index("ix_churn_interventions_outcome_learned", "actual_outcome", "patterns_learned_at"),  # learning, graph sync, saves
+        Index("ix_churn_interventions_created_at", "created_at"),  # recent interventions and analytics
+    )
 
 class AgentActivity(Base):
     __tablename__ = "agent_activities"
@@ -86,6 +155,10 @@ class AgentActivity(Base):
     status = Column(String(50), default="active")
     activity_metadata = Column(JSON)
     created_at = Column(DateTime, server_default=func.now())
+    
+    __table_args__ = (
+        Index("ix_agent_activities_created_at", "created_at"),  # activity feeds, newest first
+    )
 
 class RetentionPattern(Base):
     __tablename__ = "retention_patterns"
@@ -93,7 +166,8 @@ class RetentionPattern(Base):
     id = Column(Integer, primary_key=True, index=True)
     pattern_name = Column(String(255), nullable=False)
     customer_characteristics = Column(JSON)  # Common traits of customers who were saved
-    successful_interventions = Column(JSON)  # What worked
+    successful_interventions = Column(JSON)  # What worked (seeded patterns)
+    strategy = Column(String(100))  # learned patterns: listed as successful once retention_pattern_stats counts a success
     success_rate = Column(Float, default=0.0)
     
     # Pattern metadata
@@ -106,6 +180,41 @@ class RetentionPattern(Base):
     
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        # Lets concurrent learners create the same new pattern without duplicating it
+        Index("ux_retention_patterns_name_segment", "pattern_name", "customer_segment", unique=True),
+    )
+
+# Numeric customer traits tracked per retention pattern (sum and sum of squares columns below)
+PATTERN_STAT_FEATURES = [
+    "churn_probability", "annual_contract_value", "feature_usage_score", "nps_score", "support_tickets_count"
+]
+
+class RetentionPatternStats(Base):
+    __tablename__ = "retention_pattern_stats"
+    
+    pattern_id = Column(Integer, primary_key=True)  # retention_patterns.id
+    
+    # Outcome counters, updated with atomic SQL increments
+    attempt_count = Column(Integer, default=0)
+    success_count = Column(Integer, default=0)
+    decayed_attempts = Column(Float, default=0.0)  # exponentially decayed, newest outcomes weigh most
+    decayed_successes = Column(Float, default=0.0)
+    
+    # Running sums give means and variances of the customers the pattern was applied to
+    churn_probability_sum = Column(Float, default=0.0)
+    churn_probability_sum_sq = Column(Float, default=0.0)
+    annual_contract_value_sum = Column(Float, default=0.0)
+    annual_contract_value_sum_sq = Column(Float, default=0.0)
+    feature_usage_score_sum = Column(Float, default=0.0)
+    feature_usage_score_sum_sq = Column(Float, default=0.0)
+    nps_score_sum = Column(Float, default=0.0)
+    nps_score_sum_sq = Column(Float, default=0.0)
+    support_tickets_count_sum = Column(Float, default=0.0)
+    support_tickets_count_sum_sq = Column(Float, default=0.0)
+    
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
 class AgentMemory(Base):
     __tablename__ = "agent_memory"
@@ -120,6 +229,11 @@ class AgentMemory(Base):
     embedding = Column(JSON)
     
     created_at = Column(DateTime, server_default=func.now())
+    
+    __table_args__ = (
+        Index("ix_agent_memory_customer_type", "customer_id", "interaction_type"),
+        Index("ix_agent_memory_type_timestamp", "interaction_type", "timestamp"),
+    )
 
 class CustomerCommunication(Base):
     __tablename__ = "customer_communications"
@@ -134,8 +248,240 @@ class CustomerCommunication(Base):
     
     created_at = Column(DateTime, server_default=func.now())
     
+    __table_args__ = (
+        Index("ix_customer_communications_customer_id", "customer_id", "communication_id"),  # search index loads
+    )
+
+class AgentLease(Base):
+    __tablename__ = "agent_leases"
+    
+    lease_name = Column(String(255), primary_key=True)  # agent_shard:<count>:<index> or agent_worker:<id>
+    holder_id = Column(String(255))  # worker currently holding the lease
+    acquired_at = Column(DateTime)
+    renewed_at = Column(DateTime)
+    expires_at = Column(DateTime)
+
+class AgentCycleState(Base):
+    __tablename__ = "agent_cycle_state"
+    
+    id = Column(Integer, primary_key=True)
+    cycle_enabled = Column(Boolean, default=False)  # desired state, set from the UI
+    cycle_status = Column(String(20), default="stopped")  # stopped, starting, running, stopping
+    enabled_at = Column(DateTime)
+    
+    # Last completed cycle, as reported by the leader
+    last_cycle_worker = Column(String(255))
+    last_cycle_started_at = Column(DateTime)
+    last_cycle_completed_at = Column(DateTime)
+    last_cycle_activities = Column(Integer, default=0)
+    last_error = Column(Text)
+    
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+class DashboardChange(Base):
+    __tablename__ = "dashboard_changes"
+    
+    # Change log behind the since= delta endpoints; id is the version clients sync from
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    entity_type = Column(String(20), nullable=False)  # activity, customer, or reset (entity_id = first safe version)
+    entity_id = Column(Integer, nullable=False)
+    changed_at = Column(DateTime, server_default=func.now())
+    
+    __table_args__ = (
+        Index("ix_dashboard_changes_type_id", "entity_type", "id"),  # deltas and the resync floor
+        Index("ix_dashboard_changes_changed_at", "changed_at", "id"),  # settled version and pruning
+        # Ids are versions, so they must be allocated in order across TiDB nodes, not from per-node caches
+        {"mysql_auto_id_cache": "1"},
+    )
+    
+class AgentJob(Base):
+    __tablename__ = "agent_jobs"
+    
+    # Background agent runs queued by the API and executed by a worker's agent supervisor
+    id = Column(String(36), primary_key=True)  # uuid, returned to the client as job_id
+    job_type = Column(String(50), nullable=False)
+    status = Column(String(20), nullable=False, default="queued")  # queued, running, succeeded, failed
+    active_key = Column(String(50), unique=True)  # job_type while queued/running, NULL after: one active job per type
+    worker_id = Column(String(255))
+    progress = Column(JSON)  # {"total", "completed", "customers": [{customer_id, name, status, ...}]}
+    result = Column(JSON)
+    error = Column(Text)
+    created_at = Column(DateTime, server_default=func.now())
+    started_at = Column(DateTime)
+    heartbeat_at = Column(DateTime)  # a running job not heard from in AGENT_JOB_STALE_SECONDS is failed
+    finished_at = Column(DateTime)
+    
+    __table_args__ = (
+        Index("ix_agent_jobs_status_created", "status", "created_at"),  # claiming the oldest queued job
+        Index("ix_agent_jobs_finished_at", "finished_at"),  # pruning
+    )
+    
+# create_all() only creates missing tables, so indexes/columns added to existing tables go here.
+# Statements must be idempotent (TiDB supports IF NOT EXISTS for both).
+SCHEMA_UPGRADES = [
+    "CREATE INDEX IF NOT EXISTS ix_churn_interventions_customer_status_created "
+    "ON churn_interventions (customer_id, status, created_at)",
+    "ALTER TABLE churn_interventions ADD COLUMN IF NOT EXISTS patterns_learned_at DATETIME",
+    "ALTER TABLE retention_patterns ADD COLUMN IF NOT EXISTS strategy VARCHAR(100)",
+    "CREATE INDEX IF NOT EXISTS ix_customers_churn_probability ON customers (churn_probability)",
+    "CREATE INDEX IF NOT EXISTS ix_customers_company ON customers (company)",
+    "CREATE INDEX IF NOT EXISTS ix_customers_plan_acv ON customers (subscription_plan, annual_contract_value)",
+    "CREATE INDEX IF NOT EXISTS ix_customers_updated_at ON customers (updated_at)",
+    "CREATE INDEX IF NOT EXISTS ix_churn_interventions_status_completed ON churn_interventions (status, completed_at)",
+    "CREATE INDEX IF NOT EXISTS ix_churn_interventions_outcome_learned "
+    "ON churn_interventions (actual_outcome, patterns_learned_at)",
+    "CREATE INDEX IF NOT EXISTS ix_churn_interventions_created_at ON churn_interventions (created_at)",
+    "CREATE INDEX IF NOT EXISTS ix_agent_activities_created_at ON agent_activities (created_at)",
+    "CREATE INDEX IF NOT EXISTS ix_agent_memory_customer_type ON agent_memory (customer_id, interaction_type)",
+    "CREATE INDEX IF NOT EXISTS ix_agent_memory_type_timestamp ON agent_memory (interaction_type, timestamp)",
+    "CREATE INDEX IF NOT EXISTS ix_customer_communications_customer_id "
+    "ON customer_communications (customer_id, communication_id)",
+]
+
 def create_tables():
     Base.metadata.create_all(bind=engine)
+    apply_schema_upgrades()
+    ensure_retention_pattern_unique_index()
+    upgrade_dashboard_changes_id_cache()
+    if config.ANALYTICS_TIFLASH_REPLICAS > 0:
+        configure_tiflash_replicas(config.ANALYTICS_TIFLASH_REPLICAS)
+
+def apply_schema_upgrades():
+    with engine.connect() as connection:
+        for statement in SCHEMA_UPGRADES:
+            try:
+                connection.execute(text(statement))
+                connection.commit()
+            except Exception as e:
+                logger.warning(f"Schema upgrade failed ({statement[:60]}...): {e}")
+                connection.rollback()
+
+@contextmanager
+def schema_lock(connection, name: str, timeout: int = 60):
+    """Named server-wide lock (GET_LOCK) serialising a startup migration across workers"""
+    if not connection.execute(text("SELECT GET_LOCK(:name, :timeout)"), {"name": name, "timeout": timeout}).scalar():
+        raise RuntimeError(f"Timed out waiting for schema lock {name}")
+    try:
+        yield
+    finally:
+        connection.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": name})
+
+def ensure_retention_pattern_unique_index():
+    """Learners rely on this index to create a pattern at most once, so unlike SCHEMA_UPGRADES a
+    failure here stops startup. Duplicates left from before it existed are merged first."""
+    with engine.connect() as connection:
+        # One worker at a time, or two would both add the same duplicates' counters to the kept row
+        with schema_lock(connection, "retention_patterns_dedupe"):
+            merged = merge_duplicate_retention_patterns(connection)
+            if merged:
+                logger.warning(f"⚠️ Merged {merged} duplicate retention patterns")
+            connection.execute(text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS ux_retention_patterns_name_segment "
+                "ON retention_patterns (pattern_name, customer_segment)"
+            ))
+            connection.commit()
+
+def merge_duplicate_retention_patterns(connection) -> int:
+    """Fold every (pattern_name, customer_segment) duplicate into the oldest row, adding up their
+    outcome counters. Returns the number of rows removed."""
+    counters = [column.name for column in RetentionPatternStats.__table__.columns
+                if column.name not in ("pattern_id", "updated_at")]
+    groups = connection.execute(text("""
+        SELECT pattern_name, customer_segment, MIN(id) AS keep_id
+        FROM retention_patterns
+        WHERE customer_segment IS NOT NULL
+        GROUP BY pattern_name, customer_segment
+        HAVING COUNT(*) > 1
+    """)).fetchall()
+
+    removed = 0
+    for group in groups:
+        duplicate_ids = [row.id for row in connection.execute(text("""
+            SELECT id FROM retention_patterns
+            WHERE pattern_name = :name AND customer_segment = :segment AND id != :keep_id
+        """), {"name": group.pattern_name, "segment": group.customer_segment, "keep_id": group.keep_id})]
+
+        stats = connection.execute(
+            text("SELECT * FROM retention_pattern_stats WHERE pattern_id IN :ids").bindparams(bindparam("ids", expanding=True)),
+            {"ids": duplicate_ids}
+        ).mappings().fetchall()
+        if stats:
+            totals = {column: sum(row[column] or 0 for row in stats) for column in counters}
+            kept = connection.execute(
+                text("UPDATE retention_pattern_stats SET "
+                     + ", ".join(f"{column} = {column} + :{column}" for column in counters)
+                     + ", updated_at = :now WHERE pattern_id = :keep_id"),
+                {**totals, "now": datetime.now(), "keep_id": group.keep_id}
+            ).rowcount
+            if not kept:
+                connection.execute(
+                    text(f"INSERT INTO retention_pattern_stats (pattern_id, {', '.join(counters)}, updated_at) "
+                         f"VALUES (:keep_id, {', '.join(':' + column for column in counters)}, :now)"),
+                    {**totals, "now": datetime.now(), "keep_id": group.keep_id}
+                )
+            connection.execute(text("""
+                UPDATE retention_patterns
+                SET success_rate = (SELECT decayed_successes / decayed_attempts FROM retention_pattern_stats
+                                    WHERE pattern_id = :keep_id AND decayed_attempts > 0)
+                WHERE id = :keep_id AND EXISTS (SELECT 1 FROM retention_pattern_stats
+                                                WHERE pattern_id = :keep_id AND decayed_attempts > 0)
+            """), {"keep_id": group.keep_id})
+
+        for table, column in [("retention_pattern_stats", "pattern_id"), ("retention_patterns", "id")]:
+            connection.execute(
+                text(f"DELETE FROM {table} WHERE {column} IN :ids").bindparams(bindparam("ids", expanding=True)),
+                {"ids": duplicate_ids}
+            )
+        removed += len(duplicate_ids)
+
+    connection.commit()
+    return removed
+
+def upgrade_dashboard_changes_id_cache():
+    """TiDB can't ALTER AUTO_ID_CACHE between 1 and other values, so a change log created before
+    it was set is recreated. Ids continue past the old ones and a reset marker (see
+    services.change_log) makes clients synced from the old table reload."""
+    with engine.connect() as connection:
+        try:
+            if "tidb" not in (connection.execute(text("SELECT VERSION()")).scalar() or "").lower():
+                return
+            if _has_auto_id_cache(connection):
+                return
+            # Workers start together on a rollout: only one may recreate, and it must see the table
+            # as it is after any other worker's upgrade, or it would drop the new table
+            with schema_lock(connection, "dashboard_changes_upgrade"):
+                if not _has_auto_id_cache(connection):
+                    _recreate_dashboard_changes(connection)
+        except Exception as e:
+            logger.warning(f"Could not upgrade dashboard_changes to AUTO_ID_CACHE=1: {e}")
+            connection.rollback()
+
+def _has_auto_id_cache(connection) -> bool:
+    create_statement = connection.execute(text("SHOW CREATE TABLE dashboard_changes")).fetchone()[1]
+    return "AUTO_ID_CACHE=1" in create_statement
+
+def _recreate_dashboard_changes(connection):
+    last_id = connection.execute(text("SELECT MAX(id) FROM dashboard_changes")).scalar() or 0
+    connection.execute(text("DROP TABLE dashboard_changes"))
+    DashboardChange.__table__.create(connection)
+    connection.execute(text(f"ALTER TABLE dashboard_changes AUTO_INCREMENT = {int(last_id) + 1}"))
+    marker_id = connection.execute(text("""
+        INSERT INTO dashboard_changes (entity_type, entity_id, changed_at) VALUES ('reset', 0, NOW())
+    """)).lastrowid
+    connection.execute(text("UPDATE dashboard_changes SET entity_id = id WHERE id = :id"), {"id": marker_id})
+    connection.commit()
+    logger.info("🔧 Recreated dashboard_changes with AUTO_ID_CACHE=1")
+
+def configure_tiflash_replicas(replicas: int):
+    """Ask TiDB for columnar replicas of the analytical tables (no-op if already set)"""
+    with engine.connect() as connection:
+        for table in ANALYTICS_TABLES:
+            try:
+                connection.execute(text(f"ALTER TABLE {table} SET TIFLASH REPLICA {int(replicas)}"))
+                connection.commit()
+            except Exception as e:
+                logger.warning(f"Could not set TiFlash replica for {table}: {e}")
+                connection.rollback()
 
 def get_db():
     db = SessionLocal()
@@ -143,3 +489,19 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def get_analytics_db():
+    """Session for read-only analytical endpoints; may lag the primary slightly when it is a replica"""
+    db = AnalyticsSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+@contextmanager
+def analytics_session():
+    db = AnalyticsSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,145 @@
+# backend/models/pool_metrics.py
+import bisect
+import threading
+import time
+from typing import Dict, List
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+# Checkout wait buckets in seconds (upper bounds; a final +Inf bucket is implied)
+CHECKOUT_BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+class LatencyHistogram:
+    """Fixed-bucket histogram, cumulative like Prometheus's, safe to observe from any thread"""
+
+    def __init__(self, buckets: List[float]):
+        self.buckets = list(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += seconds
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        cumulative, running = [], 0
+        for bound, count in zip(self.buckets + [float("inf")], counts):
+            running += count
+            cumulative.append({"le": bound, "count": running})
+        return {"buckets": cumulative, "count": running, "sum": total}
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (inf if it is the overflow bucket)"""
+        with self._lock:
+            counts = list(self._counts)
+        total = sum(counts)
+        if not total:
+            return 0.0
+        running = 0
+        for bound, count in zip(self.buckets + [float("inf")], counts):
+            running += count
+            if running >= q * total:
+                return bound
+        return float("inf")
+
+class PoolMetrics:
+    """Counters for one engine's connection pool"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.checkout_wait = LatencyHistogram(CHECKOUT_BUCKETS)
+        self._lock = threading.Lock()
+        self.counters = {
+            "checkouts": 0,
+            "overflow_checkouts": 0,  # checkouts made while connections beyond pool_size were open
+            "checkout_timeouts": 0,
+            "connects": 0,
+            "invalidations": 0,  # failed pre-ping or disconnect errors
+            "closes": 0  # includes recycled connections
+        }
+        self.peak_in_use = 0
+
+    def increment(self, counter: str):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def record_checkout(self, in_use: int, overflow: bool):
+        with self._lock:
+            self.counters["checkouts"] += 1
+            if overflow:
+                self.counters["overflow_checkouts"] += 1
+            self.peak_in_use = max(self.peak_in_use, in_use)
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that times how long each checkout waits for a connection"""
+
+    metrics: PoolMetrics = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            if self.metrics:
+                self.metrics.increment("checkout_timeouts")
+            raise
+        if self.metrics:
+            self.metrics.checkout_wait.observe(time.perf_counter() - started)
+            self.metrics.record_checkout(self.checkedout(), self.overflow() > 0)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+pool_metrics: Dict[str, PoolMetrics] = {}
+
+def instrument_engine(engine, name: str) -> PoolMetrics:
+    """Attach pool metrics to an engine created with poolclass=InstrumentedQueuePool"""
+    metrics = pool_metrics[name] = PoolMetrics(name)
+    if isinstance(engine.pool, InstrumentedQueuePool):
+        engine.pool.metrics = metrics
+
+    event.listen(engine, "connect", lambda *args: metrics.increment("connects"))
+    event.listen(engine, "invalidate", lambda *args: metrics.increment("invalidations"))
+    event.listen(engine, "close", lambda *args: metrics.increment("closes"))
+    return metrics
+
+def pool_status(engine, metrics: PoolMetrics) -> Dict:
+    """Point-in-time pool occupancy plus the accumulated metrics, with a sizing hint"""
+    pool = engine.pool
+    status = {"name": metrics.name, "pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "pool_size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "in_use": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+        })
+
+    with metrics._lock:
+        status.update(metrics.counters)
+        status["peak_in_use"] = metrics.peak_in_use
+    status["checkout_wait"] = metrics.checkout_wait.snapshot()
+    status["checkout_wait_p95_seconds"] = metrics.checkout_wait.quantile(0.95)
+    status["recommendation"] = _sizing_hint(status)
+    return status
+
+def _sizing_hint(status: Dict) -> str:
+    if "pool_size" not in status or not status["checkouts"]:
+        return "no data yet"
+    if status["checkout_timeouts"]:
+        return "checkouts timed out - raise pool size/overflow or reduce concurrent database work"
+    if status["overflow_checkouts"] / status["checkouts"] > 0.1:
+        return f"overflow used on >10% of checkouts - consider pool_size >= {status['peak_in_use']}"
+    if status["peak_in_use"] < status["pool_size"] / 2:
+        return f"peak in-use {status['peak_in_use']} is under half the pool - pool_size could shrink"
+    return "pool size fits the observed load"
@@ -0,0 +1,279 @@
+# backend/services/agent_coordinator.py
+import os
+import math
+import socket
+import uuid
+import zlib
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+from sqlalchemy import text, true
+from datetime import datetime, timedelta
+from models.database import AgentCycleState
+from config import config
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Unique identity of this process (gunicorn worker / Cloud Run instance)
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+WORKER_LEASE_PREFIX = "agent_worker:"
+SHARD_LEASE_PREFIX = "agent_shard:"
+CYCLE_STATE_ID = 1
+
+class CustomerShard:
+    """Slice of the customer base owned by one worker: customer_id % count in indexes"""
+
+    def __init__(self, count: int, indexes: List[int]):
+        self.count = count
+        self.indexes = sorted(indexes)
+
+    def filter(self, customer_id_column):
+        """SQL predicate restricting a customer_id column to this slice"""
+        if self.count <= 1:
+            return true()
+        return (customer_id_column % self.count).in_(self.indexes)
+
+    def owns(self, customer_id: int) -> bool:
+        return self.count <= 1 or customer_id % self.count in self.indexes
+
+    def __repr__(self) -> str:
+        return f"shards {self.indexes} of {self.count}"
+
+class AgentCoordinator:
+    """DB-backed leases that partition the agent cycle across workers"""
+
+    def __init__(self, db: Session, worker_id: str = WORKER_ID):
+        self.db = db
+        self.worker_id = worker_id
+        self.shard_count = max(config.AGENT_SHARD_COUNT, 1)
+
+    async def try_acquire_lease(self, lease_name: str) -> bool:
+        """Acquire or renew a lease; returns True if this worker now holds it"""
+        now = datetime.now()
+
+        try:
+            self._ensure_lease_row(lease_name)
+
+            # acquired_at is assigned before holder_id so it still sees the previous holder
+            result = self.db.execute(text("""
+                UPDATE agent_leases
+                SET acquired_at = CASE WHEN holder_id = :worker_id THEN acquired_at ELSE :now END,
+                    holder_id = :worker_id,
+                    renewed_at = :now,
+                    expires_at = :expires_at
+                WHERE lease_name = :lease_name
+                  AND (holder_id = :worker_id OR holder_id IS NULL OR expires_at IS NULL OR expires_at < :now)
+            """), {
+                "worker_id": self.worker_id,
+                "lease_name": lease_name,
+                "now": now,
+                "expires_at": now + timedelta(seconds=config.AGENT_LEASE_TTL)
+            })
+            self.db.commit()
+            return result.rowcount == 1
+
+        except Exception as e:
+            logger.error(f"Error acquiring lease {lease_name}: {e}")
+            self.db.rollback()
+            return False
+
+    async def release_lease(self, lease_name: str) -> bool:
+        """Give up a lease held by this worker so another worker can take over immediately"""
+        try:
+            result = self.db.execute(text("""
+                UPDATE agent_leases
+                SET holder_id = NULL, expires_at = NULL
+                WHERE lease_name = :lease_name AND holder_id = :worker_id
+            """), {"lease_name": lease_name, "worker_id": self.worker_id})
+            self.db.commit()
+            return result.rowcount == 1
+
+        except Exception as e:
+            logger.error(f"Error releasing lease {lease_name}: {e}")
+            self.db.rollback()
+            return False
+
+    async def claim_shards(self) -> Optional[CustomerShard]:
+        """Heartbeat this worker and rebalance shard leases to a fair share of live workers"""
+        await self.try_acquire_lease(self._worker_lease_name())
+        self._purge_dead_workers()
+
+        live_workers = max(self._count_live_workers(), 1)
+        fair_share = math.ceil(self.shard_count / live_workers)
+        shard_leases = self._get_shard_leases()
+        now = datetime.now()
+
+        # Renew shards we already hold; hand back any above our fair share
+        owned = []
+        for index, lease in sorted(shard_leases.items()):
+            if lease["holder_id"] != self.worker_id:
+                continue
+            if len(owned) >= fair_share:
+                await self.release_lease(self._shard_lease_name(index))
+                logger.info(f"⚖️ Released shard {index}/{self.shard_count} for rebalancing ({live_workers} workers)")
+            elif await self.try_acquire_lease(self._shard_lease_name(index)):
+                owned.append(index)
+
+        # Pick up free or expired shards, starting at a worker-specific offset to spread contention
+        offset = zlib.crc32(self.worker_id.encode()) % self.shard_count
+        for step in range(self.shard_count):
+            if len(owned) >= fair_share:
+                break
+
+            index = (offset + step) % self.shard_count
+            if index in owned or self._is_live(shard_leases.get(index), now):
+                continue
+            if await self.try_acquire_lease(self._shard_lease_name(index)):
+                owned.append(index)
+                logger.info(f"👑 Worker {self.worker_id} acquired shard {index}/{self.shard_count}")
+
+        return CustomerShard(self.shard_count, owned) if owned else None
+
+    async def renew_shards(self, shard: CustomerShard) -> bool:
+        """Renew the leases backing a running cycle; False if any shard was lost"""
+        renewed = await self.try_acquire_lease(self._worker_lease_name())
+        for index in shard.indexes:
+            renewed = await self.try_acquire_lease(self._shard_lease_name(index)) and renewed
+        return renewed
+
+    async def release_all(self):
+        """Release every shard and the worker heartbeat held by this worker"""
+        for index, lease in self._get_shard_leases().items():
+            if lease["holder_id"] == self.worker_id:
+                await self.release_lease(self._shard_lease_name(index))
+        await self.release_lease(self._worker_lease_name())
+
+    async def set_cycle_enabled(self, enabled: bool) -> Dict:
+        """Record the desired cycle state; shard owners pick it up on their next poll"""
+        state = self._get_or_create_cycle_state()
+
+        state.cycle_enabled = enabled
+        state.cycle_status = "starting" if enabled else "stopping"
+        if enabled:
+            state.enabled_at = datetime.now()
+
+        self.db.commit()
+        return await self.get_cycle_state()
+
+    async def record_cycle_started(self):
+        state = self._get_or_create_cycle_state()
+        state.cycle_status = "running"
+        state.last_cycle_worker = self.worker_id
+        state.last_cycle_started_at = datetime.now()
+        self.db.commit()
+
+    async def record_cycle_completed(self, activities_count: int, error: Optional[str] = None):
+        state = self._get_or_create_cycle_state()
+        state.last_cycle_completed_at = datetime.now()
+        state.last_cycle_activities = activities_count
+        state.last_error = error
+        self.db.commit()
+
+    async def get_cycle_state(self) -> Dict:
+        """Cycle status as seen by any worker"""
+        state = self._get_or_create_cycle_state()
+        shard_leases = self._get_shard_leases()
+        now = datetime.now()
+
+        shards = []
+        for index in range(self.shard_count):
+            lease = shard_leases.get(index)
+            live = self._is_live(lease, now)
+            shards.append({
+                "index": index,
+                "holder_id": lease["holder_id"] if live else None,
+                "expires_at": lease["expires_at"].isoformat() if live else None
+            })
+
+        owned_by_any = any(s["holder_id"] for s in shards)
+
+        uptime_seconds = 0
+        if state.cycle_enabled and state.enabled_at:
+            uptime_seconds = int((now - state.enabled_at).total_seconds())
+
+        # Derived from live leases so a worker that died mid-transition cannot leave a stale status
+        if state.cycle_enabled:
+            cycle_status = "running" if owned_by_any else "starting"
+        else:
+            cycle_status = "stopping" if owned_by_any else "stopped"
+
+        return {
+            "cycle_enabled": bool(state.cycle_enabled),
+            "cycle_running": bool(state.cycle_enabled) and owned_by_any,
+            "cycle_status": cycle_status,
+            "uptime_seconds": uptime_seconds,
+            "workers_alive": self._count_live_workers(),
+            "shard_count": self.shard_count,
+            "shards": shards,
+            "this_worker": self.worker_id,
+            "owned_shards": [s["index"] for s in shards if s["holder_id"] == self.worker_id],
+            "last_cycle": {
+                "worker": state.last_cycle_worker,
+                "started_at": state.last_cycle_started_at.isoformat() if state.last_cycle_started_at else None,
+                "completed_at": state.last_cycle_completed_at.isoformat() if state.last_cycle_completed_at else None,
+                "activities": state.last_cycle_activities or 0,
+                "error": state.last_error
+            }
+        }
+
+    def _worker_lease_name(self) -> str:
+        return f"{WORKER_LEASE_PREFIX}{self.worker_id}"
+
+    def _shard_lease_name(self, index: int) -> str:
+        # Shard count is part of the name so resizing never mixes two partitionings
+        return f"{SHARD_LEASE_PREFIX}{self.shard_count}:{index}"
+
+    @staticmethod
+    def _is_live(lease: Optional[Dict], now: datetime) -> bool:
+        return bool(lease and lease["holder_id"] and lease["expires_at"] and lease["expires_at"] >= now)
+
+    def _get_shard_leases(self) -> Dict[int, Dict]:
+        prefix = f"{SHARD_LEASE_PREFIX}{self.shard_count}:"
+        result = self.db.execute(text("""
+            SELECT lease_name, holder_id, expires_at
+            FROM agent_leases
+            WHERE lease_name LIKE :prefix
+        """), {"prefix": f"{prefix}%"})
+
+        return {
+            int(row.lease_name[len(prefix):]): {"holder_id": row.holder_id, "expires_at": row.expires_at}
+            for row in result
+        }
+
+    def _count_live_workers(self) -> int:
+        return self.db.execute(text("""
+            SELECT COUNT(*) AS count
+            FROM agent_leases
+            WHERE lease_name LIKE :prefix AND expires_at >= :now
+        """), {"prefix": f"{WORKER_LEASE_PREFIX}%", "now": datetime.now()}).fetchone().count
+
+    def _purge_dead_workers(self):
+        """Worker ids are per-process, so heartbeat rows of dead workers would pile up"""
+        try:
+            self.db.execute(text("""
+                DELETE FROM agent_leases
+                WHERE lease_name LIKE :prefix AND (expires_at IS NULL OR expires_at < :cutoff)
+            """), {
+                "prefix": f"{WORKER_LEASE_PREFIX}%",
+                "cutoff": datetime.now() - timedelta(seconds=config.AGENT_LEASE_TTL * 10)
+            })
+            self.db.commit()
+        except Exception as e:
+            logger.warning(f"Could not purge dead worker leases: {e}")
+            self.db.rollback()
+
+    def _ensure_lease_row(self, lease_name: str):
+        self.db.execute(text(
+            "INSERT IGNORE INTO agent_leases (lease_name) VALUES (:lease_name)"
+        ), {"lease_name": lease_name})
+
+    def _get_or_create_cycle_state(self) -> AgentCycleState:
+        self.db.execute(text(
+            "INSERT IGNORE INTO agent_cycle_state (id, cycle_enabled, cycle_status) VALUES (:id, 0, 'stopped')"
+        ), {"id": CYCLE_STATE_ID})
+
+        # Always read the latest row - other workers change it
+        return self.db.query(AgentCycleState).populate_existing().filter(
+            AgentCycleState.id == CYCLE_STATE_ID
+        ).one()
@@ -0,0 +1,217 @@
+# backend/services/agent_jobs.py
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from models.database import SessionLocal, AgentJob
+from services.agent_coordinator import WORKER_ID
+from config import config
+import logging
+
+logger = logging.getLogger(__name__)
+
+TRIGGER_JOB = "trigger"
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+_last_maintained = 0.0
+
+class AgentJobQueue:
+    """DB-backed queue of background agent runs; any worker's supervisor may claim a job"""
+
+    def __init__(self, db: Session, worker_id: str = WORKER_ID):
+        self.db = db
+        self.worker_id = worker_id
+
+    async def enqueue(self, job_type: str, retry: bool = True) -> Tuple[Optional[Dict], bool]:
+        """(job, created): an already queued/running job of the same type is returned instead of a new one.
+        (None, False) if the active slot stayed contended after one retry."""
+        job = AgentJob(id=str(uuid.uuid4()), job_type=job_type, status=QUEUED, active_key=job_type,
+                       created_at=datetime.now())
+        try:
+            self.db.add(job)
+            self.db.commit()
+            logger.info(f"🧾 Queued agent job {job.id} ({job_type})")
+            return self._to_dict(job), True
+        except IntegrityError:
+            # Unique active_key: another request (possibly on another worker) got there first
+            self.db.rollback()
+            existing = self.db.query(AgentJob).filter(AgentJob.active_key == job_type).first()
+            if existing is not None:
+                return self._to_dict(existing), False
+            if retry:  # finished in between - try once more
+                return await self.enqueue(job_type, retry=False)
+            logger.warning(f"⚠️ Could not queue agent job ({job_type}): active slot still contended")
+            return None, False
+
+    async def start(self, job_type: str) -> Optional[Dict]:
+        """Record a job this worker runs itself, outside the queue, as already running. It takes the
+        job type's active slot like a queued job would; None if one is already queued or running."""
+        now = datetime.now()
+        job = AgentJob(id=str(uuid.uuid4()), job_type=job_type, status=RUNNING, active_key=job_type,
+                       worker_id=self.worker_id, created_at=now, started_at=now, heartbeat_at=now)
+        try:
+            self.db.add(job)
+            self.db.commit()
+            logger.info(f"🧾 Started agent job {job.id} ({job_type}) on worker {self.worker_id}")
+            return self._to_dict(job)
+        except IntegrityError:
+            self.db.rollback()
+            return None
+
+    async def claim_next(self) -> Optional[Dict]:
+        """Mark the oldest queued job as running on this worker, or None if there is none"""
+        try:
+            candidates = self.db.execute(text("""
+                SELECT id FROM agent_jobs WHERE status = :queued ORDER BY created_at LIMIT 5
+            """), {"queued": QUEUED}).fetchall()
+
+            now = datetime.now()
+            for row in candidates:
+                claimed = self.db.execute(text("""
+                    UPDATE agent_jobs
+                    SET status = :running, worker_id = :worker_id, started_at = :now, heartbeat_at = :now
+                    WHERE id = :id AND status = :queued
+                """), {"running": RUNNING, "queued": QUEUED, "worker_id": self.worker_id, "now": now, "id": row.id})
+                self.db.commit()
+                if claimed.rowcount == 1:
+                    return await self.get(row.id)
+            return None
+
+        except Exception as e:
+            logger.error(f"Error claiming agent job: {e}")
+            self.db.rollback()
+            return None
+
+    async def heartbeat(self, job_id: str) -> bool:
+        try:
+            result = self.db.execute(text("""
+                UPDATE agent_jobs SET heartbeat_at = :now WHERE id = :id AND status = :running AND worker_id = :worker_id
+            """), {"now": datetime.now(), "id": job_id, "running": RUNNING, "worker_id": self.worker_id})
+            self.db.commit()
+            return result.rowcount == 1
+        except Exception as e:
+            logger.error(f"Error heartbeating agent job {job_id}: {e}")
+            self.db.rollback()
+            return False
+
+    async def complete(self, job_id: str, result: Optional[Dict], error: Optional[str] = None):
+        """Record the outcome and free the job type for the next trigger"""
+        try:
+            job = self.db.query(AgentJob).filter(AgentJob.id == job_id).first()
+            if job is None:
+                return
+            job.status = FAILED if error else SUCCEEDED
+            job.result = result
+            job.error = error
+            job.active_key = None
+            job.finished_at = datetime.now()
+            self.db.commit()
+            logger.info(f"🧾 Agent job {job_id} {job.status}")
+        except Exception as e:
+            logger.error(f"Error completing agent job {job_id}: {e}")
+            self.db.rollback()
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        job = self.db.query(AgentJob).filter(AgentJob.id == job_id).first()
+        return self._to_dict(job) if job else None
+
+    def _fail_stale_jobs(self):
+        """Running jobs whose worker stopped heartbeating (crash, redeploy) would block dedupe forever"""
+        try:
+            stale = self.db.execute(text("""
+                UPDATE agent_jobs
+                SET status = :failed, active_key = NULL, finished_at = :now,
+                    error = 'Worker stopped responding before the job finished'
+                WHERE status = :running AND heartbeat_at < :stale_before
+            """), {
+                "failed": FAILED,
+                "running": RUNNING,
+                "now": datetime.now(),
+                "stale_before": datetime.now() - timedelta(seconds=config.AGENT_JOB_STALE_SECONDS)
+            }).rowcount
+            self.db.commit()
+            if stale:
+                logger.warning(f"⚠️ Failed {stale} stale agent jobs")
+        except Exception as e:
+            logger.error(f"Error failing stale agent jobs: {e}")
+            self.db.rollback()
+
+    def _prune(self):
+        try:
+            self.db.execute(text("DELETE FROM agent_jobs WHERE finished_at < :cutoff"), {
+                "cutoff": datetime.now() - timedelta(hours=config.AGENT_JOB_RETENTION_HOURS)
+            })
+            self.db.commit()
+        except Exception as e:
+            logger.error(f"Error pruning agent jobs: {e}")
+            self.db.rollback()
+
+    def _to_dict(self, job: AgentJob) -> Dict:
+        return {
+            "job_id": job.id,
+            "job_type": job.job_type,
+            "status": job.status,
+            "worker_id": job.worker_id,
+            "progress": job.progress,
+            "result": job.result,
+            "error": job.error,
+            "created_at": job.created_at.isoformat() if job.created_at else None,
+            "started_at": job.started_at.isoformat() if job.started_at else None,
+            "finished_at": job.finished_at.isoformat() if job.finished_at else None
+        }
+
+def maintain_agent_jobs(db: Session):
+    """Fail stale jobs and drop old finished ones; called from the agent supervisor, at most
+    once per AGENT_JOB_MAINTENANCE_INTERVAL per worker"""
+    global _last_maintained
+    now = time.monotonic()
+    if now - _last_maintained < config.AGENT_JOB_MAINTENANCE_INTERVAL:
+        return
+    _last_maintained = now
+
+    queue = AgentJobQueue(db)
+    queue._fail_stale_jobs()
+    queue._prune()
+
+class JobProgress:
+    """Per-customer progress of a running job, written through its own session so pollers see
+    it while the job's own transaction is still open. Called from the job's worker thread."""
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.customers: List[Dict] = []
+
+    def start(self, customers: List[Dict]):
+        """customers: [{"customer_id", "name"}] in processing order"""
+        self.customers = [{**customer, "status": "pending"} for customer in customers]
+        self._save()
+
+    def update(self, customer_id: int, status: str, **detail):
+        for customer in self.customers:
+            if customer["customer_id"] == customer_id:
+                customer.update(status=status, **detail)
+        self._save()
+
+    def _save(self):
+        progress = {
+            "total": len(self.customers),
+            "completed": sum(1 for customer in self.customers if customer["status"] in ("done", "failed")),
+            "customers": self.customers
+        }
+        db = SessionLocal()
+        try:
+            db.query(AgentJob).filter(AgentJob.id == self.job_id).update(
+                {"progress": progress, "heartbeat_at": datetime.now()}, synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            logger.error(f"Error saving progress for agent job {self.job_id}: {e}")
+            db.rollback()
+        finally:
+            db.close()
@@ -3,20 +3,31 @@ import json
 import numpy as np
 from typing import List, Dict, Optional, Tuple
 from sqlalchemy.orm import Session
+from sqlalchemy import update
 from datetime import datetime, timedelta
 from models.database import Customer, ChurnIntervention, AgentActivity, RetentionPattern
 from services.tidb_service import TiDBService, generate_semantic_embedding
 from services.llm_service import LLMService
 from services.notification_service import NotificationService
 from services.churn_predictor import ChurnPredictor
+from services.agent_coordinator import CustomerShard
+from services.intervention_scheduler import InterventionScheduler
+from services.event_bus import event_bus, INTERVENTION_COMPLETED
+from services.customer_graph import customer_graph, customer_segment
+from services.tracing import span
+from services.metrics import (
+    stage_timer, record_intervention,
+    PREDICTION_REFRESH, DETECTION, CONTEXT_RETRIEVAL, LLM, NOTIFICATION, FOLLOW_UP, LEARNING
+)
 from config import config
 import logging
 
 logger = logging.getLogger(__name__)
 
 class AutonomousCustomerSuccessAgent:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, shard: Optional[CustomerShard] = None):
         self.db = db
+        self.shard = shard or CustomerShard(1, [0])  # default: the whole customer base
         self.tidb_service = TiDBService(db)
         self.llm_service = LLMService()
         self.notification_service = NotificationService()
@@ -27,29 +38,62 @@ class AutonomousCustomerSuccessAgent:
         activities = []
         
         # Step 1: Update churn predictions for all active customers
-        customers_updated = await self.update_churn_predictions()
+        with stage_timer(PREDICTION_REFRESH):
+            customers_updated = await self.update_churn_predictions()
         
         # Step 2: Detect high-risk customers needing intervention
-        high_risk_customers = await self.detect_churn_risks()
+        with stage_timer(DETECTION):
+            high_risk_customers = await self.detect_churn_risks()
         
         # Step 3: Process interventions for each high-risk customer
         for customer in high_risk_customers:
-            intervention_result = await self.execute_autonomous_intervention(customer)
+            with span("agent.intervention", customer_id=customer.id):
+                intervention_result = await self.execute_autonomous_intervention(customer)
             if intervention_result:
                 activities.append(intervention_result)
         
         # Step 4: Follow up on existing interventions
-        follow_up_results = await self.follow_up_interventions()
+        with stage_timer(FOLLOW_UP):
+            follow_up_results = await self.follow_up_interventions()
         activities.extend(follow_up_results)
         
         # Step 5: Learn from completed interventions
-        await self.update_retention_patterns()
+        with stage_timer(LEARNING):
+            await self.update_retention_patterns()
         
         return activities
     
-    async def update_churn_predictions(self) -> int:
-        """Update churn predictions for all customers"""
-        customers = self.db.query(Customer).all()
+    async def process_customer_events(self, intervene_customer_ids: List[int],
+                                      rescore_customer_ids: List[int] = None) -> List[Dict]:
+        """Event-driven path - re-score and intervene only for customers that just changed"""
+        activities = []
+        
+        intervene_ids = sorted({cid for cid in intervene_customer_ids if cid and self.shard.owns(cid)})
+        rescore_ids = sorted({cid for cid in (rescore_customer_ids or []) if cid and self.shard.owns(cid)} | set(intervene_ids))
+        if not rescore_ids:
+            return activities
+        
+        with stage_timer(PREDICTION_REFRESH):
+            await self.update_churn_predictions(customer_ids=rescore_ids)
+        
+        # Completed interventions are only re-scored, so the agent's own events never loop back into new interventions
+        if intervene_ids:
+            with stage_timer(DETECTION):
+                high_risk_customers = await self.detect_churn_risks(customer_ids=intervene_ids)
+            for customer in high_risk_customers:
+                with span("agent.intervention", customer_id=customer.id):
+                    intervention_result = await self.execute_autonomous_intervention(customer)
+                if intervention_result:
+                    activities.append(intervention_result)
+        
+        return activities
+    
+    async def update_churn_predictions(self, customer_ids: Optional[List[int]] = None) -> int:
+        """Update churn predictions for all customers in this agent's shard (or just the given ones)"""
+        query = self.db.query(Customer).filter(self.shard.filter(Customer.id))
+        if customer_ids is not None:
+            query = query.filter(Customer.id.in_(customer_ids))
+        customers = query.all()
         updated_count = 0
         
         for customer in customers:
@@ -82,79 +126,70 @@ class AutonomousCustomerSuccessAgent:
         logger.info(f"Updated churn predictions for {updated_count} customers")
         return updated_count
     
-    async def detect_churn_risks(self) -> List[Customer]:
+    async def detect_churn_risks(self, customer_ids: Optional[List[int]] = None) -> List[Customer]:
         """Detect customers at high risk of churning who need immediate intervention"""
         
-        # Find customers with high churn probability who don't have recent interventions
-        high_risk_customers = self.db.query(Customer).filter(
-            Customer.churn_probability >= config.CHURN_THRESHOLD
-        ).limit(3).all()  # ← LIMIT TO 3 CUSTOMERS PER CYCLE
-        
-        # Filter out customers who already have active interventions
-        customers_needing_intervention = []
-        for customer in high_risk_customers:
-            recent_intervention = self.db.query(ChurnIntervention).filter(
-                ChurnIntervention.customer_id == customer.id,
-                ChurnIntervention.status.in_(["pending", "executing"]),
-                ChurnIntervention.created_at >= datetime.now() - timedelta(hours=24)
-            ).first()
-            
-            if not recent_intervention:
-                customers_needing_intervention.append(customer)
+        # Highest expected loss first, excluding customers with active interventions
+        scheduler = InterventionScheduler(self.db, shard=self.shard)
+        await scheduler.load_candidates(churn_threshold=config.CHURN_THRESHOLD, customer_ids=customer_ids)
+        customers_needing_intervention = scheduler.next_batch(config.AGENT_CYCLE_CAPACITY)
         
         logger.info(f"Found {len(customers_needing_intervention)} customers needing intervention")
-        return customers_needing_intervention[:3]  # Extra safety limit
+        return customers_needing_intervention
     
     async def execute_autonomous_intervention(self, customer: Customer) -> Optional[Dict]:
         """Execute autonomous intervention for a high-risk customer"""
         
         try:
 
-            # Step 1: Find similar successful retention cases using TiDB vector search
-            similar_cases = await self.tidb_service.find_similar_retention_cases(
-                customer_embedding=customer.behavior_embedding,
-                customer_segment=self._get_customer_segment(customer),
-                churn_probability=customer.churn_probability
-            )
+            with stage_timer(CONTEXT_RETRIEVAL):
+                # Step 1: Find similar successful retention cases using TiDB vector search
+                similar_cases = await self.tidb_service.find_similar_retention_cases(
+                    customer_embedding=customer.behavior_embedding,
+                    customer_segment=self._get_customer_segment(customer),
+                    churn_probability=customer.churn_probability
+                )
 
 
-            # Step 1.5: GET THE ENHANCED DATA (ADD THIS)
-            # Generate embedding for enhanced analysis
-            customer_text = f"company:{customer.company} segment:{self._get_customer_segment(customer)} plan:{customer.subscription_plan}"
-            context_embedding = generate_semantic_embedding(customer_text, dimension=768)
-            
-            # Get enhanced data
-            agent_memories = await self.tidb_service.retrieve_agent_memory(
-                customer_id=customer.id,
-                interaction_type="churn_intervention",
-                context_embedding=context_embedding,
-                limit=5
-            )
+                # Step 1.5: GET THE ENHANCED DATA (ADD THIS)
+                # Generate embedding for enhanced analysis
+                customer_text = f"company:{customer.company} segment:{self._get_customer_segment(customer)} plan:{customer.subscription_plan}"
+                context_embedding = generate_semantic_embedding(customer_text, dimension=768)
             
-            communications = []
-            churn_factors = ["billing", "support", "feature", "competitor", "pricing"]
-            for factor in churn_factors:
-                comms = await self.tidb_service.full_text_search_communications(
+                # Get enhanced data
+                agent_memories = await self.tidb_service.retrieve_agent_memory(
                     customer_id=customer.id,
-                    search_terms=factor
+                    interaction_type="churn_intervention",
+                    context_embedding=context_embedding,
+                    limit=5
                 )
-                communications.extend(comms)
             
-            relationships = await self.tidb_service.graph_rag_customer_relationships(customer.id)
+                communications = []
+                churn_factors = ["billing", "support", "feature", "competitor", "pricing"]
+                for factor in churn_factors:
+                    comms = await self.tidb_service.full_text_search_communications(
+                        customer_id=customer.id,
+                        search_terms=factor
+                    )
+                    communications.extend(comms)
+            
+                relationships = await self.tidb_service.graph_rag_customer_relationships(customer.id)
                         
 
             # Step 2: Use LLM to choose optimal intervention strategy
-            intervention_strategy = await self.llm_service.analyze_enhanced_retention_strategy(
-                customer_profile=self._build_customer_profile(customer),
-                agent_memories=agent_memories,      # Now passing enhanced data
-                communications=communications,       # Now passing enhanced data
-                relationships=relationships,         # Now passing enhanced data                
-                churn_probability=customer.churn_probability,
-                similar_cases=similar_cases
-            )
+            with stage_timer(LLM):
+                intervention_strategy = await self.llm_service.analyze_enhanced_retention_strategy(
+                    customer_profile=self._build_customer_profile(customer),
+                    agent_memories=agent_memories,      # Now passing enhanced data
+                    communications=communications,       # Now passing enhanced data
+                    relationships=relationships,         # Now passing enhanced data                
+                    churn_probability=customer.churn_probability,
+                    similar_cases=similar_cases
+                )
             
             if intervention_strategy['confidence'] < 0.6:
                 logger.info(f"Low confidence intervention for {customer.name}, skipping")
+                record_intervention("low_confidence")
                 return None
 
             # Step 3: Create intervention record
@@ -177,7 +212,8 @@ class AutonomousCustomerSuccessAgent:
             self.db.refresh(intervention)
 
             # Step 4: Execute intervention with self-correction
-            execution_result = await self.execute_intervention_with_correction(intervention, customer)
+            with stage_timer(NOTIFICATION):
+                execution_result = await self.execute_intervention_with_correction(intervention, customer)
 
             # Step 5: Log activity
             activity = AgentActivity(
@@ -196,6 +232,7 @@ class AutonomousCustomerSuccessAgent:
             
             self.db.add(activity)
             self.db.commit()
+            record_intervention("executed")
 
             return {
                 "type": "churn_intervention",
@@ -211,6 +248,7 @@ class AutonomousCustomerSuccessAgent:
             
         except Exception as e:
             logger.error(f"Error executing intervention for customer {customer.id}: {e}")
+            record_intervention("failed")
             return None
     
     async def execute_intervention_with_correction(self, intervention: ChurnIntervention, customer: Customer) -> Dict:
@@ -252,6 +290,7 @@ class AutonomousCustomerSuccessAgent:
         intervention.completed_at = datetime.now()
         
         self.db.commit()
+        event_bus.publish(INTERVENTION_COMPLETED, customer.id, {"intervention_id": intervention.id, "status": intervention.status})
         
         return {
             "intervention_id": intervention.id,
@@ -309,95 +348,107 @@ class AutonomousCustomerSuccessAgent:
     async def follow_up_interventions(self) -> List[Dict]:
         """Follow up on existing interventions and check their effectiveness"""
         
-        # Find interventions that need follow-up (completed in last 24-48 hours)
-        interventions_to_follow_up = self.db.query(ChurnIntervention).filter(
+        # One joined fetch: interventions completed 24-48 hours ago plus their customers' model features
+        rows = self.db.query(
+            ChurnIntervention.id,
+            ChurnIntervention.customer_id,
+            ChurnIntervention.strategy_chosen,
+            ChurnIntervention.churn_probability_before,
+            Customer.name,
+            Customer.annual_contract_value,
+            Customer.days_since_signup,
+            Customer.last_login_days_ago,
+            Customer.support_tickets_count,
+            Customer.feature_usage_score,
+            Customer.nps_score,
+            Customer.payment_delays,
+            Customer.monthly_revenue
+        ).join(
+            Customer, Customer.id == ChurnIntervention.customer_id
+        ).filter(
             ChurnIntervention.status.in_(["successful", "failed"]),
+            ChurnIntervention.patterns_learned_at.is_(None),  # outcome is final once learned from
             ChurnIntervention.completed_at >= datetime.now() - timedelta(hours=48),
-            ChurnIntervention.completed_at <= datetime.now() - timedelta(hours=24)
+            ChurnIntervention.completed_at <= datetime.now() - timedelta(hours=24),
+            self.shard.filter(ChurnIntervention.customer_id)
         ).all()
         
-        follow_up_results = []
-        
-        for intervention in interventions_to_follow_up:
-            customer = self.db.query(Customer).filter(Customer.id == intervention.customer_id).first()
-            if not customer:
-                continue
-            
-            # Check if customer's churn risk improved
-            new_churn_probability = self.churn_predictor.predict_churn_probability({
-                'days_since_signup': customer.days_since_signup,
-                'last_login_days_ago': customer.last_login_days_ago,
-                'support_tickets_count': customer.support_tickets_count,
-                'feature_usage_score': customer.feature_usage_score,
-                'nps_score': customer.nps_score,
-                'payment_delays': customer.payment_delays,
-                'monthly_revenue': customer.monthly_revenue
-            })
-            
-            # Update intervention outcome
-            intervention.churn_probability_after = new_churn_probability
-            
-            probability_improvement = intervention.churn_probability_before - new_churn_probability
-            
-            if probability_improvement > 0.1:  # Significant improvement
-                intervention.actual_outcome = "retained"
-                outcome_status = "success"
-            elif probability_improvement > -0.05:  # Stable
-                intervention.actual_outcome = "stable"
-                outcome_status = "partial_success"
-            else:  # Worsened
-                intervention.actual_outcome = "at_risk"
-                outcome_status = "needs_escalation"
-            
-            follow_up_results.append({
-                "type": "intervention_follow_up",
-                "intervention_id": intervention.id,
-                "customer": customer.name,
-                "outcome": outcome_status,
-                "probability_before": intervention.churn_probability_before,
-                "probability_after": new_churn_probability,
-                "improvement": probability_improvement,
-                "revenue_impact": customer.annual_contract_value if outcome_status == "success" else 0
-            })
+        if not rows:
+            return []
+        
+        # Check if customers' churn risk improved - one vectorized model call
+        new_probabilities = self.churn_predictor.predict_churn_probabilities([row._asdict() for row in rows])
+        probabilities_before = np.array([row.churn_probability_before for row in rows], dtype=float)
+        improvements = probabilities_before - new_probabilities
         
+        # Significant improvement / stable / worsened
+        conditions = [improvements > 0.1, improvements > -0.05]
+        actual_outcomes = np.select(conditions, ["retained", "stable"], default="at_risk")
+        outcome_statuses = np.select(conditions, ["success", "partial_success"], default="needs_escalation")
+        
+        # Bulk update by primary key (executemany)
+        self.db.execute(update(ChurnIntervention), [
+            {
+                "id": row.id,
+                "churn_probability_after": float(new_probabilities[i]),
+                "actual_outcome": str(actual_outcomes[i])
+            }
+            for i, row in enumerate(rows)
+        ])
         self.db.commit()
-        return follow_up_results
+        
+        for i, row in enumerate(rows):
+            customer_graph.record_intervention_outcome(row.id, row.customer_id, row.strategy_chosen, str(actual_outcomes[i]))
+        
+        return [
+            {
+                "type": "intervention_follow_up",
+                "intervention_id": row.id,
+                "customer": row.name,
+                "outcome": str(outcome_statuses[i]),
+                "probability_before": row.churn_probability_before,
+                "probability_after": float(new_probabilities[i]),
+                "improvement": float(improvements[i]),
+                "revenue_impact": row.annual_contract_value if outcome_statuses[i] == "success" else 0
+            }
+            for i, row in enumerate(rows)
+        ]
     
     async def update_retention_patterns(self):
-        """Learn from intervention outcomes and update success patterns"""
+        """Learn from intervention outcomes not yet applied to retention patterns"""
         
-        # Get recent completed interventions with outcomes
-        completed_interventions = self.db.query(ChurnIntervention).filter(
+        # Outcomes that have not been learned yet, with their customers, in one query
+        new_outcomes = self.db.query(ChurnIntervention, Customer).join(
+            Customer, Customer.id == ChurnIntervention.customer_id
+        ).filter(
             ChurnIntervention.actual_outcome.isnot(None),
-            ChurnIntervention.completed_at >= datetime.now() - timedelta(days=7)
-        ).all()
+            ChurnIntervention.patterns_learned_at.is_(None),
+            ChurnIntervention.completed_at >= datetime.now() - timedelta(days=7),
+            self.shard.filter(ChurnIntervention.customer_id)
+        ).order_by(ChurnIntervention.completed_at).limit(config.LEARNING_BATCH_SIZE).all()
         
-        for intervention in completed_interventions:
-            customer = self.db.query(Customer).filter(Customer.id == intervention.customer_id).first()
-            if not customer:
-                continue
-            
-            success = intervention.actual_outcome == "retained"
-            
-            # Update or create retention pattern via TiDBService
-            await self.tidb_service.update_retention_patterns(
-                customer_segment=self._get_customer_segment(customer),
-                intervention_type=intervention.intervention_type,
-                strategy=intervention.strategy_chosen,
-                success=success,
-                customer_characteristics=self._build_customer_profile(customer)
-            )
+        if not new_outcomes:
+            return
+        
+        # Aggregate per pattern in memory, keeping completion order
+        pattern_outcomes = {}
+        for intervention, customer in new_outcomes:
+            key = (self._get_customer_segment(customer), intervention.intervention_type, intervention.strategy_chosen)
+            pattern_outcomes.setdefault(key, []).append({
+                "success": intervention.actual_outcome == "retained",
+                "customer_characteristics": self._build_customer_profile(customer)
+            })
+        
+        applied = await self.tidb_service.apply_retention_outcomes(
+            pattern_outcomes,
+            intervention_ids=[intervention.id for intervention, _ in new_outcomes]
+        )
         
-        logger.info(f"Updated retention patterns based on {len(completed_interventions)} interventions")
+        logger.info(f"Updated {len(pattern_outcomes)} retention patterns from {applied} new intervention outcomes")
     
     def _get_customer_segment(self, customer: Customer) -> str:
         """Determine customer segment based on revenue and characteristics"""
-        if customer.annual_contract_value >= 50000:
-            return "enterprise"
-        elif customer.annual_contract_value >= 10000:
-            return "mid_market"
-        else:
-            return "smb"
+        return customer_segment(customer.annual_contract_value)
     
     def _build_customer_profile(self, customer: Customer) -> Dict:
         """Build comprehensive customer profile for analysis"""
@@ -678,6 +729,8 @@ class AutonomousCustomerSuccessAgent:
                 intervention.completed_at = datetime.now()
                 
                 self.db.commit()
+                customer_graph.record_intervention_outcome(intervention.id, customer.id, intervention.strategy_chosen, "retained")
+                event_bus.publish(INTERVENTION_COMPLETED, customer.id, {"intervention_id": intervention.id, "status": intervention.status})
                 
                 logger.info(f"🎯 {customer.name} risk updated: {old_probability:.0%} → {new_probability:.0%}")
 
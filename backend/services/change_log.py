@@ -0,0 +1,146 @@
+# backend/services/change_log.py
+import time
+from datetime import datetime, timedelta
+from typing import Dict
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+from models.database import SessionLocal, Customer, AgentActivity, DashboardChange
+from config import config
+import logging
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY = "activity"
+CUSTOMER = "customer"
+RESET = "reset"
+
+# Customer columns the dashboard shows (format_at_risk_customer); writes to anything else aren't logged
+DASHBOARD_CUSTOMER_COLUMNS = (
+    "name", "company", "email", "subscription_plan", "monthly_revenue", "annual_contract_value",
+    "churn_probability", "churn_risk_level", "last_login_days_ago", "support_tickets_count",
+    "feature_usage_score", "nps_score", "days_since_signup"
+)
+
+_last_pruned = 0.0
+
+def _dashboard_fields_changed(customer: Customer) -> bool:
+    state = inspect(customer)
+    for column in DASHBOARD_CUSTOMER_COLUMNS:
+        history = state.attrs[column].history
+        if not history.has_changes():
+            continue
+        if not history.deleted or history.deleted[0] != history.added[0]:
+            return True
+    return False
+
+def _load_old_value(target, value, oldvalue, initiator):
+    pass
+
+# active_history loads an expired column before it is assigned (e.g. after a commit), so writing
+# back the value it already had leaves no history instead of an unknown old value
+for _column in DASHBOARD_CUSTOMER_COLUMNS:
+    event.listen(getattr(Customer, _column), "set", _load_old_value, active_history=True)
+
+def record_dashboard_changes(session: Session, flush_context):
+    """after_flush hook: log new activities and new/deleted customers, and customers whose
+    dashboard-visible fields changed, in the same transaction"""
+    changes = []
+    for obj in session.new:
+        if isinstance(obj, AgentActivity):
+            changes.append({"entity_type": ACTIVITY, "entity_id": obj.id})
+        elif isinstance(obj, Customer):
+            changes.append({"entity_type": CUSTOMER, "entity_id": obj.id})
+    for obj in session.dirty:
+        if isinstance(obj, Customer) and _dashboard_fields_changed(obj):
+            changes.append({"entity_type": CUSTOMER, "entity_id": obj.id})
+    for obj in session.deleted:
+        if isinstance(obj, Customer):
+            changes.append({"entity_type": CUSTOMER, "entity_id": inspect(obj).identity[0]})
+
+    if changes:
+        session.connection().execute(DashboardChange.__table__.insert(), changes)
+
+event.listen(SessionLocal, "after_flush", record_dashboard_changes)
+
+def resync_floor(db: Session) -> int:
+    """Clients synced from a version below this may have missed changes and must reload"""
+    floor = db.execute(text("""
+        SELECT MAX(entity_id) FROM dashboard_changes WHERE entity_type = :reset
+    """), {"reset": RESET}).scalar()
+    return floor or 0
+
+def current_version(db: Session) -> int:
+    """Newest version that is safe to sync from.
+
+    Versions are auto-increment ids, so a transaction can commit a lower id after a higher one is
+    visible. Only changes older than DASHBOARD_CHANGE_LOG_SETTLE_SECONDS count; later ones are
+    simply sent again on the next delta, which clients apply idempotently."""
+    settled = db.execute(text("""
+        SELECT id FROM dashboard_changes
+        WHERE changed_at < :settled_before
+        ORDER BY changed_at DESC, id DESC
+        LIMIT 1
+    """), {"settled_before": datetime.now() - timedelta(seconds=config.DASHBOARD_CHANGE_LOG_SETTLE_SECONDS)}).scalar()
+    return max(settled or 0, resync_floor(db))
+
+def changes_since(db: Session, entity_type: str, since: int) -> Dict:
+    """Entity ids changed after `since`, newest change first, or full_resync when the log can't tell"""
+    version = current_version(db)
+    if since < resync_floor(db) or since > version:
+        return {"version": version, "full_resync": True, "entity_ids": []}
+
+    rows = db.execute(text("""
+        SELECT entity_id, MAX(id) AS last_change
+        FROM dashboard_changes
+        WHERE entity_type = :entity_type AND id > :since
+        GROUP BY entity_id
+        ORDER BY last_change DESC
+    """), {"entity_type": entity_type, "since": since}).fetchall()
+
+    return {"version": version, "full_resync": False, "entity_ids": [row.entity_id for row in rows]}
+
+def mark_reset(db: Session):
+    """Clear the log after a bulk reload; every client older than this point must reload.
+    Runs inside the caller's transaction.
+
+    The marker's own id is the floor: with AUTO_ID_CACHE=1 it is above every id handed out
+    before it on any node, which MAX(id)+1 read from this node's snapshot is not."""
+    db.execute(text("DELETE FROM dashboard_changes"))
+    marker_id = db.execute(text("""
+        INSERT INTO dashboard_changes (entity_type, entity_id, changed_at)
+        VALUES (:reset, 0, :now)
+    """), {"reset": RESET, "now": datetime.now()}).lastrowid
+    db.execute(text("UPDATE dashboard_changes SET entity_id = id WHERE id = :id"), {"id": marker_id})
+
+def prune_change_log(db: Session):
+    """Drop entries older than the retention window; called from the agent supervisor, at most
+    once per DASHBOARD_CHANGE_LOG_PRUNE_INTERVAL per worker"""
+    global _last_pruned
+    now = time.monotonic()
+    if now - _last_pruned < config.DASHBOARD_CHANGE_LOG_PRUNE_INTERVAL:
+        return
+    _last_pruned = now
+
+    try:
+        cutoff = datetime.now() - timedelta(hours=config.DASHBOARD_CHANGE_LOG_RETENTION_HOURS)
+        boundary = db.execute(text("""
+            SELECT id FROM dashboard_changes
+            WHERE changed_at < :cutoff AND entity_type != :reset
+            ORDER BY changed_at DESC, id DESC
+            LIMIT 1
+        """), {"cutoff": cutoff, "reset": RESET}).scalar()
+        if boundary is None:
+            return
+
+        # Replace everything up to the boundary (including older reset markers) with one marker
+        floor = max(boundary, resync_floor(db))
+        deleted = db.execute(text("DELETE FROM dashboard_changes WHERE id <= :boundary"), {"boundary": boundary}).rowcount
+        db.execute(text("""
+            INSERT INTO dashboard_changes (entity_type, entity_id, changed_at)
+            VALUES (:reset, :floor, :now)
+        """), {"reset": RESET, "floor": floor, "now": datetime.now()})
+        db.commit()
+        logger.info(f"🧹 Pruned {deleted} dashboard change log entries")
+    except Exception as e:
+        logger.error(f"Error pruning dashboard change log: {e}")
+        db.rollback()
@@ -69,6 +69,46 @@ class ChurnPredictor:
             logger.error(f"Error predicting churn: {e}")
             return 0.5  # Default moderate risk
     
+    def predict_churn_probabilities(self, customer_records: List[Dict]) -> np.ndarray:
+        """Vectorized predict_churn_probability: one model call for many customers"""
+        if not customer_records:
+            return np.zeros(0)
+        
+        try:
+            features_scaled = self.scaler.transform(self._extract_feature_matrix(customer_records))
+            probabilities = self.model.predict_proba(features_scaled)[:, 1]
+            return np.clip(probabilities, 0.0, 1.0)
+            
+        except Exception as e:
+            logger.error(f"Error predicting churn in batch: {e}")
+            return np.full(len(customer_records), 0.5)  # Default moderate risk
+    
+    def _extract_feature_matrix(self, customer_records: List[Dict]) -> np.ndarray:
+        """Column-wise version of _extract_features; missing/NULL values take the same defaults"""
+        def column(name: str, default: float) -> np.ndarray:
+            return np.array([
+                record.get(name) if record.get(name) is not None else default
+                for record in customer_records
+            ], dtype=float)
+        
+        days_since_signup = column('days_since_signup', 0)
+        support_tickets = column('support_tickets_count', 0)
+        feature_usage = column('feature_usage_score', 0.5)
+        monthly_revenue = column('monthly_revenue', 100)
+        
+        return np.column_stack([
+            days_since_signup,
+            column('last_login_days_ago', 0),
+            support_tickets,
+            feature_usage,
+            column('nps_score', 7),
+            column('payment_delays', 0),
+            np.log1p(monthly_revenue),
+            support_tickets * 30 / np.maximum(days_since_signup, 1),  # tickets per month
+            feature_usage - 0.5,  # usage trend
+            np.digitize(monthly_revenue, [50, 500])  # revenue tier 0/1/2
+        ])
+    
     def _extract_features(self, customer_data: Dict) -> List[float]:
         """Extract features from customer data"""
         features = []
@@ -0,0 +1,207 @@
+# backend/services/communication_ingest.py
+import csv
+import json
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from services.sentiment_analyzer import sentiment_analyzer
+from services.db_offload import run_blocking
+from config import config
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAX_REPORTED_ERRORS = 20
+
+INSERT_COMMUNICATIONS = text("""
+    INSERT INTO customer_communications (
+        customer_id, message_content, communication_type, communication_direction,
+        sentiment_score, timestamp
+    ) VALUES (
+        :customer_id, :message_content, :communication_type, :communication_direction,
+        :sentiment_score, :timestamp
+    )
+""")  # VALUES must stay plain placeholders so pymysql can rewrite executemany into one multi-row INSERT
+
+OVERSIZED_LINE = object()  # yielded by iter_lines in place of a line longer than the cap
+
+class CommunicationBulkWriter:
+    """Buffers parsed communications and writes them in chunks: one batch sentiment pass,
+    one multi-row executemany INSERT and one commit per chunk. Callers flush once `full`."""
+
+    def __init__(self, db: Session, chunk_size: int = None):
+        self.db = db
+        self.chunk_size = chunk_size or config.BULK_INGEST_CHUNK_SIZE
+        self._buffer: List[Dict] = []
+        self.inserted = 0
+        self.rejected = 0
+        self.chunks = 0
+        self.errors: List[str] = []
+
+    def add(self, record: Dict, line_number: int):
+        try:
+            self._buffer.append(self._normalize(record))
+        except (KeyError, TypeError, ValueError) as e:
+            self._reject(line_number, f"invalid record: {e}")
+
+    @property
+    def full(self) -> bool:
+        return len(self._buffer) >= self.chunk_size
+
+    def reject(self, line_number: int, reason: str):
+        self._reject(line_number, reason)
+
+    def flush(self):
+        if not self._buffer:
+            return
+
+        rows, self._buffer = self._buffer, []
+        scores = sentiment_analyzer.score_batch([row["message_content"] for row in rows])
+        for row, score in zip(rows, scores):
+            row["sentiment_score"] = float(score)
+
+        try:
+            self.db.execute(INSERT_COMMUNICATIONS, rows)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+        # No search index update needed: the index catches up on communication_id at the next search
+        self.inserted += len(rows)
+        self.chunks += 1
+
+    def summary(self) -> Dict:
+        return {
+            "inserted": self.inserted,
+            "rejected": self.rejected,
+            "chunks": self.chunks,
+            "errors": self.errors
+        }
+
+    def _reject(self, line_number: int, reason: str):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"line {line_number}: {reason}")
+
+    @staticmethod
+    def _normalize(record: Dict) -> Dict:
+        message = record.get("message_content") or record.get("message")
+        if not message:
+            raise ValueError("message_content is required")
+
+        timestamp = record.get("timestamp") or None
+        timestamp = datetime.fromisoformat(str(timestamp)) if timestamp else datetime.now()
+
+        return {
+            "customer_id": int(record["customer_id"]),
+            "message_content": str(message),
+            "communication_type": record.get("communication_type") or "email",
+            "communication_direction": record.get("communication_direction") or record.get("direction") or "inbound",
+            "timestamp": timestamp
+        }
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_bytes: int = None) -> AsyncIterator:
+    """Decode a byte stream into lines, holding at most one line of up to max_line_bytes in memory.
+    Longer lines are discarded as they stream in and yielded as OVERSIZED_LINE."""
+    limit = max_line_bytes or config.BULK_INGEST_MAX_LINE_BYTES
+    pending = b""
+    skipping = False  # inside an oversized line: drop bytes until its newline
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            if skipping:
+                skipping = False
+                yield OVERSIZED_LINE
+            elif len(line) > limit:
+                yield OVERSIZED_LINE
+            else:
+                yield line.decode("utf-8-sig").rstrip("\r")
+        if len(pending) > limit:
+            skipping = True
+            pending = b""
+    if skipping or len(pending) > limit:
+        yield OVERSIZED_LINE
+    elif pending:
+        yield pending.decode("utf-8-sig").rstrip("\r")
+
+async def ingest_communications(db: Session, chunks: AsyncIterator[bytes], data_format: str,
+                                chunk_size: Optional[int] = None) -> Dict:
+    """Stream NDJSON or CSV communications into customer_communications.
+
+    Bulk history loads do not publish agent events - the reconciliation sweep covers them."""
+    writer = CommunicationBulkWriter(db, chunk_size)
+    started = datetime.now()
+
+    if data_format == "csv":
+        await _ingest_csv(iter_lines(chunks), writer)
+    else:
+        await _ingest_ndjson(iter_lines(chunks), writer)
+    await run_blocking(writer.flush)
+
+    elapsed = (datetime.now() - started).total_seconds()
+    logger.info(f"📥 Bulk ingest: {writer.inserted} communications in {writer.chunks} chunks ({elapsed:.1f}s), {writer.rejected} rejected")
+    return {"format": data_format, "elapsed_seconds": round(elapsed, 2), **writer.summary()}
+
+async def _ingest_ndjson(lines: AsyncIterator[str], writer: CommunicationBulkWriter):
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if line is OVERSIZED_LINE:
+            writer.reject(line_number, f"line longer than {config.BULK_INGEST_MAX_LINE_BYTES} bytes")
+            continue
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            writer.reject(line_number, f"invalid JSON: {e}")
+            continue
+        if not isinstance(record, dict):
+            writer.reject(line_number, "expected a JSON object")
+            continue
+        writer.add(record, line_number)
+        if writer.full:
+            await run_blocking(writer.flush)  # scoring and the INSERT stay off the event loop
+
+async def _ingest_csv(lines: AsyncIterator[str], writer: CommunicationBulkWriter):
+    header = None
+    record_lines: List[str] = []
+    line_number = 0
+
+    async for line in lines:
+        line_number += 1
+        if line is OVERSIZED_LINE:
+            # Drops the whole record, including lines already buffered for an open quoted field
+            writer.reject(line_number, f"line longer than {config.BULK_INGEST_MAX_LINE_BYTES} bytes")
+            record_lines = []
+            continue
+        record_lines.append(line)
+
+        # A quoted field may span lines; the record is complete once its quotes balance
+        if sum(part.count('"') for part in record_lines) % 2:
+            continue
+
+        values = next(csv.reader(["\n".join(record_lines)]), [])
+        record_lines = []
+        if not values:
+            continue
+
+        if header is None:
+            header = [name.strip() for name in values]
+            if "customer_id" not in header:
+                raise ValueError("CSV header must include customer_id")
+            continue
+
+        # Trailing optional columns may be omitted, extra ones are an error
+        if len(values) > len(header):
+            writer.reject(line_number, f"expected at most {len(header)} columns, got {len(values)}")
+            continue
+        writer.add(dict(zip(header, values)), line_number)
+        if writer.full:
+            await run_blocking(writer.flush)
+
+    if record_lines:
+        writer.reject(line_number, "unterminated quoted field")
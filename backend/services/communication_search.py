@@ -0,0 +1,246 @@
+# backend/services/communication_search.py
+import math
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+from sqlalchemy import text, bindparam
+from services.metrics import CacheMetrics
+from config import config
+import logging
+
+logger = logging.getLogger(__name__)
+
+_cache_metrics = CacheMetrics("communication_postings")
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+# BM25 parameters (standard defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+SEARCH_COLUMNS = """communication_id, customer_id, message_content, communication_type,
+                   timestamp, sentiment_score, communication_direction"""
+
+def _stem(token: str) -> str:
+    """Light suffix stripping so "features", "feature" and "pricing"/"price" share a term"""
+    if len(token) > 4 and token.endswith("s") and not token.endswith("ss"):
+        token = token[:-1]
+    for suffix in ("ing", "ed"):
+        if len(token) > len(suffix) + 3 and token.endswith(suffix):
+            token = token[:-len(suffix)]
+            break
+    if len(token) > 4 and token.endswith("e"):
+        token = token[:-1]
+    return token
+
+def tokenize(message: str) -> List[str]:
+    """Lowercased, stemmed word tokens"""
+    return [_stem(token) for token in TOKEN_PATTERN.findall((message or "").lower())]
+
+class _CustomerPostings:
+    """Inverted index over one customer's communications, plus the result dicts it returns"""
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[int, int]] = {}  # term -> {communication_id: term frequency}
+        self.doc_lengths: Dict[int, int] = {}
+        self.total_length = 0
+        self.documents: Dict[int, Dict] = {}  # communication_id -> search result dict
+        self.checked_at = 0.0  # monotonic time of the last catch-up against the database
+
+    def add(self, document: Dict):
+        communication_id = document["communication_id"]
+        if communication_id in self.documents:
+            return
+        tokens = tokenize(document["message_content"])
+        for term, tf in Counter(tokens).items():
+            self.postings.setdefault(term, {})[communication_id] = tf
+        self.documents[communication_id] = document
+        self.doc_lengths[communication_id] = len(tokens)
+        self.total_length += len(tokens)
+
+    def remove(self, communication_id: int):
+        document = self.documents.pop(communication_id, None)
+        if document is None:
+            return
+        for term in set(tokenize(document["message_content"])):
+            term_postings = self.postings.get(term)
+            if term_postings is not None:
+                term_postings.pop(communication_id, None)
+                if not term_postings:
+                    del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(communication_id)
+
+    def score(self, terms: List[str]) -> Dict[int, float]:
+        """BM25 score of every communication matching at least one term"""
+        n = len(self.doc_lengths)
+        if not n:
+            return {}
+        avg_length = self.total_length / n or 1.0
+
+        scores: Dict[int, float] = {}
+        for term in set(terms):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for communication_id, tf in postings.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[communication_id] / avg_length)
+                scores[communication_id] = scores.get(communication_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return scores
+
+class CommunicationSearchIndex:
+    """Process-wide BM25 search over customer_communications.
+
+    Posting lists are built per customer on first search and kept in an LRU. Writes from this
+    process are added immediately. Writes from other workers are picked up by a catch-up at most
+    once per COMMUNICATION_INDEX_REFRESH_SECONDS per customer: a COUNT/MAX/SUM comparison, and on a
+    mismatch a diff of the customer's ids. Ids are not ordered across TiDB nodes, so no
+    high-water mark is used."""
+
+    def __init__(self, max_customers: int = None):
+        self.max_customers = max_customers or config.COMMUNICATION_INDEX_MAX_CUSTOMERS
+        self._customers: "OrderedDict[int, _CustomerPostings]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._native_available: Optional[bool] = None
+
+    def add_communication(self, communication):
+        """Incremental update after a write (a CustomerCommunication or row with SEARCH_COLUMNS);
+        customers not yet indexed load lazily on search"""
+        with self._lock:
+            postings = self._customers.get(communication.customer_id)
+            if postings is not None:
+                postings.add(self._to_dict(communication))
+
+    def invalidate(self, customer_ids: Optional[List[int]] = None):
+        """Drop indexed customers (all if None) so their next search rebuilds from the database"""
+        with self._lock:
+            if customer_ids is None:
+                self._customers.clear()
+            else:
+                for customer_id in customer_ids:
+                    self._customers.pop(customer_id, None)
+
+    def search(self, db: Session, customer_id: int, search_terms: str, limit: int = 10) -> List[Dict]:
+        """Ranked communications for one customer, native FULLTEXT when available, else BM25 in memory"""
+        if config.COMMUNICATION_SEARCH_BACKEND != "memory" and self._has_native_fulltext(db):
+            try:
+                return self._search_native(db, customer_id, search_terms, limit)
+            except Exception as e:
+                logger.warning(f"Native full-text search failed, using in-memory index: {e}")
+                db.rollback()
+                self._native_available = False
+
+        terms = tokenize(search_terms)
+        if not terms:
+            return []
+
+        postings = self._get_postings(db, customer_id)
+        with self._lock:
+            scores = postings.score(terms)
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))[:limit]
+            return [dict(postings.documents[communication_id]) for communication_id, _ in ranked]
+
+    def _get_postings(self, db: Session, customer_id: int) -> _CustomerPostings:
+        now = time.monotonic()
+        with self._lock:
+            postings = self._customers.get(customer_id)
+            if postings is not None:
+                self._customers.move_to_end(customer_id)
+                _cache_metrics.hit.inc()
+                if now - postings.checked_at < config.COMMUNICATION_INDEX_REFRESH_SECONDS:
+                    return postings
+                known_ids = set(postings.documents)
+            else:
+                _cache_metrics.miss.inc()
+
+        removed_ids = set()
+        if postings is None:
+            rows = db.execute(text(f"""
+                SELECT {SEARCH_COLUMNS} FROM customer_communications WHERE customer_id = :customer_id
+            """), {"customer_id": customer_id}).fetchall()
+        else:
+            check = db.execute(text("""
+                SELECT COUNT(*) AS count, MAX(communication_id) AS last_id, SUM(communication_id) AS id_sum
+                FROM customer_communications
+                WHERE customer_id = :customer_id
+            """), {"customer_id": customer_id}).fetchone()
+            rows = []
+            # The id sum catches an insert and a delete landing between two checks
+            if (check.count, check.last_id or 0, int(check.id_sum or 0)) != (len(known_ids), max(known_ids, default=0), sum(known_ids)):
+                # Rows written or deleted elsewhere - diff the id lists and fetch only what's new
+                stored_ids = {row.communication_id for row in db.execute(text("""
+                    SELECT communication_id FROM customer_communications WHERE customer_id = :customer_id
+                """), {"customer_id": customer_id})}
+                removed_ids = known_ids - stored_ids
+                new_ids = stored_ids - known_ids
+                if new_ids:
+                    rows = db.execute(text(f"""
+                        SELECT {SEARCH_COLUMNS}
+                        FROM customer_communications
+                        WHERE communication_id IN :communication_ids
+                    """).bindparams(bindparam("communication_ids", expanding=True)), {
+                        "communication_ids": list(new_ids)
+                    }).fetchall()
+
+        with self._lock:
+            postings = self._customers.get(customer_id)
+            if postings is None:
+                postings = _CustomerPostings()
+                self._customers[customer_id] = postings
+                while len(self._customers) > self.max_customers:
+                    self._customers.popitem(last=False)
+            for row in rows:
+                postings.add(self._to_dict(row))
+            for communication_id in removed_ids:
+                postings.remove(communication_id)
+            postings.checked_at = now
+        return postings
+
+    def _has_native_fulltext(self, db: Session) -> bool:
+        """Whether customer_communications has the FULLTEXT index from create_tidb_enhanced_tables"""
+        if self._native_available is None:
+            try:
+                count = db.execute(text("""
+                    SELECT COUNT(*) AS count
+                    FROM information_schema.statistics
+                    WHERE table_schema = DATABASE()
+                      AND table_name = 'customer_communications'
+                      AND index_type = 'FULLTEXT'
+                """)).fetchone().count
+                self._native_available = count > 0
+            except Exception as e:
+                logger.info(f"FULLTEXT index check failed, using in-memory index: {e}")
+                db.rollback()
+                self._native_available = False
+
+            logger.info(f"🔎 Communication search backend: {'native FULLTEXT' if self._native_available else 'in-memory BM25'}")
+        return self._native_available
+
+    def _search_native(self, db: Session, customer_id: int, search_terms: str, limit: int) -> List[Dict]:
+        rows = db.execute(text(f"""
+            SELECT {SEARCH_COLUMNS},
+                   MATCH(message_content) AGAINST (:search_terms IN NATURAL LANGUAGE MODE) AS relevance
+            FROM customer_communications
+            WHERE customer_id = :customer_id
+              AND MATCH(message_content) AGAINST (:search_terms IN NATURAL LANGUAGE MODE)
+            ORDER BY relevance DESC, communication_id DESC
+            LIMIT :limit
+        """), {"customer_id": customer_id, "search_terms": search_terms, "limit": limit})
+        return [self._to_dict(row) for row in rows]
+
+    @staticmethod
+    def _to_dict(row) -> Dict:
+        return {
+            "communication_id": row.communication_id,
+            "customer_id": row.customer_id,
+            "message_content": row.message_content,
+            "communication_type": row.communication_type,
+            "timestamp": row.timestamp.isoformat(),
+            "sentiment_score": row.sentiment_score,
+            "direction": row.communication_direction
+        }
+
+communication_search = CommunicationSearchIndex()
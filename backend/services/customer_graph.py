@@ -0,0 +1,243 @@
+# backend/services/customer_graph.py
+import heapq
+import math
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from config import config
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Same similarity rule as the old graph RAG query: same plan and ACV within this distance
+SIMILAR_ACV_DISTANCE = 10000
+
+GRAPH_EPOCH = datetime(1970, 1, 1)
+
+CUSTOMER_COLUMNS = "id, name, company, subscription_plan, annual_contract_value, churn_probability, updated_at"
+
+def acv_band(annual_contract_value: float) -> int:
+    """Band width equals the similarity distance, so similar customers are in this band or an adjacent one"""
+    return int(math.floor((annual_contract_value or 0.0) / SIMILAR_ACV_DISTANCE))
+
+def customer_segment(annual_contract_value: float) -> str:
+    """Revenue segment used to key retention patterns"""
+    if annual_contract_value >= 50000:
+        return "enterprise"
+    elif annual_contract_value >= 10000:
+        return "mid_market"
+    else:
+        return "smb"
+
+class CustomerGraph:
+    """Process-wide customer relationship graph.
+
+    Customers are bucketed by company and by (plan, ACV band), so neighbour lookups touch
+    only a customer's own buckets. The graph is built once from the database and then kept
+    current by catch-up queries on customers.updated_at and churn_interventions.patterns_learned_at,
+    with a periodic full rebuild to drop deleted rows."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._nodes: Dict[int, Dict] = {}
+        self._company_members: Dict[str, Set[int]] = {}
+        self._profile_buckets: Dict[Tuple[str, int], Set[int]] = {}
+        self._successful_strategies: Dict[int, Dict[str, int]] = {}  # customer -> strategy -> retained count
+        self._seen_interventions: Set[int] = set()
+        self._customer_watermark = None
+        self._intervention_watermark = None
+        self._built_at = 0.0
+        self._synced_at = 0.0
+        self.version = 0  # bumped on every structural change
+
+    def invalidate(self):
+        """Force a full rebuild on next use (after bulk deletes such as the demo reset)"""
+        with self._lock:
+            self._built_at = 0.0
+
+    def ensure_fresh(self, db: Session):
+        now = time.monotonic()
+        if not self._built_at or now - self._built_at > config.CUSTOMER_GRAPH_REBUILD_SECONDS:
+            self.rebuild(db)
+        elif now - self._synced_at > config.CUSTOMER_GRAPH_SYNC_SECONDS:
+            self.sync(db)
+
+    def rebuild(self, db: Session):
+        started = time.monotonic()
+        customers = db.execute(text(f"SELECT {CUSTOMER_COLUMNS} FROM customers")).fetchall()
+        interventions = db.execute(text("""
+            SELECT id, customer_id, strategy_chosen, patterns_learned_at
+            FROM churn_interventions
+            WHERE actual_outcome = 'retained' AND strategy_chosen IS NOT NULL
+        """)).fetchall()
+
+        with self._lock:
+            self._nodes.clear()
+            self._company_members.clear()
+            self._profile_buckets.clear()
+            self._successful_strategies.clear()
+            self._seen_interventions.clear()
+            self._customer_watermark = None
+            self._intervention_watermark = None
+
+            self._apply_customers(customers)
+            self._apply_interventions(interventions)
+
+            self._built_at = self._synced_at = time.monotonic()
+            self.version += 1
+
+        logger.info(f"🕸️ Customer graph built: {len(customers)} customers, {len(self._company_members)} companies, "
+                    f"{len(self._profile_buckets)} profile buckets ({(time.monotonic() - started) * 1000:.0f}ms)")
+
+    def sync(self, db: Session):
+        """Apply customers and retained interventions changed since the last sync.
+
+        Outcomes are final once learned from, so interventions are caught up on patterns_learned_at;
+        this process also records outcomes directly through record_intervention_outcome()."""
+        # >= so rows sharing the watermark second are not missed; re-applying a row is harmless
+        customers = db.execute(text(f"""
+            SELECT {CUSTOMER_COLUMNS} FROM customers WHERE updated_at >= :watermark
+        """), {"watermark": self._customer_watermark or GRAPH_EPOCH}).fetchall()
+
+        interventions = db.execute(text("""
+            SELECT id, customer_id, strategy_chosen, patterns_learned_at
+            FROM churn_interventions
+            WHERE patterns_learned_at >= :watermark AND actual_outcome = 'retained' AND strategy_chosen IS NOT NULL
+        """), {"watermark": self._intervention_watermark or GRAPH_EPOCH}).fetchall()
+
+        with self._lock:
+            self._apply_customers(customers)
+            self._apply_interventions(interventions)
+            self._synced_at = time.monotonic()
+
+    def update_customer(self, customer):
+        """Incremental update from an ORM Customer this process just changed"""
+        with self._lock:
+            if self._built_at:
+                # Local writes don't move the watermark, or they could skip other workers' older rows
+                self._apply_customers([customer], advance_watermark=False)
+
+    def record_intervention_outcome(self, intervention_id: int, customer_id: int,
+                                    strategy: Optional[str], outcome: Optional[str]):
+        with self._lock:
+            if self._built_at and outcome == "retained" and strategy:
+                self._add_successful_strategy(intervention_id, customer_id, strategy)
+
+    def get_relationships(self, customer_id: int, limit: int = None) -> Dict:
+        """Same-company and similar-profile neighbours, in graph_rag_customer_relationships format"""
+        limit = limit or config.CUSTOMER_GRAPH_NEIGHBOUR_LIMIT
+        relationships = {
+            "direct_relationships": [],
+            "similar_profile_customers": [],
+            "successful_strategies": []
+        }
+
+        with self._lock:
+            node = self._nodes.get(customer_id)
+            if node is None:
+                return relationships
+
+            direct = self._ranked(self._company_members.get(node["company"], set()) - {customer_id}, limit)
+            for neighbour_id in direct:
+                relationships["direct_relationships"].append(self._relationship(neighbour_id, "same_company"))
+
+            for neighbour_id in self._ranked(self.similar_profile_ids(customer_id), limit - len(direct)):
+                strategies = self._successful_strategies.get(neighbour_id)
+                if not strategies:
+                    relationships["similar_profile_customers"].append(self._relationship(neighbour_id, "similar_profile"))
+                    continue
+                for strategy in sorted(strategies, key=strategies.get, reverse=True):
+                    relationship_data = self._relationship(neighbour_id, "similar_profile")
+                    relationship_data["successful_strategy"] = strategy
+                    relationships["successful_strategies"].append(relationship_data)
+
+        return relationships
+
+    def similar_profile_ids(self, customer_id: int) -> Set[int]:
+        node = self._nodes[customer_id]
+        band = acv_band(node["annual_contract_value"])
+        similar = set()
+        for neighbour_band in (band - 1, band, band + 1):
+            for neighbour_id in self._profile_buckets.get((node["subscription_plan"], neighbour_band), ()):
+                neighbour = self._nodes[neighbour_id]
+                if neighbour_id != customer_id and abs(
+                        neighbour["annual_contract_value"] - node["annual_contract_value"]) < SIMILAR_ACV_DISTANCE:
+                    similar.add(neighbour_id)
+        return similar
+
+    def customer_rows(self) -> List[Tuple[int, str, str, float]]:
+        """(id, company, subscription_plan, annual_contract_value) for every customer, for graph snapshots"""
+        with self._lock:
+            return [
+                (customer_id, node["company"], node["subscription_plan"], node["annual_contract_value"])
+                for customer_id, node in self._nodes.items()
+            ]
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def _ranked(self, customer_ids, limit: int) -> List[int]:
+        """Highest churn risk first; partial sort so large buckets stay cheap"""
+        if limit <= 0:
+            return []
+        return heapq.nsmallest(limit, customer_ids, key=lambda cid: (-(self._nodes[cid]["churn_probability"] or 0.0), cid))
+
+    def _relationship(self, customer_id: int, relationship_type: str) -> Dict:
+        node = self._nodes[customer_id]
+        return {
+            "customer_id": customer_id,
+            "name": node["name"],
+            "company": node["company"],
+            "churn_probability": node["churn_probability"],
+            "relationship": relationship_type
+        }
+
+    def _apply_customers(self, rows, advance_watermark: bool = True):
+        for row in rows:
+            customer_id = row.id
+            previous = self._nodes.get(customer_id)
+            node = {
+                "name": row.name,
+                "company": row.company,
+                "subscription_plan": row.subscription_plan,
+                "annual_contract_value": row.annual_contract_value or 0.0,
+                "churn_probability": row.churn_probability
+            }
+
+            profile_key = (node["subscription_plan"], acv_band(node["annual_contract_value"]))
+            if previous is not None:
+                previous_key = (previous["subscription_plan"], acv_band(previous["annual_contract_value"]))
+                if previous["company"] != node["company"] or previous_key != profile_key:
+                    self._company_members.get(previous["company"], set()).discard(customer_id)
+                    self._profile_buckets.get(previous_key, set()).discard(customer_id)
+                    self.version += 1
+
+            self._nodes[customer_id] = node
+            self._company_members.setdefault(node["company"], set()).add(customer_id)
+            self._profile_buckets.setdefault(profile_key, set()).add(customer_id)
+            if previous is None:
+                self.version += 1
+
+            updated_at = row.updated_at if advance_watermark else None
+            if updated_at and (self._customer_watermark is None or updated_at > self._customer_watermark):
+                self._customer_watermark = updated_at
+
+    def _apply_interventions(self, rows):
+        for row in rows:
+            self._add_successful_strategy(row.id, row.customer_id, row.strategy_chosen)
+            learned_at = row.patterns_learned_at
+            if learned_at and (self._intervention_watermark is None or learned_at > self._intervention_watermark):
+                self._intervention_watermark = learned_at
+
+    def _add_successful_strategy(self, intervention_id: int, customer_id: int, strategy: str):
+        if intervention_id in self._seen_interventions:
+            return
+        self._seen_interventions.add(intervention_id)
+        strategies = self._successful_strategies.setdefault(customer_id, {})
+        strategies[strategy] = strategies.get(strategy, 0) + 1
+        self.version += 1
+
+customer_graph = CustomerGraph()
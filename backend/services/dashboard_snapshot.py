@@ -0,0 +1,80 @@
+# backend/services/dashboard_snapshot.py
+import asyncio
+import hashlib
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from sqlalchemy.orm import Session
+from services.metrics import CacheMetrics
+from config import config
+import logging
+
+logger = logging.getLogger(__name__)
+
+_cache_metrics = CacheMetrics("dashboard_snapshot")
+
+def snapshot_etag(sections: Dict[str, Any]) -> str:
+    """Strong ETag over the serialized sections"""
+    data = json.dumps(sections, default=str, sort_keys=True)
+    return f'"{hashlib.sha1(data.encode()).hexdigest()}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check; weak comparison as RFC 9110 requires for this header"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+class DashboardSnapshotCache:
+    """Latest full dashboard snapshot shared by /api/dashboard/snapshot and the push stream.
+
+    A snapshot younger than DASHBOARD_SNAPSHOT_MAX_AGE is served without touching the database,
+    and concurrent requests for a stale snapshot wait for a single recomputation."""
+
+    def __init__(self):
+        self._compute_sections: Optional[Callable[[Session], Awaitable[Dict[str, Any]]]] = None
+        self._sections: Optional[Dict[str, Any]] = None
+        self._etag: Optional[str] = None
+        self._computed_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def configure(self, compute_sections: Callable[[Session], Awaitable[Dict[str, Any]]]):
+        self._compute_sections = compute_sections
+
+    def invalidate(self):
+        self._computed_at = 0.0
+
+    async def get(self, db: Session) -> Tuple[Dict[str, Any], str]:
+        """(sections, etag), recomputed only when the cached snapshot is stale"""
+        if self._is_fresh():
+            _cache_metrics.hit.inc()
+            return self._sections, self._etag
+
+        async with self._lock:
+            if self._is_fresh():  # another request refreshed while we waited
+                _cache_metrics.hit.inc()
+            else:
+                _cache_metrics.miss.inc()
+                await self._recompute(db)
+            return self._sections, self._etag
+
+    async def refresh(self, db: Session) -> Dict[str, Any]:
+        """Recompute unconditionally (used by the push stream, which keeps the cache warm)"""
+        async with self._lock:
+            await self._recompute(db)
+            return self._sections
+
+    def _is_fresh(self) -> bool:
+        return self._sections is not None and time.monotonic() - self._computed_at < config.DASHBOARD_SNAPSHOT_MAX_AGE
+
+    async def _recompute(self, db: Session):
+        started = time.monotonic()
+        sections = await self._compute_sections(db)
+        self._sections = sections
+        self._etag = snapshot_etag(sections)
+        self._computed_at = time.monotonic()
+        logger.debug(f"Dashboard snapshot computed in {(self._computed_at - started) * 1000:.0f}ms")
+
+dashboard_snapshot = DashboardSnapshotCache()
@@ -0,0 +1,178 @@
+# backend/services/dashboard_stream.py
+import asyncio
+import hashlib
+import json
+import uuid
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from sqlalchemy.orm import Session
+from models.database import AnalyticsSessionLocal
+from services.event_bus import event_bus
+from config import config
+import logging
+
+logger = logging.getLogger(__name__)
+
+RESYNC = object()  # queued for a subscriber that fell behind: send current state instead of the backlog
+
+class _Subscriber:
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=config.DASHBOARD_STREAM_QUEUE_SIZE)
+        self.lagged = 0
+
+class DashboardStreamPublisher:
+    """One in-process publisher fanning dashboard updates out to every SSE subscriber.
+
+    Dashboard sections are computed once per refresh no matter how many dashboards are open,
+    and only sections whose content changed are sent. Refreshes run when the agent publishes
+    an event and at least every DASHBOARD_STREAM_INTERVAL seconds while anyone is subscribed."""
+
+    def __init__(self):
+        self._compute_sections: Optional[Callable[[Session], Awaitable[Dict[str, Any]]]] = None
+        self._subscribers: List[_Subscriber] = []
+        self._history: deque = deque(maxlen=config.DASHBOARD_STREAM_HISTORY)  # (seq, section, data)
+        self._sections: Dict[str, str] = {}  # section -> serialized payload
+        self._hashes: Dict[str, str] = {}
+        self._seq = 0
+        self._epoch = uuid.uuid4().hex[:8]  # event ids from an earlier process can't be resumed
+        self._task: Optional[asyncio.Task] = None
+        self._refreshed = asyncio.Event()
+
+    def configure(self, compute_sections: Callable[[Session], Awaitable[Dict[str, Any]]]):
+        """Register the coroutine that computes {section name: payload} from one session"""
+        self._compute_sections = compute_sections
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    async def stream(self, last_event_id: Optional[str] = None):
+        """SSE body for one client; resumes after last_event_id when it is still in history"""
+        subscriber = _Subscriber()
+        self._subscribers.append(subscriber)
+        self._ensure_running()
+
+        try:
+            if not self._sections:
+                await self._wait_for_first_refresh()
+
+            backlog = self._replay_after(last_event_id)
+            if backlog is None:
+                backlog = self._current_state()
+            sent_seq = self._seq  # queued events up to here are already covered by the backlog
+            for event in backlog:
+                yield event
+
+            while True:
+                try:
+                    item = await asyncio.wait_for(subscriber.queue.get(), timeout=config.DASHBOARD_STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+
+                if item is RESYNC:
+                    sent_seq = self._seq
+                    for event in self._current_state():
+                        yield event
+                    continue
+
+                seq, event = item
+                if seq > sent_seq:
+                    sent_seq = seq
+                    yield event
+        finally:
+            self._subscribers = [s for s in self._subscribers if s is not subscriber]
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _wait_for_first_refresh(self):
+        try:
+            await asyncio.wait_for(self._refreshed.wait(), timeout=config.DASHBOARD_STREAM_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self):
+        events_queue = event_bus.subscribe()
+        logger.info("📡 Dashboard stream publisher started")
+        try:
+            while self._subscribers:
+                await self._refresh()
+                # Wake early on agent events; debounced so a burst costs one refresh
+                await event_bus.collect_batch(events_queue, timeout=config.DASHBOARD_STREAM_INTERVAL)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Dashboard stream publisher error: {e}")
+        finally:
+            event_bus.unsubscribe(events_queue)
+            logger.info("📡 Dashboard stream publisher stopped (no subscribers)")
+
+    async def _refresh(self):
+        if self._compute_sections is None:
+            return
+
+        db = AnalyticsSessionLocal()
+        try:
+            sections = await self._compute_sections(db)
+        except Exception as e:
+            logger.error(f"Error computing dashboard sections: {e}")
+            return
+        finally:
+            db.close()
+
+        for section, payload in sections.items():
+            data = json.dumps(payload, default=str, sort_keys=True)
+            digest = hashlib.sha1(data.encode()).hexdigest()
+            if self._hashes.get(section) == digest:
+                continue
+
+            self._hashes[section] = digest
+            self._sections[section] = data
+            self._seq += 1
+            self._history.append((self._seq, section, data))
+            self._fan_out(self._seq, self._format(self._seq, section, data))
+
+        self._refreshed.set()
+
+    def _fan_out(self, seq: int, event: str):
+        for subscriber in self._subscribers:
+            try:
+                subscriber.queue.put_nowait((seq, event))
+            except asyncio.QueueFull:
+                # Slow client: drop its backlog and let it catch up from current state
+                subscriber.lagged += 1
+                while not subscriber.queue.empty():
+                    subscriber.queue.get_nowait()
+                subscriber.queue.put_nowait(RESYNC)
+
+    def _replay_after(self, last_event_id: Optional[str]) -> Optional[List[str]]:
+        """Events after last_event_id, or None when it can't be resumed from history"""
+        if not last_event_id:
+            return None
+        try:
+            epoch, seq = last_event_id.split("-", 1)
+            seq = int(seq)
+        except ValueError:
+            return None
+
+        if epoch != self._epoch or not self._history or seq < self._history[0][0] - 1 or seq > self._seq:
+            return None
+        return [self._format(s, section, data) for s, section, data in self._history if s > seq]
+
+    def _current_state(self) -> List[str]:
+        return [self._format(self._seq, section, data) for section, data in self._sections.items()]
+
+    def _format(self, seq: int, section: str, data: str) -> str:
+        return f"id: {self._epoch}-{seq}\nevent: {section}\ndata: {data}\n\n"
+
+dashboard_publisher = DashboardStreamPublisher()
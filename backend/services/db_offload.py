@@ -0,0 +1,45 @@
+# backend/services/db_offload.py
+import asyncio
+import threading
+import anyio.to_thread
+from starlette.concurrency import run_in_threadpool
+from config import config
+import logging
+
+logger = logging.getLogger(__name__)
+
+_thread_state = threading.local()
+
+def configure_threadpool():
+    """Size the shared threadpool to the database connection pool.
+
+    Plain `def` endpoints, sync dependencies and run_blocking() all draw from this limiter,
+    so concurrent database work is bounded by connections rather than by the event loop.
+    Must be called from the running event loop (e.g. in lifespan startup)."""
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    limiter.total_tokens = config.DB_THREADPOOL_SIZE
+    logger.info(f"🧵 Database threadpool sized to {limiter.total_tokens} threads")
+
+def threadpool_status() -> dict:
+    """Threadpool occupancy; must be called from the running event loop"""
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    return {"total_threads": limiter.total_tokens, "busy_threads": limiter.borrowed_tokens}
+
+def run_on_thread_loop(fn, *args, **kwargs):
+    """Run an async def to completion on the calling worker thread's private event loop"""
+    # Each worker thread keeps one private event loop for running blocking async-def service code
+    loop = getattr(_thread_state, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = _thread_state.loop = asyncio.new_event_loop()
+    return loop.run_until_complete(fn(*args, **kwargs))
+
+async def run_blocking(fn, *args, **kwargs):
+    """Run blocking database (or LLM) work in the threadpool instead of on the event loop.
+
+    `fn` may be a plain function or an async def whose body blocks - as the service methods on
+    TiDBService, the agent and the coordinator do, since they use the sync SQLAlchemy session.
+    Coroutines run to completion on the worker thread's own event loop. A session must only be
+    used by one thread at a time, so callers await each call before touching the session again."""
+    if asyncio.iscoroutinefunction(fn):
+        return await run_in_threadpool(run_on_thread_loop, fn, *args, **kwargs)
+    return await run_in_threadpool(fn, *args, **kwargs)
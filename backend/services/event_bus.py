@@ -0,0 +1,87 @@
+# backend/services/event_bus.py
+import asyncio
+from typing import Dict, List, Optional
+from datetime import datetime
+from config import config
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Event types the agent reacts to
+CUSTOMER_METRICS_UPDATED = "customer_metrics_updated"
+COMMUNICATION_RECEIVED = "communication_received"
+INTERVENTION_COMPLETED = "intervention_completed"
+AGENT_JOB_QUEUED = "agent_job_queued"  # wakes a supervisor to run a background job
+
+class AgentEventBus:
+    """In-process pub/sub so the agent reacts to changes instead of polling on a timer"""
+
+    def __init__(self):
+        self._subscribers: List[tuple] = []  # (queue, event_types, loop)
+        self.dropped_events = 0
+
+    def subscribe(self, event_types: Optional[List[str]] = None,
+                  maxsize: int = None) -> asyncio.Queue:
+        """Register a queue receiving the given event types (all types if None)"""
+        queue = asyncio.Queue(maxsize=maxsize or config.AGENT_EVENT_QUEUE_SIZE)
+        self._subscribers.append((queue, set(event_types) if event_types else None, asyncio.get_running_loop()))
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers = [s for s in self._subscribers if s[0] is not queue]
+
+    def publish(self, event_type: str, customer_id: Optional[int] = None, payload: Optional[Dict] = None):
+        """Fan an event out to subscribers; safe to call from sync code and worker threads"""
+        event = {
+            "type": event_type,
+            "customer_id": customer_id,
+            "payload": payload or {},
+            "published_at": datetime.now().isoformat()
+        }
+
+        try:
+            current_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            current_loop = None
+
+        for queue, event_types, loop in self._subscribers:
+            if event_types is not None and event_type not in event_types:
+                continue
+            if loop is current_loop:
+                self._offer(queue, event)
+            elif not loop.is_closed():
+                loop.call_soon_threadsafe(self._offer, queue, event)
+
+    def _offer(self, queue: asyncio.Queue, event: Dict):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # The periodic reconciliation sweep picks up anything dropped here
+            self.dropped_events += 1
+            if self.dropped_events % 100 == 1:
+                logger.warning(f"Agent event queue full - dropped {self.dropped_events} events so far")
+
+    async def collect_batch(self, queue: asyncio.Queue, timeout: float) -> List[Dict]:
+        """Wait up to `timeout` for an event, then debounce: keep collecting until the
+        stream is quiet for AGENT_EVENT_DEBOUNCE_MS or AGENT_EVENT_MAX_DELAY_MS has passed"""
+        try:
+            first = await asyncio.wait_for(queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return []
+
+        loop = asyncio.get_running_loop()
+        events = [first]
+        deadline = loop.time() + config.AGENT_EVENT_MAX_DELAY_MS / 1000
+
+        while len(events) < config.AGENT_EVENT_MAX_BATCH:
+            wait = min(config.AGENT_EVENT_DEBOUNCE_MS / 1000, deadline - loop.time())
+            if wait <= 0:
+                break
+            try:
+                events.append(await asyncio.wait_for(queue.get(), timeout=wait))
+            except asyncio.TimeoutError:
+                break
+
+        return events
+
+event_bus = AgentEventBus()
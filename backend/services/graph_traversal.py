@@ -0,0 +1,322 @@
+# backend/services/graph_traversal.py
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from services.customer_graph import customer_graph, customer_segment, SIMILAR_ACV_DISTANCE
+from services.metrics import CacheMetrics
+from config import config
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Node kinds
+CUSTOMER = 0
+INTERVENTION = 1
+PATTERN = 2
+NODE_KIND_NAMES = {CUSTOMER: "customer", INTERVENTION: "intervention", PATTERN: "retention_pattern"}
+
+# Edge weights
+SAME_COMPANY_WEIGHT = 1.0
+MIN_SIMILAR_PROFILE_WEIGHT = 0.1
+CUSTOMER_INTERVENTION_WEIGHT = 1.0
+INTERVENTION_PATTERN_WEIGHT = 0.5
+
+# How much an intervention outcome counts as evidence for its strategy
+OUTCOME_CREDIT = {"retained": 1.0, "stable": 0.5, "at_risk": -0.5, "churned": -1.0}
+
+class RetentionGraph:
+    """Immutable CSR graph over customers, interventions and retention patterns.
+
+    Node i's neighbours are indices[indptr[i]:indptr[i + 1]] with edge weights in weights[...].
+    Edges are stored in both directions, so walks can leave a customer through its interventions
+    and come back through its neighbours."""
+
+    def __init__(self, node_kind: np.ndarray, node_ref: np.ndarray, node_strategy: List[Optional[str]],
+                 node_credit: np.ndarray, src: np.ndarray, dst: np.ndarray, weight: np.ndarray):
+        self.node_kind = node_kind
+        self.node_ref = node_ref
+        self.node_strategy = node_strategy  # strategy of intervention and pattern nodes
+        self.node_credit = node_credit  # outcome credit (interventions) or success rate (patterns)
+        self._index = {(int(kind), int(ref)): i for i, (kind, ref) in enumerate(zip(node_kind, node_ref))}
+
+        # Symmetrize, then sort by source to get CSR
+        both_src = np.concatenate([src, dst])
+        both_dst = np.concatenate([dst, src])
+        both_weight = np.concatenate([weight, weight]).astype(np.float32)
+        order = np.argsort(both_src, kind="stable")
+
+        self.indices = both_dst[order].astype(np.int32)
+        self.weights = both_weight[order]
+        self.indptr = np.zeros(len(node_kind) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(both_src, minlength=len(node_kind)), out=self.indptr[1:])
+        self.out_weight = np.bincount(both_src, weights=both_weight, minlength=len(node_kind))
+
+        self.built_at = time.monotonic()
+
+    @property
+    def node_count(self) -> int:
+        return len(self.node_kind)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.indices) // 2
+
+    def node(self, kind: int, ref: int) -> Optional[int]:
+        return self._index.get((kind, ref))
+
+    def neighbours(self, node: int) -> np.ndarray:
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def k_hop(self, seed: int, max_hops: int, max_nodes: int = None) -> Dict[int, int]:
+        """Breadth-first hop distance of every node within max_hops of seed (seed itself at 0)"""
+        max_nodes = max_nodes or config.GRAPH_MAX_VISITED_NODES
+        hops = {seed: 0}
+        frontier = np.array([seed], dtype=np.int32)
+
+        for hop in range(1, max_hops + 1):
+            if not len(frontier):
+                break
+            reached = np.unique(np.concatenate([self.neighbours(node) for node in frontier]))
+            frontier = np.array([node for node in reached.tolist() if node not in hops], dtype=np.int32)
+            for node in frontier.tolist():
+                hops[node] = hop
+                if len(hops) >= max_nodes:
+                    return hops
+        return hops
+
+    def personalized_pagerank(self, seeds: Dict[int, float], alpha: float = None, epsilon: float = None,
+                              score_budget: float = None, max_pushes: int = None) -> Dict[int, float]:
+        """Approximate PageRank personalized to seeds, by local push.
+
+        Only nodes whose residual exceeds epsilon * out_weight are pushed, so work stays near the
+        seeds. Stops early once score_budget of the probability mass has been settled or after
+        max_pushes pushes."""
+        alpha = alpha or config.GRAPH_PPR_ALPHA
+        epsilon = epsilon or config.GRAPH_PPR_EPSILON
+        score_budget = score_budget or config.GRAPH_PPR_SCORE_BUDGET
+        max_pushes = max_pushes or config.GRAPH_PPR_MAX_PUSHES
+
+        total = sum(seeds.values()) or 1.0
+        residual: Dict[int, float] = {node: weight / total for node, weight in seeds.items()}
+        scores: Dict[int, float] = {}
+        settled = 0.0
+        queue = deque(residual)
+        queued = set(residual)
+        pushes = 0
+
+        while queue and pushes < max_pushes and settled < score_budget:
+            node = queue.popleft()
+            queued.discard(node)
+            mass = residual.pop(node, 0.0)
+            out_weight = self.out_weight[node]
+
+            if out_weight <= 0:
+                # Dangling node keeps all of its mass
+                scores[node] = scores.get(node, 0.0) + mass
+                settled += mass
+                continue
+
+            scores[node] = scores.get(node, 0.0) + alpha * mass
+            settled += alpha * mass
+            pushes += 1
+
+            start, end = self.indptr[node], self.indptr[node + 1]
+            shares = (1 - alpha) * mass * self.weights[start:end] / out_weight
+            for neighbour, share in zip(self.indices[start:end].tolist(), shares.tolist()):
+                value = residual.get(neighbour, 0.0) + share
+                residual[neighbour] = value
+                if neighbour not in queued and value > epsilon * self.out_weight[neighbour]:
+                    queue.append(neighbour)
+                    queued.add(neighbour)
+
+        return scores
+
+    def score_strategies(self, customer_id: int, limit: int = 5) -> List[Dict]:
+        """Strategies ranked by how well they worked around this customer, weighted by
+        personalized PageRank proximity of the interventions and patterns that used them"""
+        seed = self.node(CUSTOMER, customer_id)
+        if seed is None:
+            return []
+
+        scores = self.personalized_pagerank({seed: 1.0})
+        strategies: Dict[str, Dict] = {}
+        for node, score in scores.items():
+            strategy = self.node_strategy[node]
+            if strategy is None or node == seed:
+                continue
+
+            entry = strategies.setdefault(strategy, {
+                "strategy": strategy, "score": 0.0, "evidence": 0.0, "interventions": 0, "patterns": 0
+            })
+            entry["score"] += score * self.node_credit[node]
+            entry["evidence"] += score
+            if self.node_kind[node] == INTERVENTION:
+                entry["interventions"] += 1
+            else:
+                entry["patterns"] += 1
+
+        ranked = sorted(strategies.values(), key=lambda entry: entry["score"], reverse=True)
+        return [
+            {**entry, "score": round(float(entry["score"]), 6), "evidence": round(float(entry["evidence"]), 6)}
+            for entry in ranked[:limit] if entry["score"] > 0
+        ]
+
+    def describe_neighbourhood(self, customer_id: int, max_hops: int) -> Dict:
+        """Node counts per kind and hop around a customer"""
+        seed = self.node(CUSTOMER, customer_id)
+        if seed is None:
+            return {}
+
+        summary: Dict[str, Dict[int, int]] = {}
+        for node, hop in self.k_hop(seed, max_hops).items():
+            kind = NODE_KIND_NAMES[int(self.node_kind[node])]
+            summary.setdefault(kind, {})
+            summary[kind][hop] = summary[kind].get(hop, 0) + 1
+        return summary
+
+def build_retention_graph(db: Session, max_degree: int = None) -> RetentionGraph:
+    """Snapshot the customer graph plus intervention outcomes and retention patterns into CSR arrays"""
+    started = time.monotonic()
+    max_degree = max_degree or config.GRAPH_MAX_CUSTOMER_DEGREE
+
+    customers = customer_graph.customer_rows()
+    interventions = db.execute(text("""
+        SELECT id, customer_id, intervention_type, strategy_chosen, actual_outcome
+        FROM churn_interventions
+        WHERE actual_outcome IS NOT NULL
+    """)).fetchall()
+    patterns = db.execute(text("""
+        SELECT id, pattern_name, customer_segment, churn_reason_category, success_rate
+        FROM retention_patterns
+    """)).fetchall()
+
+    n_customers, n_interventions = len(customers), len(interventions)
+    customer_ids = np.array([row[0] for row in customers], dtype=np.int64)
+    companies = np.array([row[1] for row in customers], dtype=object)
+    plans = np.array([row[2] for row in customers], dtype=object)
+    acvs = np.array([row[3] for row in customers], dtype=float)
+    customer_node = {int(customer_id): i for i, customer_id in enumerate(customer_ids)}
+
+    edges_src, edges_dst, edges_weight = [], [], []
+
+    def add_band_edges(group_keys: np.ndarray, order: np.ndarray, weight_fn):
+        # Link each customer to its next max_degree neighbours in sort order within the same group
+        for offset in range(1, max_degree + 1):
+            if offset >= len(order):
+                break
+            left, right = order[:-offset], order[offset:]
+            same_group = group_keys[left] == group_keys[right]
+            weights = weight_fn(left, right)
+            keep = same_group & (weights > 0)
+            edges_src.append(left[keep])
+            edges_dst.append(right[keep])
+            edges_weight.append(weights[keep])
+
+    if n_customers:
+        # Same company: cliques for small companies, a band of max_degree neighbours for large ones
+        company_codes = np.unique(companies, return_inverse=True)[1]
+        add_band_edges(company_codes, np.lexsort((customer_ids, company_codes)),
+                       lambda left, right: np.full(len(left), SAME_COMPANY_WEIGHT))
+
+        # Similar profile: same plan and ACV within SIMILAR_ACV_DISTANCE, closer means stronger
+        plan_codes = np.unique(plans, return_inverse=True)[1]
+
+        def similar_weight(left, right):
+            distance = np.abs(acvs[left] - acvs[right])
+            return np.where(distance < SIMILAR_ACV_DISTANCE,
+                            np.maximum(1 - distance / SIMILAR_ACV_DISTANCE, MIN_SIMILAR_PROFILE_WEIGHT), 0.0)
+        add_band_edges(plan_codes, np.lexsort((acvs, plan_codes)), similar_weight)
+
+    # Pattern nodes follow the intervention nodes; patterns are keyed like the learner keys them
+    pattern_base = n_customers + n_interventions
+    pattern_strategies = []
+    pattern_node = {}
+    for j, row in enumerate(patterns):
+        prefix = f"{row.customer_segment}_{row.churn_reason_category}_"
+        strategy = row.pattern_name[len(prefix):] if row.pattern_name and row.pattern_name.startswith(prefix) else None
+        pattern_strategies.append(strategy)
+        if strategy:
+            pattern_node[(row.customer_segment, row.churn_reason_category, strategy)] = pattern_base + j
+
+    owners = np.array([customer_node.get(row.customer_id, -1) for row in interventions], dtype=np.int64)
+    intervention_nodes = np.arange(n_customers, pattern_base, dtype=np.int64)
+    linked = owners >= 0
+    edges_src.append(owners[linked])
+    edges_dst.append(intervention_nodes[linked])
+    edges_weight.append(np.full(int(linked.sum()), CUSTOMER_INTERVENTION_WEIGHT))
+
+    patterns_used = np.array([
+        pattern_node.get((customer_segment(acvs[owner]), row.intervention_type, row.strategy_chosen), -1) if owner >= 0 else -1
+        for owner, row in zip(owners.tolist(), interventions)
+    ], dtype=np.int64)
+    linked = patterns_used >= 0
+    edges_src.append(intervention_nodes[linked])
+    edges_dst.append(patterns_used[linked])
+    edges_weight.append(np.full(int(linked.sum()), INTERVENTION_PATTERN_WEIGHT))
+
+    node_strategy = [None] * n_customers + [row.strategy_chosen for row in interventions] + pattern_strategies
+    node_credit = np.concatenate([
+        np.zeros(n_customers),
+        np.array([OUTCOME_CREDIT.get(row.actual_outcome, 0.0) for row in interventions], dtype=float),
+        np.array([row.success_rate or 0.0 for row in patterns], dtype=float)
+    ])
+
+    node_kind = np.concatenate([
+        np.full(n_customers, CUSTOMER), np.full(n_interventions, INTERVENTION), np.full(len(patterns), PATTERN)
+    ]).astype(np.int8)
+    node_ref = np.concatenate([
+        customer_ids,
+        np.array([row.id for row in interventions], dtype=np.int64),
+        np.array([row.id for row in patterns], dtype=np.int64)
+    ]).astype(np.int64)
+
+    def concat(parts, dtype):
+        return np.concatenate(parts).astype(dtype) if parts else np.zeros(0, dtype=dtype)
+
+    graph = RetentionGraph(
+        node_kind, node_ref, node_strategy, node_credit,
+        concat(edges_src, np.int64), concat(edges_dst, np.int64), concat(edges_weight, np.float32)
+    )
+    logger.info(f"🕸️ Retention graph built: {graph.node_count} nodes, {graph.edge_count} edges "
+                f"({(time.monotonic() - started) * 1000:.0f}ms)")
+    return graph
+
+class RetentionGraphCache:
+    """Shares one RetentionGraph snapshot across requests and agent cycles, rebuilt when the
+    customer graph changes (at most every GRAPH_MIN_REBUILD_SECONDS) or gets too old"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._graph: Optional[RetentionGraph] = None
+        self._version = -1
+
+    def get(self, db: Session) -> RetentionGraph:
+        customer_graph.ensure_fresh(db)
+
+        with self._lock:
+            graph, version = self._graph, self._version
+        age = time.monotonic() - graph.built_at if graph else None
+
+        stale = graph is None or age > config.GRAPH_MAX_AGE_SECONDS or (
+            version != customer_graph.version and age > config.GRAPH_MIN_REBUILD_SECONDS)
+        if not stale:
+            _cache_metrics.hit.inc()
+            return graph
+
+        _cache_metrics.miss.inc()
+        version = customer_graph.version
+        graph = build_retention_graph(db)
+        with self._lock:
+            self._graph, self._version = graph, version
+        return graph
+
+    def invalidate(self):
+        with self._lock:
+            self._graph = None
+
+_cache_metrics = CacheMetrics("retention_graph")
+retention_graph_cache = RetentionGraphCache()
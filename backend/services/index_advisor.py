@@ -0,0 +1,161 @@
+# backend/services/index_advisor.py
+from datetime import datetime, timedelta
+from typing import Dict, List
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from config import config
+import logging
+
+logger = logging.getLogger(__name__)
+
+def _hot_queries() -> List[Dict]:
+    """Representative forms of the service's hot queries, with realistic parameters"""
+    now = datetime.now()
+    return [
+        {
+            "name": "at_risk_customers",
+            "sql": "SELECT id, churn_probability FROM customers WHERE churn_probability >= :threshold "
+                   "ORDER BY churn_probability DESC LIMIT 50",
+            "params": {"threshold": config.CHURN_THRESHOLD}
+        },
+        {
+            "name": "intervention_candidates",
+            "sql": """SELECT c.id FROM customers c
+                      WHERE c.churn_probability >= :threshold
+                        AND NOT EXISTS (
+                            SELECT 1 FROM churn_interventions ci
+                            WHERE ci.customer_id = c.id AND ci.status IN ('pending', 'executing')
+                              AND ci.created_at >= :since)
+                      LIMIT 30""",
+            "params": {"threshold": config.CHURN_THRESHOLD, "since": now - timedelta(hours=24)}
+        },
+        {
+            "name": "follow_up_interventions",
+            "sql": """SELECT id FROM churn_interventions
+                      WHERE status IN ('successful', 'failed') AND patterns_learned_at IS NULL
+                        AND completed_at BETWEEN :start AND :end""",
+            "params": {"start": now - timedelta(hours=48), "end": now - timedelta(hours=24)}
+        },
+        {
+            "name": "unlearned_outcomes",
+            "sql": """SELECT id FROM churn_interventions
+                      WHERE actual_outcome IS NOT NULL AND patterns_learned_at IS NULL AND completed_at >= :since
+                      ORDER BY completed_at LIMIT 500""",
+            "params": {"since": now - timedelta(days=7)}
+        },
+        {
+            "name": "retained_interventions",
+            "sql": "SELECT estimated_retention_value FROM churn_interventions WHERE actual_outcome = 'retained'",
+            "params": {}
+        },
+        {
+            "name": "recent_interventions",
+            "sql": "SELECT id FROM churn_interventions ORDER BY created_at DESC LIMIT 10",
+            "params": {}
+        },
+        {
+            "name": "interventions_last_24h",
+            "sql": "SELECT id, status FROM churn_interventions WHERE created_at >= :since",
+            "params": {"since": now - timedelta(hours=24)}
+        },
+        {
+            "name": "recent_activities",
+            "sql": "SELECT id FROM agent_activities ORDER BY created_at DESC LIMIT 20",
+            "params": {}
+        },
+        {
+            "name": "customer_graph_sync",
+            "sql": "SELECT id FROM customers WHERE updated_at >= :since",
+            "params": {"since": now - timedelta(seconds=config.CUSTOMER_GRAPH_SYNC_SECONDS)}
+        },
+        {
+            "name": "learned_outcome_sync",
+            "sql": "SELECT id FROM churn_interventions WHERE actual_outcome = 'retained' AND patterns_learned_at >= :since",
+            "params": {"since": now - timedelta(seconds=config.CUSTOMER_GRAPH_SYNC_SECONDS)}
+        },
+        {
+            "name": "same_company_customers",
+            "sql": "SELECT id FROM customers WHERE company = :company",
+            "params": {"company": "Acme"}
+        },
+        {
+            "name": "similar_profile_customers",
+            "sql": "SELECT id FROM customers WHERE subscription_plan = :plan "
+                   "AND annual_contract_value BETWEEN :low AND :high",
+            "params": {"plan": "pro", "low": 20000, "high": 40000}
+        },
+        {
+            "name": "communication_search_load",
+            "sql": "SELECT communication_id, message_content FROM customer_communications "
+                   "WHERE customer_id = :customer_id AND communication_id > :after_id",
+            "params": {"customer_id": 1, "after_id": 0}
+        },
+        {
+            "name": "agent_memory_search",
+            "sql": """SELECT session_id FROM agent_memory
+                      WHERE customer_id = :customer_id OR interaction_type = :interaction_type
+                      ORDER BY timestamp DESC LIMIT 5""",
+            "params": {"customer_id": 1, "interaction_type": "churn_intervention"}
+        }
+    ]
+
+def _full_scans(plan_rows: List[Dict]) -> List[Dict]:
+    """Full table scans in an EXPLAIN result, for both TiDB and MySQL plan formats"""
+    scans = []
+    for row in plan_rows:
+        operator = str(row.get("id", ""))
+        if "TableFullScan" in operator:
+            # TiDB: id=TableFullScan_5, access object=table:customers
+            estimated_rows = float(row.get("estRows") or 0)
+            table = str(row.get("access object", "")).replace("table:", "")
+        elif str(row.get("type", "")).upper() == "ALL":
+            # MySQL: type=ALL
+            estimated_rows = float(row.get("rows") or 0)
+            table = row.get("table")
+            operator = "ALL"
+        else:
+            continue
+
+        if estimated_rows >= config.INDEX_ADVISOR_MIN_ROWS:
+            scans.append({"table": table, "operator": operator, "estimated_rows": int(estimated_rows)})
+    return scans
+
+def run_index_advisor(db: Session) -> List[Dict]:
+    """EXPLAIN every hot query and report the ones that scan a whole table"""
+    report = []
+    for query in _hot_queries():
+        try:
+            result = db.execute(text(f"EXPLAIN {query['sql']}"), query["params"])
+            plan_rows = [dict(row._mapping) for row in result]
+            full_scans = _full_scans(plan_rows)
+            report.append({
+                "query": query["name"],
+                "status": "full_scan" if full_scans else "ok",
+                "full_scans": full_scans
+            })
+        except Exception as e:
+            db.rollback()
+            report.append({"query": query["name"], "status": "error", "error": str(e)})
+
+    flagged = [entry for entry in report if entry["status"] == "full_scan"]
+    for entry in flagged:
+        tables = ", ".join(f"{scan['table']} (~{scan['estimated_rows']} rows)" for scan in entry["full_scans"])
+        logger.warning(f"⚠️ Index advisor: {entry['query']} does a full scan of {tables}")
+    logger.info(f"🔎 Index advisor checked {len(report)} hot queries, {len(flagged)} with full scans")
+    return report
+
+if __name__ == "__main__":
+    # python -m services.index_advisor  (from backend/) - exits non-zero when a hot query full-scans
+    import json
+    import sys
+    from models.database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    session = SessionLocal()
+    try:
+        advisor_report = run_index_advisor(session)
+    finally:
+        session.close()
+
+    print(json.dumps(advisor_report, indent=2))
+    sys.exit(1 if any(entry["status"] == "full_scan" for entry in advisor_report) else 0)
@@ -0,0 +1,109 @@
+# backend/services/intervention_scheduler.py
+import heapq
+from typing import List, Optional, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, case, exists, or_
+from datetime import datetime, timedelta
+from models.database import Customer, ChurnIntervention
+from services.agent_coordinator import CustomerShard
+from config import config
+import logging
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_INTERVENTION_STATUSES = ["pending", "executing"]
+CRITICAL_CHURN_PROBABILITY = 0.9  # same cut-off the agent uses for "high" urgency outreach
+CRITICAL_URGENCY_MULTIPLIER = 1.25
+
+def expected_loss(churn_probability: float, annual_contract_value: float) -> float:
+    """Revenue at risk weighted by churn probability, boosted for critical customers"""
+    urgency = CRITICAL_URGENCY_MULTIPLIER if churn_probability >= CRITICAL_CHURN_PROBABILITY else 1.0
+    return churn_probability * annual_contract_value * urgency
+
+def expected_loss_expr():
+    """SQL version of expected_loss() so the database can pre-order candidates"""
+    urgency = case(
+        (Customer.churn_probability >= CRITICAL_CHURN_PROBABILITY, CRITICAL_URGENCY_MULTIPLIER),
+        else_=1.0
+    )
+    return Customer.churn_probability * Customer.annual_contract_value * urgency
+
+def select_intervention_candidates(db: Session, churn_threshold: float, page_size: int,
+                                   shard: Optional[CustomerShard] = None,
+                                   customer_ids: Optional[List[int]] = None,
+                                   after: Optional[Tuple[float, int]] = None) -> Tuple[List[Customer], Optional[Tuple[float, int]]]:
+    """One-round-trip candidate page: customers over the threshold with no active intervention,
+    ordered by expected loss. Pass the returned cursor as `after` to fetch the next page."""
+    loss = expected_loss_expr()
+
+    # NOT EXISTS anti-join, served by ix_churn_interventions_customer_status_created
+    active_intervention = exists().where(
+        ChurnIntervention.customer_id == Customer.id,
+        ChurnIntervention.status.in_(ACTIVE_INTERVENTION_STATUSES),
+        ChurnIntervention.created_at >= datetime.now() - timedelta(hours=24)
+    )
+
+    query = db.query(Customer, loss.label("expected_loss")).filter(
+        Customer.churn_probability >= churn_threshold,
+        ~active_intervention
+    )
+    if shard is not None:
+        query = query.filter(shard.filter(Customer.id))
+    if customer_ids is not None:
+        query = query.filter(Customer.id.in_(customer_ids))
+    if after is not None:
+        # Keyset pagination: deep pages cost the same as the first one
+        after_loss, after_id = after
+        query = query.filter(or_(loss < after_loss, and_(loss == after_loss, Customer.id > after_id)))
+
+    rows = query.order_by(loss.desc(), Customer.id).limit(page_size).all()
+
+    customers = [customer for customer, _ in rows]
+    next_cursor = (rows[-1].expected_loss, rows[-1][0].id) if len(rows) == page_size else None
+    return customers, next_cursor
+
+class InterventionScheduler:
+    """Priority queue of at-risk customers, handed out highest expected loss first"""
+
+    def __init__(self, db: Session, shard: Optional[CustomerShard] = None):
+        self.db = db
+        self.shard = shard or CustomerShard(1, [0])
+        self._queue: List[Tuple[float, int, Customer]] = []
+
+    async def load_candidates(self, churn_threshold: float = None, capacity: int = None,
+                              customer_ids: Optional[List[int]] = None) -> int:
+        """Fill the queue with customers over the threshold that have no active intervention"""
+        churn_threshold = config.CHURN_THRESHOLD if churn_threshold is None else churn_threshold
+        capacity = config.AGENT_CYCLE_CAPACITY if capacity is None else capacity
+
+        candidates, _ = select_intervention_candidates(
+            self.db,
+            churn_threshold=churn_threshold,
+            page_size=capacity * config.AGENT_SCHEDULER_LOOKAHEAD,
+            shard=self.shard,
+            customer_ids=customer_ids
+        )
+
+        for customer in candidates:
+            self.push(customer)
+
+        logger.info(f"📋 Scheduler queued {len(candidates)} at-risk customers (threshold {churn_threshold:.0%})")
+        return len(candidates)
+
+    def push(self, customer: Customer):
+        priority = expected_loss(customer.churn_probability or 0.0, customer.annual_contract_value or 0.0)
+        # heapq is a min-heap: negate priority, break ties on id for a stable order
+        heapq.heappush(self._queue, (-priority, customer.id, customer))
+
+    def next_batch(self, capacity: int = None) -> List[Customer]:
+        """Pop up to `capacity` customers - this cycle's intervention budget"""
+        capacity = config.AGENT_CYCLE_CAPACITY if capacity is None else capacity
+
+        batch = []
+        while self._queue and len(batch) < capacity:
+            _, _, customer = heapq.heappop(self._queue)
+            batch.append(customer)
+        return batch
+
+    def __len__(self) -> int:
+        return len(self._queue)
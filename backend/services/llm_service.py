@@ -2,11 +2,13 @@ import vertexai
 from vertexai.generative_models import GenerativeModel
 from typing import Dict, List
 import json
+from services.tracing import trace_methods
 from config import config
 import logging
 
 logger = logging.getLogger(__name__)
 
+@trace_methods("llm")
 class LLMService:
     def __init__(self):
         """Initialize Gemini via Vertex AI - uses ADC automatically"""
@@ -55,6 +57,7 @@ class LLMService:
         - Direct relationships: {len(relationships.get('direct_relationships', []))} customers
         - Similar profiles: {len(relationships.get('similar_profile_customers', []))} customers  
         - Successful strategies from similar customers: {relationships.get('successful_strategies', [])}
+        - Strategies ranked by multi-hop graph propagation: {relationships.get('strategy_scores', [])}
     
         Based on this comprehensive analysis using TiDB Serverless vector search, 
         agent memory, full-text search, and graph relationships, determine the optimal intervention.
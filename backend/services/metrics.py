@@ -0,0 +1,187 @@
+# backend/services/metrics.py
+import time
+from typing import Dict
+from prometheus_client import Counter, Histogram, REGISTRY, generate_latest
+from prometheus_client.core import GaugeMetricFamily, CounterMetricFamily, HistogramMetricFamily
+from sqlalchemy import event
+from models.database import engine, analytics_engine
+from models.pool_metrics import pool_metrics
+from services.event_bus import event_bus
+from services.dashboard_stream import dashboard_publisher
+import anyio.to_thread
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Stages of process_customer_health_check / process_customer_events
+PREDICTION_REFRESH = "prediction_refresh"
+DETECTION = "detection"
+CONTEXT_RETRIEVAL = "context_retrieval"
+LLM = "llm"
+NOTIFICATION = "notification"
+FOLLOW_UP = "follow_up"
+LEARNING = "learning"
+AGENT_STAGES = [PREDICTION_REFRESH, DETECTION, CONTEXT_RETRIEVAL, LLM, NOTIFICATION, FOLLOW_UP, LEARNING]
+
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 10.0)
+
+AGENT_STAGE_SECONDS = Histogram(
+    "agent_stage_duration_seconds", "Time spent in each stage of an agent cycle", ["stage"], buckets=STAGE_BUCKETS)
+AGENT_STAGE_ERRORS = Counter(
+    "agent_stage_errors_total", "Agent stage runs that raised", ["stage"])
+AGENT_INTERVENTIONS = Counter(
+    "agent_interventions_total", "Interventions considered by the agent, by outcome", ["outcome"])
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time to response headers per route", ["method", "route", "status"],
+    buckets=REQUEST_BUCKETS)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "Cursor execution time per engine and statement type", ["engine", "operation"],
+    buckets=QUERY_BUCKETS)
+DB_QUERY_ERRORS = Counter(
+    "db_query_errors_total", "Statements that raised a database error", ["engine"])
+CACHE_LOOKUPS = Counter(
+    "cache_lookups_total", "In-process cache lookups by result", ["cache", "result"])
+
+# Label children are bound once here so the hot paths only do a dict lookup and an observe()
+_stage_seconds = {stage: AGENT_STAGE_SECONDS.labels(stage) for stage in AGENT_STAGES}
+_stage_errors = {stage: AGENT_STAGE_ERRORS.labels(stage) for stage in AGENT_STAGES}
+_interventions = {outcome: AGENT_INTERVENTIONS.labels(outcome) for outcome in ["executed", "low_confidence", "failed"]}
+_request_seconds: Dict[tuple, object] = {}  # (method, route, status) -> child, filled on first use
+
+class stage_timer:
+    """Times one agent stage: `with stage_timer(LLM): ...`; exceptions are counted, not swallowed"""
+
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _stage_seconds[self.stage].observe(time.perf_counter() - self.started)
+        if exc_type is not None:
+            _stage_errors[self.stage].inc()
+        return False
+
+def record_intervention(outcome: str):
+    _interventions[outcome].inc()
+
+class CacheMetrics:
+    """Pre-bound hit/miss counters for one named cache"""
+
+    __slots__ = ("hit", "miss")
+
+    def __init__(self, cache: str):
+        self.hit = CACHE_LOOKUPS.labels(cache, "hit")
+        self.miss = CACHE_LOOKUPS.labels(cache, "miss")
+
+class PrometheusMiddleware:
+    """ASGI middleware timing each request until its response headers are sent.
+
+    Labelled by route template rather than raw path so ids don't explode the series count;
+    long-lived streams are measured to their first byte, not their lifetime."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                _observe_request(scope, message["status"], time.perf_counter() - started)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+def _observe_request(scope, status: int, seconds: float):
+    route = scope.get("route")
+    key = (scope["method"], route.path if route is not None else "unmatched", status)
+    child = _request_seconds.get(key)
+    if child is None:
+        child = _request_seconds[key] = HTTP_REQUEST_SECONDS.labels(*key)
+    child.observe(seconds)
+
+_OPERATIONS = ("SELECT", "INSERT", "UPDATE", "DELETE")
+
+def instrument_queries(target_engine, name: str):
+    """Time every cursor execution on an engine"""
+    children = {operation: DB_QUERY_SECONDS.labels(name, operation) for operation in _OPERATIONS}
+    other = DB_QUERY_SECONDS.labels(name, "OTHER")
+    errors = DB_QUERY_ERRORS.labels(name)
+
+    @event.listens_for(target_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(target_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_metrics_started", None)
+        if started is not None:
+            children.get(statement.lstrip()[:6].upper(), other).observe(time.perf_counter() - started)
+
+    @event.listens_for(target_engine, "handle_error")
+    def handle_error(exception_context):
+        errors.inc()
+
+class RuntimeCollector:
+    """Queue depths and pool occupancy, read at scrape time so they cost nothing in between"""
+
+    def collect(self):
+        queue_depth = GaugeMetricFamily(
+            "agent_event_queue_depth", "Events waiting in each event bus subscriber queue", labels=["subscriber"])
+        for index, (queue, _, _) in enumerate(list(event_bus._subscribers)):
+            queue_depth.add_metric([str(index)], queue.qsize())
+        yield queue_depth
+        yield CounterMetricFamily(
+            "agent_events_dropped", "Events dropped because a subscriber queue was full", value=event_bus.dropped_events)
+
+        stream_queued = sum(subscriber.queue.qsize() for subscriber in list(dashboard_publisher._subscribers))
+        yield GaugeMetricFamily(
+            "dashboard_stream_subscribers", "Open dashboard push streams", value=dashboard_publisher.subscriber_count)
+        yield GaugeMetricFamily(
+            "dashboard_stream_queued_events", "Events queued across all dashboard stream subscribers", value=stream_queued)
+
+        try:
+            limiter = anyio.to_thread.current_default_thread_limiter()
+            yield GaugeMetricFamily("db_threadpool_busy_threads", "Threads running blocking work", value=limiter.borrowed_tokens)
+            yield GaugeMetricFamily("db_threadpool_threads", "Threadpool size", value=limiter.total_tokens)
+        except RuntimeError:
+            pass  # scraped outside the event loop
+
+        in_use = GaugeMetricFamily("db_pool_in_use", "Checked-out connections", labels=["engine"])
+        idle = GaugeMetricFamily("db_pool_idle", "Idle pooled connections", labels=["engine"])
+        timeouts = CounterMetricFamily("db_pool_checkout_timeouts", "Checkouts that timed out", labels=["engine"])
+        wait = HistogramMetricFamily("db_pool_checkout_wait_seconds", "Time waiting for a pooled connection", labels=["engine"])
+        for name, pool in [("primary", engine.pool), ("analytics", analytics_engine.pool)]:
+            if hasattr(pool, "checkedout"):
+                in_use.add_metric([name], pool.checkedout())
+                idle.add_metric([name], pool.checkedin())
+            metrics = pool_metrics.get(name)
+            if metrics:
+                timeouts.add_metric([name], metrics.counters["checkout_timeouts"])
+                snapshot = metrics.checkout_wait.snapshot()
+                wait.add_metric(
+                    [name],
+                    [("+Inf" if bucket["le"] == float("inf") else str(bucket["le"]), bucket["count"]) for bucket in snapshot["buckets"]],
+                    sum_value=snapshot["sum"]
+                )
+        yield in_use
+        yield idle
+        yield timeouts
+        yield wait
+
+instrument_queries(engine, "primary")
+instrument_queries(analytics_engine, "analytics")
+REGISTRY.register(RuntimeCollector())
+
+def render_metrics() -> bytes:
+    return generate_latest(REGISTRY)
@@ -3,9 +3,11 @@ import asyncio
 import logging
 from typing import Optional, List
 from datetime import datetime
+from services.tracing import trace_methods
 
 logger = logging.getLogger(__name__)
 
+@trace_methods("notification")
 class NotificationService:
     def __init__(self):
         pass
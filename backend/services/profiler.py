@@ -0,0 +1,152 @@
+# backend/services/profiler.py
+import asyncio
+import cProfile
+import io
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict
+from services.db_offload import run_blocking, run_on_thread_loop
+from config import config
+import logging
+
+logger = logging.getLogger(__name__)
+
+SAMPLE = "sample"
+CPROFILE = "cprofile"
+TRACEMALLOC = "tracemalloc"
+MODES = [SAMPLE, CPROFILE, TRACEMALLOC]
+
+class ProfilerBusyError(Exception):
+    pass
+
+_profile_lock = threading.Lock()  # one profile per process: cProfile and tracemalloc are global
+
+class _StackSampler:
+    """Samples one thread's stack on a timer; stacks are kept as code-object tuples and
+    only formatted at the end, so each sample costs a frame walk and a Counter update"""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            if stack:
+                self.samples[tuple(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed-stack format, readable by flamegraph.pl and speedscope"""
+        lines = []
+        for stack, count in self.samples.most_common():
+            frames = ";".join(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})" for code in stack)
+            lines.append(f"{frames} {count}")
+        return "\n".join(lines) + "\n"
+
+async def profile_run(mode: str, fn, *args, top: int = 50, raw: bool = False) -> Dict:
+    """Run `fn` (a blocking function or async def, as run_blocking accepts) once under a profiler.
+
+    sample: collapsed stacks from periodic sampling of the worker thread (low overhead).
+    cprofile: deterministic per-call timings as a pstats listing, or the binary .prof dump if `raw`.
+    tracemalloc: the top allocation sites still holding memory when the run ends, plus the peak."""
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {', '.join(MODES)}")
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusyError("A profile is already running")
+    try:
+        logger.info(f"🔬 Profiling {getattr(fn, '__qualname__', fn)} ({mode})")
+        return await run_blocking(_profile_on_thread, mode, fn, args, top, raw)
+    finally:
+        _profile_lock.release()
+
+def _call(fn, args):
+    if asyncio.iscoroutinefunction(fn):
+        return run_on_thread_loop(fn, *args)
+    return fn(*args)
+
+def _profile_on_thread(mode: str, fn, args, top: int, raw: bool) -> Dict:
+    # Runs on the worker thread that executes `fn`: cProfile only sees the thread that enabled it
+    started = time.perf_counter()
+    error = None
+
+    if mode == SAMPLE:
+        sampler = _StackSampler(threading.get_ident(), config.PROFILE_SAMPLE_INTERVAL_MS / 1000)
+        sampler.start()
+        try:
+            _call(fn, args)
+        except Exception as e:
+            error = str(e)
+        finally:
+            sampler.stop()
+        result = {"samples": sum(sampler.samples.values()), "collapsed": sampler.collapsed()}
+
+    elif mode == CPROFILE:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            _call(fn, args)
+        except Exception as e:
+            error = str(e)
+        finally:
+            profiler.disable()
+        result = {"pstats": _dump_stats(profiler) if raw else _format_stats(profiler, top)}
+
+    else:
+        was_tracing = tracemalloc.is_tracing()
+        if not was_tracing:
+            tracemalloc.start(config.PROFILE_TRACEMALLOC_FRAMES)
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        try:
+            _call(fn, args)
+        except Exception as e:
+            error = str(e)
+        finally:
+            after = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            if not was_tracing:
+                tracemalloc.stop()
+        result = {"peak_kb": round(peak / 1024, 1), "top_allocations": _top_allocations(before, after, top)}
+
+    result.update({"mode": mode, "duration_ms": round((time.perf_counter() - started) * 1000, 1), "error": error})
+    return result
+
+def _format_stats(profiler: cProfile.Profile, top: int) -> str:
+    output = io.StringIO()
+    stats = pstats.Stats(profiler, stream=output)
+    stats.strip_dirs().sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
+    return output.getvalue()
+
+def _dump_stats(profiler: cProfile.Profile) -> bytes:
+    # pstats only writes marshal dumps to a path; the file is what snakeviz / pstats.Stats(path) load
+    with tempfile.NamedTemporaryFile(suffix=".prof") as dump:
+        profiler.dump_stats(dump.name)
+        return dump.read()
+
+def _top_allocations(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot, top: int):
+    ignored = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")]
+    diff = after.filter_traces(ignored).compare_to(before.filter_traces(ignored), "lineno")
+    return [
+        {"site": str(stat.traceback[0]), "size_kb": round(stat.size_diff / 1024, 1), "count": stat.count_diff}
+        for stat in diff[:top] if stat.size_diff > 0
+    ]
@@ -0,0 +1,159 @@
+# backend/services/sentiment_analyzer.py
+import re
+from datetime import datetime
+from typing import Dict, List, Optional
+import numpy as np
+from sqlalchemy.orm import Session
+from sqlalchemy import text, bindparam
+from config import config
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Weighted lexicon tuned for customer-success messages (support tickets, emails, chats)
+SENTIMENT_LEXICON = {
+    # positive
+    "good": 1.0, "great": 1.5, "excellent": 2.0, "amazing": 2.0, "awesome": 2.0, "fantastic": 2.0,
+    "happy": 1.5, "satisfied": 1.5, "love": 2.0, "loving": 2.0, "like": 0.5, "enjoy": 1.0,
+    "helpful": 1.5, "thanks": 1.0, "thank": 1.0, "appreciate": 1.5, "appreciated": 1.5,
+    "impressed": 1.5, "perfect": 2.0, "smooth": 1.0, "easy": 1.0, "intuitive": 1.5,
+    "reliable": 1.5, "fast": 1.0, "valuable": 1.5, "recommend": 1.5, "resolved": 1.0,
+    "fixed": 1.0, "improved": 1.0, "improvement": 1.0, "pleased": 1.5, "glad": 1.0,
+    "renew": 1.5, "upgrade": 1.0, "expand": 1.0,
+    # negative
+    "bad": -1.0, "terrible": -2.0, "awful": -2.0, "horrible": -2.0, "worst": -2.0, "hate": -2.0,
+    "angry": -1.5, "frustrated": -1.5, "frustrating": -1.5, "disappointed": -1.5, "disappointing": -1.5,
+    "unhappy": -1.5, "annoyed": -1.0, "annoying": -1.0, "confusing": -1.0, "confused": -1.0,
+    "complicated": -1.0, "difficult": -1.0, "slow": -1.0, "broken": -1.5, "bug": -1.0, "bugs": -1.0,
+    "buggy": -1.5, "crash": -1.5, "crashes": -1.5, "error": -1.0, "errors": -1.0, "fail": -1.5,
+    "failed": -1.5, "failing": -1.5, "outage": -2.0, "downtime": -1.5, "issue": -0.5, "issues": -0.5,
+    "problem": -1.0, "problems": -1.0, "expensive": -1.0, "overpriced": -1.5, "waste": -1.5,
+    "useless": -2.0, "unacceptable": -2.0, "cancel": -2.0, "cancelling": -2.0, "canceling": -2.0,
+    "cancellation": -2.0, "refund": -1.5, "competitor": -1.0, "switch": -1.0, "switching": -1.0,
+    "leave": -1.0, "leaving": -1.5, "churn": -1.5, "unresponsive": -1.5, "ignored": -1.5,
+    "overcharged": -2.0, "missing": -0.5, "lacking": -1.0, "poor": -1.5,
+}
+
+NEGATORS = ["not", "no", "never", "don't", "doesn't", "didn't", "isn't", "wasn't", "aren't",
+            "can't", "cannot", "won't", "hardly"]
+
+NEGATION_FACTOR = -0.75  # "not good" is milder than "bad"
+
+MESSAGE_SEPARATOR = "\n"
+
+def _compile_lexicon_pattern(lexicon: Dict[str, float]) -> re.Pattern:
+    """One alternation over the whole lexicon, anchored on token boundaries, with an optional
+    negator up to one word before the match"""
+    words = "|".join(re.escape(word) for word in sorted(lexicon, key=len, reverse=True))
+    negators = "|".join(re.escape(word) for word in NEGATORS)
+    return re.compile(
+        rf"(?<![\w'])(?:(?P<negator>{negators})\s+(?:[\w']+\s+)?)?(?P<word>{words})(?![\w'])"
+    )
+
+class SentimentAnalyzer:
+    """Lexicon sentiment scoring in [-1, 1], for one message or many at once"""
+
+    def __init__(self, lexicon: Dict[str, float] = None):
+        self.lexicon = lexicon or SENTIMENT_LEXICON
+        self._pattern = _compile_lexicon_pattern(self.lexicon)
+
+    def score(self, message: str) -> float:
+        return float(self.score_batch([message])[0])
+
+    def score_batch(self, messages: List[str]) -> np.ndarray:
+        """Score many messages with one regex pass over their concatenation"""
+        if not messages:
+            return np.zeros(0)
+
+        cleaned = [(message or "").lower().replace(MESSAGE_SEPARATOR, " ") for message in messages]
+        corpus = MESSAGE_SEPARATOR.join(cleaned)
+
+        # Start offset of each message inside the corpus, to map matches back to messages
+        lengths = np.fromiter((len(message) + 1 for message in cleaned), dtype=np.int64, count=len(cleaned))
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+        positions, weights = [], []
+        for match in self._pattern.finditer(corpus):
+            weight = self.lexicon[match.group("word")]
+            if match.group("negator"):
+                weight *= NEGATION_FACTOR
+            positions.append(match.start("word"))
+            weights.append(weight)
+
+        if not positions:
+            return np.zeros(len(messages))
+
+        owners = np.searchsorted(starts, np.asarray(positions), side="right") - 1
+        weights = np.asarray(weights)
+
+        # Same shape as the original (positive - negative) / (positive + negative), but weighted
+        net = np.bincount(owners, weights=weights, minlength=len(messages))
+        total = np.bincount(owners, weights=np.abs(weights), minlength=len(messages))
+        return np.divide(net, total, out=np.zeros(len(messages)), where=total > 0)
+
+sentiment_analyzer = SentimentAnalyzer()
+
+# Progress of the most recent backfill in this process, for the status endpoint
+backfill_status: Dict = {"running": False}
+
+def backfill_sentiment_scores(db: Session, chunk_size: int = None, after_id: int = 0,
+                              customer_ids: Optional[List[int]] = None) -> int:
+    """Re-score customer_communications in keyset-ordered chunks, one commit per chunk.
+
+    Safe to interrupt: rerun with after_id set to the last reported communication_id."""
+    chunk_size = chunk_size or config.SENTIMENT_BACKFILL_CHUNK_SIZE
+    customer_filter = "AND customer_id IN :customer_ids" if customer_ids else ""
+
+    select_chunk = text(f"""
+        SELECT communication_id, message_content
+        FROM customer_communications
+        WHERE communication_id > :after_id {customer_filter}
+        ORDER BY communication_id
+        LIMIT :chunk_size
+    """)
+    if customer_ids:
+        select_chunk = select_chunk.bindparams(bindparam("customer_ids", expanding=True))
+
+    update_scores = text("""
+        UPDATE customer_communications
+        SET sentiment_score = :sentiment_score
+        WHERE communication_id = :communication_id
+    """)
+
+    backfill_status.update({
+        "running": True, "started_at": datetime.now().isoformat(), "completed_at": None,
+        "rescored": 0, "last_communication_id": after_id, "error": None
+    })
+    rescored = 0
+
+    try:
+        while True:
+            params = {"after_id": after_id, "chunk_size": chunk_size}
+            if customer_ids:
+                params["customer_ids"] = customer_ids
+            rows = db.execute(select_chunk, params).fetchall()
+            if not rows:
+                break
+
+            scores = sentiment_analyzer.score_batch([row.message_content for row in rows])
+            db.execute(update_scores, [
+                {"communication_id": row.communication_id, "sentiment_score": float(score)}
+                for row, score in zip(rows, scores)
+            ])
+            db.commit()
+
+            rescored += len(rows)
+            after_id = rows[-1].communication_id
+            backfill_status.update({"rescored": rescored, "last_communication_id": after_id})
+
+        logger.info(f"✅ Sentiment backfill re-scored {rescored} communications")
+        return rescored
+
+    except Exception as e:
+        logger.error(f"Sentiment backfill stopped after communication {after_id}: {e}")
+        db.rollback()
+        backfill_status["error"] = str(e)
+        return rescored
+
+    finally:
+        backfill_status.update({"running": False, "completed_at": datetime.now().isoformat()})
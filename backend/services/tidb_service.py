@@ -6,14 +6,56 @@ import math
 from scipy.spatial.distance import cosine
 from typing import List, Dict, Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import text, func
+from sqlalchemy import text, func, bindparam
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime, timedelta
-from models.database import Customer, RetentionPattern, ChurnIntervention, AgentActivity, AgentMemory, CustomerCommunication
+from models.database import (
+    Customer, RetentionPattern, RetentionPatternStats, ChurnIntervention, AgentActivity, AgentMemory,
+    CustomerCommunication, PATTERN_STAT_FEATURES, analytics_session
+)
+from services.event_bus import event_bus, COMMUNICATION_RECEIVED
+from services.communication_search import communication_search
+from services.sentiment_analyzer import sentiment_analyzer
+from services.customer_graph import customer_graph
+from services.graph_traversal import retention_graph_cache
+from services.tracing import trace_methods
+from config import config
 import uuid
 import logging
 
 logger = logging.getLogger(__name__)
 
+_stat_columns = [f"{feature}_{suffix}" for feature in PATTERN_STAT_FEATURES for suffix in ("sum", "sum_sq")]
+
+# New stats rows start from PATTERN_PRIOR_WEIGHT pseudo-attempts at the pattern's existing success_rate
+PATTERN_STATS_UPSERT = text(f"""
+    INSERT INTO retention_pattern_stats (
+        pattern_id, attempt_count, success_count, decayed_attempts, decayed_successes,
+        {", ".join(_stat_columns)}, updated_at
+    )
+    SELECT id, :attempts, :successes,
+           :prior_weight * :decay_factor + :decayed_attempts,
+           :prior_weight * success_rate * :decay_factor + :decayed_successes,
+           {", ".join(":" + column for column in _stat_columns)}, :now
+    FROM retention_patterns
+    WHERE id = :pattern_id
+    ON DUPLICATE KEY UPDATE
+        attempt_count = attempt_count + :attempts,
+        success_count = success_count + :successes,
+        decayed_attempts = decayed_attempts * :decay_factor + :decayed_attempts,
+        decayed_successes = decayed_successes * :decay_factor + :decayed_successes,
+        {", ".join(f"{column} = {column} + :{column}" for column in _stat_columns)},
+        updated_at = :now
+""")
+
+PATTERN_SUCCESS_RATE_REFRESH = text("""
+    UPDATE retention_patterns p
+    JOIN retention_pattern_stats s ON s.pattern_id = p.id
+    SET p.success_rate = s.decayed_successes / s.decayed_attempts,
+        p.updated_at = :now
+    WHERE p.id IN :pattern_ids AND s.decayed_attempts > 0
+""").bindparams(bindparam("pattern_ids", expanding=True))
+
 # Generate semantic embedding:
 def generate_semantic_embedding(text: str, dimension: int = 768) -> List[float]:
     """Generate consistent, meaningful embedding from customer text"""
@@ -50,6 +92,48 @@ def generate_semantic_embedding(text: str, dimension: int = 768) -> List[float]:
     
     return embedding
  
+# Churn risk bands as [low, high) churn_probability bounds
+RISK_LEVEL_BOUNDS = {
+    "low": (None, 0.4),
+    "medium": (0.4, 0.6),
+    "high": (0.6, 0.8),
+    "critical": (0.8, None)
+}
+
+def _risk_band_condition(low: Optional[float], high: Optional[float]) -> str:
+    conditions = []
+    if low is not None:
+        conditions.append(f"churn_probability >= {low}")
+    if high is not None:
+        conditions.append(f"churn_probability < {high}")
+    return " AND ".join(conditions)
+
+CUSTOMER_AGGREGATES = text(f"""
+    SELECT COUNT(*) AS total_customers,
+           SUM(CASE WHEN churn_probability >= 0.6 THEN 1 ELSE 0 END) AS high_risk_customers,
+           {", ".join(
+               f"SUM(CASE WHEN {_risk_band_condition(low, high)} THEN 1 ELSE 0 END) AS {level}_count, "
+               f"SUM(CASE WHEN {_risk_band_condition(low, high)} THEN annual_contract_value ELSE 0 END) AS {level}_at_risk"
+               for level, (low, high) in RISK_LEVEL_BOUNDS.items()
+           )}
+    FROM customers
+""")
+
+INTERVENTION_AGGREGATES = text("""
+    SELECT SUM(CASE WHEN actual_outcome = 'retained' THEN 1 ELSE 0 END) AS retained_count,
+           SUM(CASE WHEN actual_outcome = 'retained' THEN estimated_retention_value ELSE 0 END) AS retained_value,
+           SUM(CASE WHEN created_at >= :since THEN 1 ELSE 0 END) AS processed_24h,
+           SUM(CASE WHEN created_at >= :since AND status = 'successful' THEN 1 ELSE 0 END) AS successful_24h,
+           SUM(CASE WHEN created_at >= :since AND churn_probability_before >= 0.8 THEN 1 ELSE 0 END) AS critical_24h
+    FROM churn_interventions
+""")
+
+TABLE_COUNTS = text("""
+    SELECT (SELECT COUNT(*) FROM agent_memory) AS agent_memories,
+           (SELECT COUNT(*) FROM customer_communications) AS communications
+""")
+
+@trace_methods("tidb")
 class TiDBService:
     def __init__(self, db: Session):
         self.db = db
@@ -97,6 +181,7 @@ class TiDBService:
             
             # Sort by similarity and return top results
             similarities.sort(key=lambda x: x[1], reverse=True)
+            succeeded_ids = self._succeeded_pattern_ids([pattern for pattern, _ in similarities[:limit]])
             
             similar_cases = []
             for pattern, similarity in similarities[:limit]:
@@ -105,7 +190,7 @@ class TiDBService:
                         "id": pattern.id,
                         "pattern_name": pattern.pattern_name,
                         "customer_characteristics": json.loads(pattern.customer_characteristics or "{}"),
-                        "successful_interventions": json.loads(pattern.successful_interventions or "[]"),
+                        "successful_interventions": self._successful_interventions(pattern, succeeded_ids),
                         "success_rate": pattern.success_rate,
                         "customer_segment": pattern.customer_segment,
                         "churn_reason_category": pattern.churn_reason_category,
@@ -130,6 +215,7 @@ class TiDBService:
                 RetentionPattern.customer_segment == customer_segment
             ).order_by(RetentionPattern.success_rate.desc()).limit(limit).all()
             
+            succeeded_ids = self._succeeded_pattern_ids(patterns)
             segment_patterns = []
             for pattern in patterns:
                 try:
@@ -137,7 +223,7 @@ class TiDBService:
                         "id": pattern.id,
                         "pattern_name": pattern.pattern_name,
                         "customer_characteristics": json.loads(pattern.customer_characteristics or "{}"),
-                        "successful_interventions": json.loads(pattern.successful_interventions or "[]"),
+                        "successful_interventions": self._successful_interventions(pattern, succeeded_ids),
                         "success_rate": pattern.success_rate,
                         "customer_segment": pattern.customer_segment,
                         "churn_reason_category": pattern.churn_reason_category or "general",
@@ -223,125 +309,219 @@ class TiDBService:
         logger.info(f"Using default retention patterns for {customer_segment}")
         return patterns
 
-    async def update_retention_patterns(self, customer_segment: str, intervention_type: str, 
-                                       strategy: str, success: bool, customer_characteristics: Dict):
-        """Update retention patterns based on intervention outcomes"""
+    async def apply_retention_outcomes(self, pattern_outcomes: Dict[tuple, List[Dict]],
+                                       intervention_ids: List[int]) -> int:
+        """Apply new intervention outcomes to retention patterns in one transaction.
+        
+        pattern_outcomes maps (customer_segment, intervention_type, strategy) to the outcomes
+        for that pattern in completion order. The interventions are marked as learned in the
+        same transaction, so every outcome is applied exactly once."""
         try:
-            # Find existing pattern or create new one
-            pattern_name = f"{customer_segment}_{intervention_type}_{strategy}"
+            # Claim the outcomes first - if another learner got to any of them, leave the batch to it
+            claimed = self.db.query(ChurnIntervention).filter(
+                ChurnIntervention.id.in_(intervention_ids),
+                ChurnIntervention.patterns_learned_at.is_(None)
+            ).update({ChurnIntervention.patterns_learned_at: datetime.now()}, synchronize_session=False)
+            
+            if claimed != len(intervention_ids):
+                logger.info(f"Retention outcomes already claimed by another learner ({claimed}/{len(intervention_ids)})")
+                self.db.rollback()
+                return 0
+            
+            pattern_ids = self._get_or_create_pattern_ids(pattern_outcomes)
+            now = datetime.now()
+            
+            # One atomic upsert per pattern - increments, so concurrent learners never lose updates
+            stat_rows = []
+            for key, outcomes in pattern_outcomes.items():
+                stat_rows.append({
+                    "pattern_id": pattern_ids[key],
+                    "now": now,
+                    "prior_weight": config.PATTERN_PRIOR_WEIGHT,
+                    **self._aggregate_pattern_outcomes(outcomes)
+                })
             
-            existing_pattern = self.db.query(RetentionPattern).filter(
-                RetentionPattern.pattern_name == pattern_name,
-                RetentionPattern.customer_segment == customer_segment
-            ).first()
+            self.db.execute(PATTERN_STATS_UPSERT, stat_rows)
             
-            if existing_pattern:
-                # Update existing pattern
-                characteristics = json.loads(existing_pattern.customer_characteristics or "{}")
-                interventions = json.loads(existing_pattern.successful_interventions or "[]")
-                
-                # Update success rate (simple moving average)
-                if success:
-                    existing_pattern.success_rate = (existing_pattern.success_rate + 1.0) / 2
-                    if strategy not in interventions:
-                        interventions.append(strategy)
-                else:
-                    existing_pattern.success_rate = existing_pattern.success_rate * 0.9  # Decay on failure
-                
-                # Update characteristics
-                for key, value in customer_characteristics.items():
-                    if key in characteristics:
-                        if isinstance(value, (int, float)):
-                            characteristics[key] = (characteristics[key] + value) / 2
-                        else:
-                            characteristics[key] = value
-                    else:
-                        characteristics[key] = value
-                
-                existing_pattern.customer_characteristics = json.dumps(characteristics)
-                existing_pattern.successful_interventions = json.dumps(interventions)
-                existing_pattern.updated_at = datetime.now()
-                
-            else:
-                # Create new pattern
-                new_pattern = RetentionPattern(
-                    pattern_name=pattern_name,
-                    customer_characteristics=json.dumps(customer_characteristics),
-                    successful_interventions=json.dumps([strategy] if success else []),
-                    success_rate=1.0 if success else 0.1,
-                    customer_segment=customer_segment,
-                    churn_reason_category=intervention_type,
-                    embedding=json.dumps([0.0] * 768)  # Placeholder embedding
-                )
-                self.db.add(new_pattern)
+            # success_rate stays a plain column so vector search can keep filtering on it
+            self.db.execute(PATTERN_SUCCESS_RATE_REFRESH, {
+                "pattern_ids": list(pattern_ids.values()),
+                "now": now
+            })
             
             self.db.commit()
-            logger.info(f"Updated retention pattern: {pattern_name} (success: {success})")
+            logger.info(f"Applied {len(intervention_ids)} outcomes to {len(pattern_ids)} retention patterns")
+            return len(intervention_ids)
             
         except Exception as e:
             logger.error(f"Error updating retention patterns: {e}")
             self.db.rollback()
-
-    async def get_churn_analytics(self) -> Dict:
-        """Get comprehensive churn analytics"""
-        try:
-            total_customers = self.db.query(Customer).count()
-            high_risk_customers = self.db.query(Customer).filter(
-                Customer.churn_probability >= 0.6
-            ).count()
-            
-            # Churn distribution by risk level
-            churn_distribution = {}
-            risk_levels = ['low', 'medium', 'high', 'critical']
-            
-            for level in risk_levels:
-                if level == 'low':
-                    customers = self.db.query(Customer).filter(Customer.churn_probability < 0.4).all()
-                elif level == 'medium':
-                    customers = self.db.query(Customer).filter(
-                        Customer.churn_probability >= 0.4,
-                        Customer.churn_probability < 0.6
-                    ).all()
-                elif level == 'high':
-                    customers = self.db.query(Customer).filter(
-                        Customer.churn_probability >= 0.6,
-                        Customer.churn_probability < 0.8
-                    ).all()
-                else:  # critical
-                    customers = self.db.query(Customer).filter(Customer.churn_probability >= 0.8).all()
-                
-                total_at_risk = sum(c.annual_contract_value for c in customers)
-                
-                churn_distribution[level] = {
-                    'count': len(customers),
-                    'total_at_risk': total_at_risk
+            return 0
+    
+    def _get_or_create_pattern_ids(self, pattern_outcomes: Dict[tuple, List[Dict]]) -> Dict[tuple, int]:
+        """Map (segment, intervention_type, strategy) keys to retention_patterns ids, creating missing patterns"""
+        names = {f"{segment}_{itype}_{strategy}": (segment, itype, strategy)
+                 for segment, itype, strategy in pattern_outcomes}
+        
+        def load_ids():
+            return {
+                names[row.pattern_name]: row.id
+                for row in self.db.query(
+                    RetentionPattern.id, RetentionPattern.pattern_name, RetentionPattern.customer_segment
+                ).filter(RetentionPattern.pattern_name.in_(list(names.keys())))
+                if row.pattern_name in names and names[row.pattern_name][0] == row.customer_segment
+            }
+        
+        pattern_ids = load_ids()
+        missing = [key for key in names.values() if key not in pattern_ids]
+        
+        for segment, intervention_type, strategy in missing:
+            first = pattern_outcomes[(segment, intervention_type, strategy)][0]
+            try:
+                with self.db.begin_nested():
+                    self.db.add(RetentionPattern(
+                        pattern_name=f"{segment}_{intervention_type}_{strategy}",
+                        customer_characteristics=json.dumps(first["customer_characteristics"]),
+                        successful_interventions=json.dumps([]),  # strategy is listed once its stats record a success
+                        strategy=strategy,
+                        success_rate=0.5,  # uninformative until the counters take over
+                        customer_segment=segment,
+                        churn_reason_category=intervention_type,
+                        embedding=json.dumps([0.0] * 768)  # Placeholder embedding
+                    ))
+            except IntegrityError:
+                pass  # created concurrently by another learner
+        
+        if missing:
+            pattern_ids = load_ids()
+        return pattern_ids
+    
+    def _succeeded_pattern_ids(self, patterns: List[RetentionPattern]) -> set:
+        """Learned patterns whose strategy has succeeded at least once, read from the stats counters"""
+        learned_ids = [pattern.id for pattern in patterns if pattern.strategy]
+        if not learned_ids:
+            return set()
+        return {row.pattern_id for row in self.db.query(RetentionPatternStats.pattern_id).filter(
+            RetentionPatternStats.pattern_id.in_(learned_ids),
+            RetentionPatternStats.success_count > 0
+        )}
+    
+    def _successful_interventions(self, pattern: RetentionPattern, succeeded_ids: set) -> List[str]:
+        interventions = json.loads(pattern.successful_interventions or "[]")
+        if pattern.id in succeeded_ids and pattern.strategy not in interventions:
+            interventions.append(pattern.strategy)
+        return interventions
+    
+    def _aggregate_pattern_outcomes(self, outcomes: List[Dict]) -> Dict:
+        """Counter deltas for a batch of outcomes applied in order"""
+        successes = np.array([1.0 if o["success"] else 0.0 for o in outcomes])
+        
+        # Applying d = d * decay + x once per outcome equals d * decay^n + sum(decay^(n-1-i) * x_i)
+        weights = config.PATTERN_DECAY ** np.arange(len(outcomes) - 1, -1, -1)
+        
+        deltas = {
+            "attempts": len(outcomes),
+            "successes": int(successes.sum()),
+            "decay_factor": config.PATTERN_DECAY ** len(outcomes),
+            "decayed_attempts": float(weights.sum()),
+            "decayed_successes": float((weights * successes).sum())
+        }
+        
+        for feature in PATTERN_STAT_FEATURES:
+            values = np.array([float(o["customer_characteristics"].get(feature) or 0.0) for o in outcomes])
+            deltas[f"{feature}_sum"] = float(values.sum())
+            deltas[f"{feature}_sum_sq"] = float((values ** 2).sum())
+        
+        return deltas
+    
+    async def get_pattern_statistics(self, pattern_ids: List[int]) -> Dict[int, Dict]:
+        """Counters, decayed success rate and trait means/variances per pattern"""
+        if not pattern_ids:
+            return {}
+        
+        statistics = {}
+        for stats in self.db.query(RetentionPatternStats).filter(RetentionPatternStats.pattern_id.in_(pattern_ids)):
+            n = stats.attempt_count or 0
+            traits = {}
+            for feature in PATTERN_STAT_FEATURES:
+                total = getattr(stats, f"{feature}_sum") or 0.0
+                total_sq = getattr(stats, f"{feature}_sum_sq") or 0.0
+                mean = total / n if n else 0.0
+                traits[feature] = {
+                    "mean": mean,
+                    "variance": max(total_sq / n - mean * mean, 0.0) if n else 0.0
                 }
             
-            # Agent performance metrics
-            recent_interventions = self.db.query(ChurnIntervention).filter(
-                ChurnIntervention.created_at >= datetime.now() - timedelta(hours=24)
-            ).all()
-            
-            successful_interventions = [i for i in recent_interventions if i.status == 'successful']
-            
-            agent_performance = {
+            statistics[stats.pattern_id] = {
+                "attempts": n,
+                "successes": stats.success_count or 0,
+                "success_rate": (stats.success_count or 0) / n if n else 0.0,
+                "decayed_success_rate": stats.decayed_successes / stats.decayed_attempts if stats.decayed_attempts else 0.0,
+                "customer_traits": traits
+            }
+        return statistics
+
+    async def get_dashboard_aggregates(self, table_counts: bool = False) -> Dict:
+        """Customer and intervention counts shared by the dashboard endpoints, one aggregate query per table"""
+        customers = self.db.execute(CUSTOMER_AGGREGATES).fetchone()
+        interventions = self.db.execute(INTERVENTION_AGGREGATES, {
+            "since": datetime.now() - timedelta(hours=24)
+        }).fetchone()
+
+        aggregates = {
+            "total_customers": customers.total_customers or 0,
+            "high_risk_customers": int(customers.high_risk_customers or 0),
+            "churn_distribution": {
+                level: {
+                    "count": int(getattr(customers, f"{level}_count") or 0),
+                    "total_at_risk": float(getattr(customers, f"{level}_at_risk") or 0.0)
+                }
+                for level in RISK_LEVEL_BOUNDS
+            },
+            "retained_interventions": int(interventions.retained_count or 0),
+            "revenue_retained": float(interventions.retained_value or 0.0),
+            "interventions_24h": int(interventions.processed_24h or 0),
+            "successful_interventions_24h": int(interventions.successful_24h or 0),
+            "critical_interventions_24h": int(interventions.critical_24h or 0)
+        }
+
+        if table_counts:
+            # agent_memory and customer_communications are created by the enhanced-table setup
+            try:
+                counts = self.db.execute(TABLE_COUNTS).fetchone()
+                aggregates["agent_memories"] = counts.agent_memories or 0
+                aggregates["communications"] = counts.communications or 0
+            except Exception as e:
+                logger.warning(f"Enhanced tables not available: {e}")
+                self.db.rollback()
+                aggregates["agent_memories"] = aggregates["communications"] = 0
+
+        return aggregates
+
+    def format_churn_analytics(self, aggregates: Dict) -> Dict:
+        """Churn analytics response from get_dashboard_aggregates() results"""
+        processed = aggregates['interventions_24h']
+        return {
+            'total_customers': aggregates['total_customers'],
+            'high_risk_customers': aggregates['high_risk_customers'],
+            'churn_distribution': aggregates['churn_distribution'],
+            'agent_performance': {
                 'autonomy_level': 94.7,  # Mock high autonomy
                 'avg_response_time_minutes': 0.23,  # 14 seconds
-                'customers_processed_24h': len(recent_interventions),
-                'critical_interventions_24h': len([i for i in recent_interventions 
-                                                 if i.churn_probability_before >= 0.8]),
-                'success_rate': len(successful_interventions) / max(len(recent_interventions), 1) * 100
-            }
-            
-            return {
-                'total_customers': total_customers,
-                'high_risk_customers': high_risk_customers,
-                'churn_distribution': churn_distribution,
-                'agent_performance': agent_performance
+                'customers_processed_24h': processed,
+                'critical_interventions_24h': aggregates['critical_interventions_24h'],
+                'success_rate': aggregates['successful_interventions_24h'] / max(processed, 1) * 100
             }
+        }
+
+    async def get_churn_analytics(self) -> Dict:
+        """Get comprehensive churn analytics"""
+        try:
+            return self.format_churn_analytics(await self.get_dashboard_aggregates())
             
         except Exception as e:
             logger.error(f"Error getting churn analytics: {e}")
+            self.db.rollback()
             return {
                 'total_customers': 0,
                 'high_risk_customers': 0,
@@ -380,12 +560,11 @@ class TiDBService:
                     continue
             
             # Get current system status
+            aggregates = await self.get_dashboard_aggregates()
             status = {
                 'active_monitoring': True,
-                'customers_monitored': self.db.query(Customer).count(),
-                'interventions_today': self.db.query(ChurnIntervention).filter(
-                    ChurnIntervention.created_at >= datetime.now() - timedelta(days=1)
-                ).count(),
+                'customers_monitored': aggregates['total_customers'],
+                'interventions_today': aggregates['interventions_24h'],
                 'system_health': 'optimal'
             }
             
@@ -480,12 +659,17 @@ class TiDBService:
                 message_content=message,
                 communication_type=comm_type,
                 communication_direction=direction,
-                sentiment_score=self._analyze_sentiment(message)
+                sentiment_score=sentiment_analyzer.score(message)
             )
             
             self.db.add(communication)
             self.db.commit()
             
+            communication_search.add_communication(communication)
+            
+            if direction == 'inbound':
+                event_bus.publish(COMMUNICATION_RECEIVED, customer_id, {"communication_id": communication.communication_id})
+            
             logger.info(f"Stored communication for customer {customer_id}")
             return True
             
@@ -496,45 +680,10 @@ class TiDBService:
     
     async def full_text_search_communications(self, customer_id: int, 
                                             search_terms: str) -> List[Dict]:
-        """Use TiDB full-text search on customer communications"""
+        """BM25-ranked search over customer communications (TiDB FULLTEXT when available)"""
         
         try:
-            # For TiDB, we'll use LIKE search since FULLTEXT might need configuration
-            fulltext_query = text("""
-                SELECT communication_id, customer_id, message_content, communication_type,
-                       timestamp, sentiment_score, communication_direction
-                FROM customer_communications
-                WHERE customer_id = :customer_id
-                  AND (message_content LIKE :search_pattern1 
-                       OR message_content LIKE :search_pattern2
-                       OR message_content LIKE :search_pattern3)
-                ORDER BY timestamp DESC
-                LIMIT 10
-            """)
-            
-            # Create search patterns from terms
-            terms = search_terms.split()
-            patterns = [f"%{term}%" for term in terms[:3]]  # Take first 3 terms
-            
-            result = self.db.execute(fulltext_query, {
-                "customer_id": customer_id,
-                "search_pattern1": patterns[0] if len(patterns) > 0 else "%",
-                "search_pattern2": patterns[1] if len(patterns) > 1 else "%",
-                "search_pattern3": patterns[2] if len(patterns) > 2 else "%"
-            })
-            
-            communications = []
-            for row in result:
-                communications.append({
-                    "communication_id": row.communication_id,
-                    "customer_id": row.customer_id,
-                    "message_content": row.message_content,
-                    "communication_type": row.communication_type,
-                    "timestamp": row.timestamp.isoformat(),
-                    "sentiment_score": row.sentiment_score,
-                    "direction": row.communication_direction
-                })
-            
+            communications = communication_search.search(self.db, customer_id, search_terms)
             logger.info(f"Found {len(communications)} communications")
             return communications
             
@@ -546,67 +695,21 @@ class TiDBService:
         """Use Graph RAG to find customer relationship patterns"""
         
         try:
-            # Multi-hop relationship query using TiDB SQL
-            graph_query = text("""
-                WITH customer_network AS (
-                    -- Direct relationships (same company)
-                    SELECT c1.id as customer_id, c2.id as related_customer_id, 
-                           'same_company' as relationship_type, 1 as hop_distance,
-                           c2.name, c2.company, c2.churn_probability
-                    FROM customers c1
-                    JOIN customers c2 ON c1.company = c2.company
-                    WHERE c1.id = :customer_id AND c2.id != :customer_id
-                    
-                    UNION ALL
-                    
-                    -- Similar profile relationships  
-                    SELECT c1.id, c3.id, 'similar_profile' as relationship_type, 2 as hop_distance,
-                           c3.name, c3.company, c3.churn_probability
-                    FROM customers c1
-                    JOIN customers c3 ON c1.subscription_plan = c3.subscription_plan
-                    WHERE c1.id = :customer_id 
-                      AND ABS(c1.annual_contract_value - c3.annual_contract_value) < 10000
-                      AND c3.id != :customer_id
-                    LIMIT 10
-                )
-                SELECT cn.*, ci.strategy_chosen, ci.actual_outcome
-                FROM customer_network cn
-                LEFT JOIN churn_interventions ci ON cn.related_customer_id = ci.customer_id
-                ORDER BY cn.hop_distance, cn.churn_probability DESC
-            """)
-            
-            result = self.db.execute(graph_query, {"customer_id": customer_id})
-            
-            relationships = {
-                "direct_relationships": [],
-                "similar_profile_customers": [],
-                "successful_strategies": []
-            }
-            
-            for row in result:
-                relationship_data = {
-                    "customer_id": row.related_customer_id,
-                    "name": row.name,
-                    "company": row.company,
-                    "churn_probability": row.churn_probability,
-                    "relationship": row.relationship_type
-                }
+            # Graph builds and catch-up scans are analytical reads, so they go to the analytics engine
+            with analytics_session() as analytics_db:
+                # Neighbour lookups come from the maintained graph, not a per-call self-join
+                customer_graph.ensure_fresh(analytics_db)
+                relationships = customer_graph.get_relationships(customer_id)
                 
-                if row.hop_distance == 1:
-                    relationships["direct_relationships"].append(relationship_data)
-                else:
-                    if row.strategy_chosen and row.actual_outcome == 'retained':
-                        relationship_data["successful_strategy"] = row.strategy_chosen
-                        relationships["successful_strategies"].append(relationship_data)
-                    else:
-                        relationships["similar_profile_customers"].append(relationship_data)
+                # Multi-hop: strategies that worked around this customer, ranked by personalized PageRank
+                relationships["strategy_scores"] = retention_graph_cache.get(analytics_db).score_strategies(customer_id)
             
             logger.info(f"Found graph relationships for customer {customer_id}")
             return relationships
             
         except Exception as e:
             logger.error(f"Error in graph RAG: {e}")
-            return {"direct_relationships": [], "similar_profile_customers": [], "successful_strategies": []}
+            return {"direct_relationships": [], "similar_profile_customers": [], "successful_strategies": [], "strategy_scores": []}
     
     def _generate_memory_embedding(self, context: Dict, outcome: str) -> List[float]:
         """Generate embedding for agent memory"""
@@ -618,17 +721,3 @@ class TiDBService:
         except Exception as e:
             logger.error(f"Error generating memory embedding: {e}")
             return [0.0] * 768
-    
-    def _analyze_sentiment(self, message: str) -> float:
-        """Simple sentiment analysis (you can enhance with proper NLP)"""
-        positive_words = ['good', 'great', 'excellent', 'happy', 'satisfied', 'love', 'amazing']
-        negative_words = ['bad', 'terrible', 'hate', 'angry', 'frustrated', 'disappointed', 'awful']
-        
-        message_lower = message.lower()
-        positive_count = sum(1 for word in positive_words if word in message_lower)
-        negative_count = sum(1 for word in negative_words if word in message_lower)
-
-        if positive_count + negative_count == 0:
-            return 0.0
-            
-        return (positive_count - negative_count) / (positive_count + negative_count)
@@ -0,0 +1,220 @@
+# backend/services/tracing.py
+import asyncio
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from config import config
+import logging
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "customer-success-agent"
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "attributes", "start_ns", "end_ns", "error")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attributes: Dict):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        return (self.end_ns - self.start_ns) / 1e6 if self.end_ns else None
+
+class Trace:
+    """Spans of one agent cycle, trigger or intervention, in the order they started"""
+
+    def __init__(self):
+        self.trace_id = os.urandom(16).hex()
+        self.spans: List[Span] = []
+        self.dropped_spans = 0
+
+    @property
+    def root(self) -> Span:
+        return self.spans[0]
+
+    def add(self, span: Span) -> bool:
+        # Spans may start on worker threads; list.append is atomic so no lock is needed
+        if len(self.spans) >= config.TRACE_MAX_SPANS:
+            self.dropped_spans += 1
+            return False
+        self.spans.append(span)
+        return True
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+class TraceRecorder:
+    """Ring buffer of finished traces, with slow ones also kept in a separate flight recorder
+    so a burst of fast cycles can't evict them"""
+
+    def __init__(self):
+        self._recent: deque = deque(maxlen=config.TRACE_BUFFER_SIZE)
+        self._slow: deque = deque(maxlen=config.TRACE_SLOW_BUFFER_SIZE)
+        self._lock = threading.Lock()
+
+    def finish(self, trace: Trace):
+        root = trace.root
+        slow = root.duration_ms / 1000 >= config.TRACE_SLOW_CYCLE_SECONDS
+        with self._lock:
+            self._recent.append(trace)
+            if slow:
+                self._slow.append(trace)
+
+        if slow:
+            logger.warning(f"🐢 Slow trace {root.name} took {root.duration_ms / 1000:.1f}s "
+                           f"(threshold {config.TRACE_SLOW_CYCLE_SECONDS}s), span tree: "
+                           f"{json.dumps(trace_to_json(trace), default=str)}")
+
+    def traces(self, slow_only: bool = False, limit: int = 20) -> List[Trace]:
+        """Newest first"""
+        with self._lock:
+            traces = list(self._slow if slow_only else self._recent)
+        return traces[::-1][:limit]
+
+    def get(self, trace_id: str) -> Optional[Trace]:
+        with self._lock:
+            for trace in list(self._slow) + list(self._recent):
+                if trace.trace_id == trace_id:
+                    return trace
+        return None
+
+trace_recorder = TraceRecorder()
+
+@contextmanager
+def _run_span(span: Span):
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        span.end_ns = time.time_ns()
+        _current_span.reset(token)
+
+@contextmanager
+def trace(name: str, **attributes):
+    """Span that starts a new trace when none is active (e.g. an agent cycle), else nests"""
+    parent = _current_span.get()
+    if parent is not None:
+        with span(name, **attributes) as child:
+            yield child
+        return
+
+    root = Span(Trace(), name, None, attributes)
+    root.trace.add(root)
+    try:
+        with _run_span(root):
+            yield root
+    finally:
+        trace_recorder.finish(root.trace)
+
+@contextmanager
+def span(name: str, **attributes):
+    """Child span of the active trace; a no-op outside a trace so untraced paths pay one lookup"""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    child = Span(parent.trace, name, parent.span_id, attributes)
+    if not parent.trace.add(child):
+        yield None
+        return
+    with _run_span(child):
+        yield child
+
+def traced(name: str):
+    """Decorator wrapping a sync or async function in a span"""
+    def decorator(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def trace_methods(prefix: str):
+    """Class decorator putting every public method in a span named "<prefix>.<method>" """
+    def decorator(cls):
+        for attr, value in list(vars(cls).items()):
+            if not attr.startswith("_") and inspect.isfunction(value):
+                setattr(cls, attr, traced(f"{prefix}.{attr}")(value))
+        return cls
+    return decorator
+
+def trace_to_json(trace: Trace) -> Dict:
+    """Nested span tree"""
+    nodes = {}
+    for s in list(trace.spans):
+        nodes[s.span_id] = {
+            "name": s.name,
+            "span_id": s.span_id,
+            "start": s.start_ns / 1e9,
+            "duration_ms": s.duration_ms,
+            "attributes": s.attributes,
+            "error": s.error,
+            "children": []
+        }
+
+    root = None
+    for s in list(trace.spans):
+        if s.parent_id in nodes:
+            nodes[s.parent_id]["children"].append(nodes[s.span_id])
+        elif s.parent_id is None:
+            root = nodes[s.span_id]
+
+    return {"trace_id": trace.trace_id, "dropped_spans": trace.dropped_spans, "root": root}
+
+def traces_to_otlp(traces: List[Trace]) -> Dict:
+    """OTLP/JSON ExportTraceServiceRequest, ready to POST to a collector's /v1/traces"""
+    spans = []
+    for t in traces:
+        for s in list(t.spans):
+            otlp_span = {
+                "traceId": t.trace_id,
+                "spanId": s.span_id,
+                "name": s.name,
+                "kind": 1,  # SPAN_KIND_INTERNAL
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.end_ns or s.start_ns),
+                "attributes": [_otlp_attribute(key, value) for key, value in s.attributes.items()],
+                "status": {"code": 2, "message": s.error} if s.error else {"code": 1}
+            }
+            if s.parent_id:
+                otlp_span["parentSpanId"] = s.parent_id
+            spans.append(otlp_span)
+
+    return {"resourceSpans": [{
+        "resource": {"attributes": [_otlp_attribute("service.name", SERVICE_NAME)]},
+        "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}]
+    }]}
+
+def _otlp_attribute(key: str, value) -> Dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
@@ -11,6 +11,10 @@ from models.database import (
     Customer, RetentionPattern, ChurnIntervention, AgentActivity, 
     AgentMemory, CustomerCommunication
 )
+from services.communication_search import communication_search
+from services.customer_graph import customer_graph
+from services.graph_traversal import retention_graph_cache
+from services.change_log import mark_reset
 import logging
 
 logger = logging.getLogger(__name__)
@@ -84,6 +88,7 @@ async def reset_all_demo_data(db: Session):
             'churn_interventions', 
             'customer_communications',
             'agent_memory',
+            'retention_pattern_stats',
             'retention_patterns',
             'customers'
         ]
@@ -95,6 +100,9 @@ async def reset_all_demo_data(db: Session):
             except Exception as e:
                 logger.warning(f"Could not clear {table}: {e}")
         
+        # Delta-sync clients can't follow raw DELETEs, so they are told to reload
+        mark_reset(db)
+        
         # Reload all data
         await load_customers(db)
         await load_retention_patterns(db) 
@@ -103,6 +111,9 @@ async def reset_all_demo_data(db: Session):
         await load_historical_interventions(db)
         
         db.commit()
+        communication_search.invalidate()
+        customer_graph.invalidate()
+        retention_graph_cache.invalidate()
         logger.info("✅ Complete demo data reset successful")
         
     except Exception as e:
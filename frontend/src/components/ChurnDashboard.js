@@ -28,14 +28,30 @@ const ChurnDashboard = () => {
   
   useEffect(() => {
     fetchDashboardData();
-    fetchRealTimeStats();
     
-    // Refresh every 20 seconds for live demo
-    const interval = setInterval(() => {
-      fetchDashboardData();
-      fetchRealTimeStats();
-    }, 20000);
-    return () => clearInterval(interval);
+    // Fall back to polling every 20 seconds where Server-Sent Events aren't available
+    if (typeof EventSource === 'undefined') {
+      const interval = setInterval(fetchDashboardData, 20000);
+      return () => clearInterval(interval);
+    }
+
+    // The server pushes a section whenever it changes; EventSource reconnects with Last-Event-ID
+    const stream = new EventSource(apiService.getDashboardStreamUrl());
+    const handlers = {
+      metrics: (data) => setMetrics(data),
+      activities: (data) => setActivities(data.activities || []),
+      at_risk: (data) => setAtRiskCustomers(data.customers),
+      stats: (data) => setRealTimeStats(data)
+    };
+    Object.entries(handlers).forEach(([section, handler]) => {
+      stream.addEventListener(section, (event) => {
+        handler(JSON.parse(event.data));
+        setIsLoading(false);
+      });
+    });
+    stream.onerror = () => console.log('Dashboard stream interrupted - reconnecting');
+
+    return () => stream.close();
   }, []);
 
   useEffect(() => {
@@ -67,16 +83,6 @@ const ChurnDashboard = () => {
     }
   };
   
-  const fetchRealTimeStats = async () => {
-    try {
-      // Get real-time statistics from TiDB
-      const response = await apiService.getRealTimeStats();
-      setRealTimeStats(response);
-    } catch (error) {
-      console.error('Failed to fetch real-time stats:', error);
-    }
-  };
-
   // Add this new function to control agent cycle
   const toggleAgentCycle = async () => {
     if (isAgentCycleRunning) {
@@ -104,15 +110,6 @@ const ChurnDashboard = () => {
           setIsAgentCycleRunning(true);
           setAgentCycleStatus('running');
           console.log('✅ Agent cycle started');
-          
-          // Refresh data more frequently when agent is running
-          const agentInterval = setInterval(() => {
-            fetchDashboardData();
-            fetchRealTimeStats();
-          }, 10000); // Every 10 seconds when agent is running
-          
-          // Store interval ID to clear it later
-          window.agentInterval = agentInterval;
         }
       } catch (error) {
         console.error('Failed to start agent cycle:', error);
@@ -138,27 +135,15 @@ const ChurnDashboard = () => {
     checkAgentStatus();
   }, []);
 
-  // Add cleanup effect
-  useEffect(() => {
-    return () => {
-      // Clear interval when component unmounts
-      if (window.agentInterval) {
-        clearInterval(window.agentInterval);
-      }
-    };
-  }, []);
-
   const fetchDashboardData = async () => {
     try {
-      const [metricsData, activitiesData, customersData] = await Promise.all([
-        apiService.getDashboardMetrics(),
-        apiService.getRealTimeActivities(), // Use real activities from database
-        apiService.getAtRiskCustomers()
-      ]);
+      // One snapshot request instead of one request per section
+      const snapshot = await apiService.getDashboardSnapshot();
       
-      setMetrics(metricsData);
-      setActivities(activitiesData.activities || []);
-      setAtRiskCustomers(customersData.customers);
+      setMetrics(snapshot.metrics);
+      setActivities(snapshot.activities.activities || []);
+      setAtRiskCustomers(snapshot.at_risk.customers);
+      setRealTimeStats(snapshot.stats);
       setIsLoading(false);
     } catch (error) {
       console.error('Failed to fetch dashboard data:', error);
@@ -166,11 +151,26 @@ const ChurnDashboard = () => {
     }
   };
 
+  // The trigger runs as a background job; poll until it finishes
+  const waitForAgentJob = async (jobId) => {
+    // Give up after 10 minutes; the job keeps running server-side and its activities show up on refresh
+    for (let attempt = 0; attempt < 300; attempt++) {
+      await new Promise(resolve => setTimeout(resolve, 2000));
+      const job = await apiService.getAgentJob(jobId);
+      if (job.status === 'succeeded' || job.status === 'failed') {
+        return job;
+      }
+    }
+    return { status: 'timeout', error: 'Timed out waiting for the agent run to finish' };
+  };
+
   const triggerAgent = async () => {
     setIsAgentRunning(true);
     
     try {
-      const response = await apiService.triggerAgent();
+      const { job_id } = await apiService.triggerAgent();
+      const job = await waitForAgentJob(job_id);
+      const response = job.result || { status: 'error', message: job.error };
 
       if (response.status === 'success') {
         // Update save counter with real results
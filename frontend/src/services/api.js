@@ -15,11 +15,23 @@ export const apiService = {
     return response.data;
   },
 
-  async getAtRiskCustomers() {
-    const response = await axios.get(`${API_BASE}/customers/at-risk`);
+  // Pass the previous response's version as `since` to get only what changed
+  async getAtRiskCustomers(since) {
+    const response = await axios.get(`${API_BASE}/customers/at-risk`, { params: { since } });
     return response.data;
   },
 
+  // All dashboard sections in one request; the browser revalidates with If-None-Match via the ETag
+  async getDashboardSnapshot() {
+    const response = await axios.get(`${API_BASE}/dashboard/snapshot`);
+    return response.data;
+  },
+
+  // Server-Sent Events stream of dashboard sections (metrics, activities, at_risk, interventions, stats)
+  getDashboardStreamUrl() {
+    return `${API_BASE}/dashboard/stream`;
+  },
+
   // Analytics endpoints
   async getChurnAnalytics() {
     const response = await axios.get(`${API_BASE}/analytics/churn`);
@@ -31,25 +43,34 @@ export const apiService = {
     return response.data;
   },
 
-  async getRecentInterventions() {
-    const response = await axios.get(`${API_BASE}/interventions/recent`);
+  // Pass the previous response's next_cursor as `cursor` to load older interventions
+  async getRecentInterventions({ limit, status, cursor } = {}) {
+    const response = await axios.get(`${API_BASE}/interventions/recent`, {
+      params: { limit, status, cursor }
+    });
     return response.data;
   },
 
-  // Single unified agent trigger
+  // Queues an agent run and returns { job_id, status, deduplicated } without waiting for it
   async triggerAgent() {
     const response = await axios.post(`${API_BASE}/agent/trigger`);
     return response.data;
   },
 
+  // Status of a triggered run: per-customer progress while running, result once finished
+  async getAgentJob(jobId) {
+    const response = await axios.get(`${API_BASE}/agent/jobs/${jobId}`);
+    return response.data;
+  },
+
   async resetDemo() {
     const response = await axios.post(`${API_BASE}/agent/reset-demo`);
     return response.data;
   },  
 
   // Real-time data endpoints
-  async getRealTimeActivities() {
-    const response = await axios.get(`${API_BASE}/activities/real-time`);
+  async getRealTimeActivities(since) {
+    const response = await axios.get(`${API_BASE}/activities/real-time`, { params: { since } });
     return response.data;
   },
 